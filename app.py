@@ -1,9 +1,16 @@
 # app.py
+# First, so the boot report times every import below
+from services.boot import boot
 from flask import Flask
 from routes.chat import chat_bp
 from routes.summ import summ_bp
 from routes.external import external_bp
-from routes.voice_interactive import voice_interactive_bp
+from routes.voice import voice_interactive_bp
+from routes.jobs import jobs_bp
+from routes.metrics import metrics_bp
+from services.request_log import configure_logging
+
+configure_logging()
 
 app = Flask(__name__)
 
@@ -12,6 +19,11 @@ app.register_blueprint(chat_bp)
 app.register_blueprint(summ_bp)
 app.register_blueprint(external_bp, url_prefix='/api')
 app.register_blueprint(voice_interactive_bp)
+app.register_blueprint(jobs_bp)
+app.register_blueprint(metrics_bp)
+
+# Optional warmup (BOOT_WARMUP=1) happens here, before the worker serves a request
+boot()
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,130 @@
+# benchmarks/arxiv_stub.py
+"""Local stand-in for the arXiv export API, for exercising the search layer offline.
+
+Usage: python benchmarks/arxiv_stub.py [--port 8765] [--latency 0.2]
+then run the app with ARXIV_API_URL=http://127.0.0.1:8765/api/query and
+ARXIV_MIN_INTERVAL_SECONDS=0.
+
+Every query gets a deterministic Atom feed: the same query always returns the
+same papers, and queries sharing terms share some papers, so merging and
+de-duplication can be observed. id_list lookups return the requested IDs.
+"""
+import re
+import time
+import hashlib
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+FEED_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/"
+      xmlns:arxiv="http://arxiv.org/schemas/atom">
+  <title>arXiv Query: {query}</title>
+  <id>http://arxiv.org/api/stub</id>
+  <updated>2024-01-01T00:00:00Z</updated>
+  <opensearch:totalResults>{total}</opensearch:totalResults>
+  <opensearch:startIndex>{start}</opensearch:startIndex>
+  <opensearch:itemsPerPage>{total}</opensearch:itemsPerPage>
+{entries}
+</feed>
+"""
+
+ENTRY_TEMPLATE = """  <entry>
+    <id>http://arxiv.org/abs/{arxiv_id}</id>
+    <updated>2024-01-01T00:00:00Z</updated>
+    <published>2023-0{month}-15T00:00:00Z</published>
+    <title>{title}</title>
+    <summary>{summary}</summary>
+    <author><name>Stub Author {n}</name></author>
+    <link href="http://arxiv.org/abs/{arxiv_id}" rel="alternate" type="text/html"/>
+    <link title="pdf" href="http://arxiv.org/pdf/{arxiv_id}" rel="related" type="application/pdf"/>
+    <arxiv:primary_category term="cs.LG" scheme="http://arxiv.org/schemas/atom"/>
+    <category term="cs.LG" scheme="http://arxiv.org/schemas/atom"/>
+  </entry>"""
+
+
+def _paper_id(term, i):
+    digest = int(hashlib.sha256(f"{term}:{i}".encode()).hexdigest(), 16)
+    return f"2401.{digest % 100000:05d}v1"
+
+
+def _entry(arxiv_id, term):
+    n = int(arxiv_id[5:10])
+    return ENTRY_TEMPLATE.format(
+        arxiv_id=arxiv_id,
+        month=n % 9 + 1,
+        n=n % 50,
+        title=escape(f"On {term} ({arxiv_id})"),
+        summary=escape(f"We study {term}. This stub abstract mentions {term} and paper {arxiv_id}."),
+    )
+
+
+def feed_for(params):
+    """Atom feed answering one API request's query parameters."""
+    start = int(params.get("start", ["0"])[0])
+    max_results = int(params.get("max_results", ["10"])[0])
+    id_list = [i for i in params.get("id_list", [""])[0].split(",") if i]
+    query = params.get("search_query", [""])[0]
+    if id_list:
+        entries = [_entry(arxiv_id, "requested paper") for arxiv_id in id_list]
+    else:
+        terms = re.findall(r'"([^"]+)"|(\w[\w-]*)', query.replace("all:", ""))
+        terms = [a or b for a, b in terms if (a or b) not in ("AND", "OR", "ANDNOT")]
+        entries = []
+        for term in terms or ["nothing"]:
+            # Half of each term's papers depend on the term's first word only, so related terms overlap
+            entries.extend(_entry(_paper_id(term.split()[0] if i % 2 else term, i), term) for i in range(max_results))
+        entries = list(dict.fromkeys(entries))
+    page = entries[start:start + max_results]
+    return FEED_TEMPLATE.format(query=escape(query), total=len(entries), start=start, entries="\n".join(page))
+
+
+class ArxivStubServer:
+    """Stub arXiv API on 127.0.0.1 in a background thread; counts requests served."""
+
+    def __init__(self, port=0, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                time.sleep(stub.latency)
+                body = feed_for(parse_qs(urlparse(self.path).query)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/atom+xml")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/query"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds added to every response")
+    args = parser.parse_args()
+    stub = ArxivStubServer(args.port, args.latency)
+    print(f"Serving stub arXiv API at {stub.url}")
+    stub.server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
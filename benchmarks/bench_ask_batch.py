@@ -0,0 +1,109 @@
+# benchmarks/bench_ask_batch.py
+"""Answering a list of questions: one /ask per question vs. one /ask/batch.
+
+Usage: python benchmarks/bench_ask_batch.py [--questions 20] [--chunks 2000]
+                                            [--embed-ms 80] [--model-ms 800] [--concurrency 1 4 8]
+
+Runs offline against a synthetic collection. The embedding and chat models
+are local stand-ins that sleep for a fixed round trip per request (embedding
+a batch costs one round trip, as with Gemini's batch endpoint), so the
+numbers show what batching the embedding, searching the question matrix at
+once and overlapping model calls save compared with the sequential loop.
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(tempfile.mkdtemp())
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from bench_retrieval import HashingEmbeddings, make_corpus, make_queries
+from services.clients import clients
+from services.web_search import WebSearch, NoSearchBackend
+from services.collection_index import CollectionIndex, chunk_ids
+from services.collection_store import empty_manifest, new_collection_id, save_collection
+from services import chatutils
+
+
+class SlowEmbeddings(HashingEmbeddings):
+    """Hashing embeddings with a fixed round trip per request."""
+
+    model_name = "hashing"
+
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+
+    def embed_query(self, text):
+        time.sleep(self.latency)
+        return super().embed_query(text)
+
+    def embed_queries(self, texts):
+        time.sleep(self.latency)
+        return [HashingEmbeddings.embed_query(self, text) for text in texts]
+
+
+class SlowChatModel(FakeListChatModel):
+    """Chat model that gives the same answer after a fixed round trip."""
+
+    latency: float = 0.0
+    answer: str = "An answer."
+
+    def _call(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return self.answer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--embed-ms", type=float, default=80)
+    parser.add_argument("--model-ms", type=float, default=800)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    os.environ.setdefault("GOOGLE_API_KEY", "unused")
+    embeddings = SlowEmbeddings(args.embed_ms / 1000)
+    clients.register("embeddings", lambda: embeddings)
+    clients.register("chat_model", lambda: SlowChatModel(responses=["unused"], latency=args.model_ms / 1000))
+    # No internet fallback: both paths measure the documents alone
+    clients.register("web_search", lambda: WebSearch(NoSearchBackend()))
+
+    rng = random.Random(0)
+    texts, identifiers, contents = make_corpus(args.chunks, rng)
+    store = CollectionIndex.from_texts(texts, HashingEmbeddings(), ids=chunk_ids("bench", len(texts)))
+    manifest = empty_manifest()
+    manifest["documents"]["bench"] = {"filename": "bench.pdf", "chunk_count": len(texts)}
+    collection_id = new_collection_id()
+    save_collection(collection_id, manifest, store)
+    questions = [query for query, _ in make_queries(identifiers, contents, args.questions, rng)]
+
+    print(f"questions: {len(questions)}, chunks: {len(texts)}, embed round trip: {args.embed_ms:.0f}ms, "
+          f"model round trip: {args.model_ms:.0f}ms")
+    print(f"{'mode':<18} {'total s':>8} {'per question ms':>16} {'embed ms':>9} {'search ms':>10}")
+    chatutils.index_registry.get(collection_id)
+
+    chatutils.answer_cache.invalidate(collection_id)
+    start = time.perf_counter()
+    for question in questions:
+        chatutils.answer_from_collection(collection_id, question)
+    total = time.perf_counter() - start
+    print(f"{'loop over /ask':<18} {total:>8.2f} {total / len(questions) * 1000:>16.0f} {'':>9} {'':>10}")
+
+    for concurrency in args.concurrency:
+        chatutils.answer_cache.invalidate(collection_id)
+        start = time.perf_counter()
+        _, timings = chatutils.answer_batch_from_collection(collection_id, questions, concurrency=concurrency)
+        total = time.perf_counter() - start
+        print(f"{f'batch x{concurrency}':<18} {total:>8.2f} {total / len(questions) * 1000:>16.0f} "
+              f"{timings['embed_ms']:>9.1f} {timings['search_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# benchmarks/bench_boot.py
+"""Cold start of a worker: app import time, warmup steps, memory and the slowest package imports.
+
+Usage: python benchmarks/bench_boot.py [--runs 5] [--top 12] [--output boot.json]
+
+Each run imports the app in a fresh interpreter (with -X importtime), once as
+a worker starts by default and once with BOOT_WARMUP=1, and reads the boot
+report the app records (see services/boot.py). Reported per mode: median
+import and ready times, warmup time per step, resident memory once ready, and
+which heavy dependencies were loaded. For the first run of each mode it also
+lists the packages whose first import took longest, including what they pull
+in. Clients are built with a dummy API key and make no network calls, but the
+keyword extractor may try (and fail) to download NLTK stopwords if they are
+not installed.
+"""
+import os
+import re
+import sys
+import json
+import tempfile
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = f"""
+import os, sys, json
+sys.path.insert(0, {ROOT!r})
+import app
+from services.boot import boot_report
+with open("/proc/self/statm") as f:
+    rss_mb = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+print(json.dumps({{**boot_report.as_dict(), "rss_mb": round(rss_mb, 1)}}))
+"""
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def package_import_ms(importtime_output):
+    """Milliseconds of each top-level package's first import, including the imports it triggers."""
+    packages = {}
+    for line in importtime_output.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match is None:
+            continue
+        cumulative, name = int(match.group(2)), match.group(4)
+        if "." not in name:
+            packages[name] = max(packages.get(name, 0), cumulative / 1000)
+    return packages
+
+
+def boot_once(warmup):
+    env = {**os.environ, "BOOT_WARMUP": "1" if warmup else "0", "LOG_LEVEL": "WARNING"}
+    env.setdefault("GOOGLE_API_KEY", "unused")
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD], env=env, cwd=tempfile.mkdtemp(),
+                               capture_output=True, text=True, check=True)
+    report = json.loads(completed.stdout.strip().splitlines()[-1])
+    return report, package_import_ms(completed.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12, help="slowest package imports to list")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for mode, warmup in (("lazy", False), ("warmup", True)):
+        runs = [boot_once(warmup) for _ in range(args.runs)]
+        reports = [report for report, _ in runs]
+        steps = {}
+        for report in reports:
+            for step in report["warmup"]:
+                steps.setdefault(step["step"], []).append(step["ms"])
+        packages = runs[0][1]
+        results[mode] = {
+            "import_ms": statistics.median(report["import_ms"] for report in reports),
+            "ready_ms": statistics.median(report["ready_ms"] for report in reports),
+            "warmup_ms": {step: statistics.median(values) for step, values in steps.items()},
+            "warmup_failed": sorted({step["step"] for report in reports for step in report["warmup"] if not step["ok"]}),
+            "rss_mb": statistics.median(report["rss_mb"] for report in reports),
+            "modules_loaded": [name for name, loaded in reports[0]["modules_loaded"].items() if loaded],
+            "slowest_imports_ms": dict(sorted(packages.items(), key=lambda item: -item[1])[:args.top]),
+        }
+
+    print(f"{args.runs} runs per mode (medians)")
+    print(f"{'mode':<8} {'import ms':>10} {'ready ms':>10} {'RSS MB':>8}  heavy modules loaded")
+    for mode, result in results.items():
+        print(f"{mode:<8} {result['import_ms']:>10.0f} {result['ready_ms']:>10.0f} {result['rss_mb']:>8.0f}  "
+              f"{', '.join(result['modules_loaded'])}")
+    for mode, result in results.items():
+        if result["warmup_ms"]:
+            print(f"\n{mode} steps: " + ", ".join(f"{step} {ms:.0f}ms" for step, ms in result["warmup_ms"].items())
+                  + (f" (failed: {', '.join(result['warmup_failed'])})" if result["warmup_failed"] else ""))
+        print(f"\n{mode}: slowest package imports")
+        for name, ms in result["slowest_imports_ms"].items():
+            print(f"  {name:<28} {ms:>8.0f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/bench_client_setup.py
+"""Per-request cost of building model clients and chains vs. reusing the shared ones.
+
+Usage: python benchmarks/bench_client_setup.py [--requests 200]
+
+No network calls are made: only construction is timed, which is what every
+request used to pay before the first byte was sent to the model.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+from langchain.chains.question_answering import load_qa_chain
+from langchain.prompts import PromptTemplate
+from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+from services.clients import clients, CHAT_MODEL, CHAT_TEMPERATURE, EMBEDDING_MODEL
+from services.chatutils import QA_PROMPT_TEMPLATE
+
+
+def build_per_request():
+    """What /ask did on every call before clients were shared."""
+    GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)
+    model = ChatGoogleGenerativeAI(model=CHAT_MODEL, temperature=CHAT_TEMPERATURE)
+    prompt = PromptTemplate(template=QA_PROMPT_TEMPLATE, input_variables=["context", "question"])
+    return load_qa_chain(model, chain_type="stuff", prompt=prompt)
+
+
+def shared():
+    clients.get("embeddings")
+    return clients.get("qa_chain")
+
+
+def bench(fn, requests):
+    fn()  # first call builds the shared clients; count it separately
+    start = time.perf_counter()
+    for _ in range(requests):
+        fn()
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    shared()
+    first = time.perf_counter() - start
+
+    per_request = bench(build_per_request, args.requests)
+    reused = bench(shared, args.requests)
+
+    print(f"requests:            {args.requests}")
+    print(f"build per request:   {per_request * 1e6:10.1f} us/request")
+    print(f"shared clients:      {reused * 1e6:10.1f} us/request (first build {first * 1e3:.1f} ms)")
+    print(f"speedup:             {per_request / reused if reused else float('inf'):10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
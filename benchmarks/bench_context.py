@@ -0,0 +1,87 @@
+# benchmarks/bench_context.py
+"""Prompt tokens per answer before and after context assembly (dedupe, merge, budget).
+
+Usage: python benchmarks/bench_context.py [--pages 200] [--queries 100] [--k 4 8]
+                                          [--budget 2000] [pdf ...]
+
+Documents are split with the app's chunk size and overlap, queries are
+answered with hybrid retrieval, and the retrieved chunks are measured as the
+"stuff" chain used to send them (before) and after assemble_context (after).
+Without PDFs, synthetic pages are used and queries are sentences taken from the
+text. Embeddings are the local hashing model of bench_retrieval.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_retrieval import HashingEmbeddings
+from services.chatutils import CHUNK_SIZE, CHUNK_OVERLAP
+from services.collection_index import CollectionIndex, chunk_ids
+from services.context import assemble_context
+from services.pdf_extract import iter_page_chunks
+
+
+def synthetic_pages(count, rng):
+    """Pages whose vocabulary drifts slowly, so neighbouring chunks are about the same thing."""
+    for page in range(count):
+        window = [f"w{i}" for i in range(page * 10, page * 10 + 60)]
+        sentences = [" ".join(rng.choice(window) for _ in range(rng.randint(8, 18))).capitalize() + "."
+                     for _ in range(30)]
+        yield {"doc_id": f"doc{page // 20}", "filename": f"doc{page // 20}.pdf", "page": page % 20 + 1,
+               "text": " ".join(sentences)}
+
+
+def pdf_pages(paths):
+    from PyPDF2 import PdfReader
+    for n, path in enumerate(paths):
+        for i, page in enumerate(PdfReader(path).pages):
+            yield {"doc_id": f"doc{n}", "filename": os.path.basename(path), "page": i + 1,
+                   "text": page.extract_text() or ""}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, nargs="+", default=[4, 8])
+    parser.add_argument("--budget", type=int, default=2000)
+    parser.add_argument("pdfs", nargs="*")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pages = list(pdf_pages(args.pdfs) if args.pdfs else synthetic_pages(args.pages, rng))
+    chunks = list(iter_page_chunks(iter(pages), CHUNK_SIZE, CHUNK_OVERLAP))
+    texts = [text for text, _ in chunks]
+    ids = [chunk_id for doc_id in dict.fromkeys(m["doc_id"] for _, m in chunks)
+           for chunk_id in chunk_ids(doc_id, sum(m["doc_id"] == doc_id for _, m in chunks))]
+    embeddings = HashingEmbeddings()
+    store = CollectionIndex.from_texts(texts, embeddings, metadatas=[m for _, m in chunks], ids=ids)
+
+    sentences = [s.strip() + "." for page in pages for s in page["text"].split(".") if len(s.split()) > 5]
+    queries = rng.sample(sentences, min(args.queries, len(sentences)))
+    print(f"pages: {len(pages)}, chunks: {len(texts)} ({CHUNK_SIZE} chars, {CHUNK_OVERLAP} overlap), "
+          f"queries: {len(queries)}, budget: {args.budget} tokens")
+    print(f"{'k':>3} {'tokens before':>14} {'tokens after':>13} {'saved':>7} {'passages':>9} {'assembly ms':>12}")
+    for k in args.k:
+        before, after, passages, elapsed = [], [], [], []
+        for query in queries:
+            docs = store.hybrid_search(query, embeddings.embed_query(query), k=k)
+            start = time.perf_counter()
+            packed, stats = assemble_context(docs, token_budget=args.budget)
+            elapsed.append((time.perf_counter() - start) * 1000)
+            before.append(stats["tokens_before"])
+            after.append(stats["tokens_after"])
+            passages.append(stats["passages"])
+        saved = 1 - sum(after) / sum(before)
+        print(f"{k:>3} {np.mean(before):>14.0f} {np.mean(after):>13.0f} {saved:>7.1%} "
+              f"{np.mean(passages):>9.1f} {np.mean(elapsed):>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+# benchmarks/bench_e2e.py
+"""End-to-end throughput, latency and memory of /upload, /ask, /summarize and /api/search_related, offline.
+
+Usage: python benchmarks/bench_e2e.py [--endpoints upload ask summarize search_related]
+                                      [--pages 5 50] [--requests 8] [--concurrency 1 4]
+                                      [--embed-ms 50] [--model-ms 300] [--search-ms 300] [--arxiv-ms 200]
+                                      [--fallback-ratio 0.2] [--output results.json] [--compare previous.json]
+
+Drives the Flask app through its test client, from --concurrency threads at
+once, with every external service replaced by the local fakes of
+benchmarks/fakes.py (embeddings, chat and summary models, web search, arXiv)
+at the given latencies. Inputs are synthetic PDFs of --pages pages, a fresh
+document per request so page, embedding and summary caches start cold; /ask
+questions are distinct, against a collection uploaded beforehand. Upload and
+related-paper requests are timed until their background job finishes.
+
+Per endpoint, size and concurrency it reports throughput, p50/p95 latency,
+errors and the peak RSS of this process during the run (PDF extraction pool
+workers not included). Results are saved as JSON under benchmarks/results/
+(or --output); --compare prints the change against an earlier results file.
+"""
+import os
+import sys
+import io
+import json
+import time
+import tempfile
+import argparse
+import platform
+import threading
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_pdf import synthetic_pdf, synthetic_pages
+
+ENDPOINTS = ["upload", "ask", "summarize", "search_related"]
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+class PeakRss:
+    """Samples this process's resident memory in a background thread and keeps the peak."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_mb())
+
+
+class Driver:
+    """Issues one request of each kind through a per-thread test client; returns True on success."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+        self._seed = 0
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        return client
+
+    def next_seed(self):
+        with self._lock:
+            self._seed += 1
+            return self._seed
+
+    def wait_for_job(self, response):
+        if response.status_code != 202:
+            return None
+        status_url = response.get_json()["status_url"]
+        while True:
+            status = self.client.get(status_url).get_json()
+            if status["status"] in ("succeeded", "failed"):
+                return status
+            time.sleep(0.01)
+
+    def upload(self, pdf):
+        status = self.wait_for_job(self.client.post("/upload", data={"files": [(io.BytesIO(pdf), "bench.pdf")]}))
+        return status["result"]["collection_id"] if status and status["status"] == "succeeded" else None
+
+    def ask(self, collection_id, question):
+        response = self.client.post("/ask", data={"collection_id": collection_id, "question": question})
+        return response.status_code == 200
+
+    def summarize(self, pdf):
+        response = self.client.post("/summarize", data={"files": [(io.BytesIO(pdf), "bench.pdf")]})
+        return response.status_code == 200
+
+    def search_related(self, pdf):
+        response = self.client.post("/api/search_related", data={"files": [(io.BytesIO(pdf), "bench.pdf")]})
+        status = self.wait_for_job(response)
+        return bool(status) and status["status"] == "succeeded"
+
+
+def run_scenario(driver, endpoint, pages, requests, concurrency):
+    # Inputs are built up front so only the app is timed
+    if endpoint == "ask":
+        collection_id = driver.upload(synthetic_pdf(pages, driver.next_seed()))
+        words = " ".join(synthetic_pages(pages, 0)).split()
+        calls = [(driver.ask, (collection_id, f"what does the document say about {words[i * 7 % len(words)]} ({i})"))
+                 for i in range(requests)]
+    else:
+        call = {"upload": lambda pdf: driver.upload(pdf) is not None,
+                "summarize": driver.summarize, "search_related": driver.search_related}[endpoint]
+        calls = [(call, (synthetic_pdf(pages, driver.next_seed()),)) for _ in range(requests)]
+
+    def timed_call(item):
+        fn, args = item
+        start = time.perf_counter()
+        try:
+            ok = fn(*args)
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    with PeakRss() as memory:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(timed_call, calls))
+        seconds = time.perf_counter() - start
+
+    latencies = np.asarray([latency for latency, _ in outcomes]) * 1000
+    return {
+        "endpoint": endpoint,
+        "pages": pages,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": sum(1 for _, ok in outcomes if not ok),
+        "seconds": round(seconds, 3),
+        "throughput": round(requests / seconds, 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 1),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 1),
+        "mean_ms": round(float(latencies.mean()), 1),
+        "peak_rss_mb": round(memory.peak, 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def change(new, old):
+    return f"{(new - old) / old * 100:+.0f}%" if old else "n/a"
+
+
+def compare(results, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    before = {(r["endpoint"], r["pages"], r["concurrency"]): r for r in previous["results"]}
+    print(f"\nchange vs. {previous_path} (commit {previous.get('commit')}):")
+    if not any((r["endpoint"], r["pages"], r["concurrency"]) in before for r in results):
+        print("no runs with the same endpoint, pages and concurrency")
+        return
+    print(f"{'endpoint':<15} {'pages':>5} {'conc':>4} {'req/s':>8} {'p50':>8} {'p95':>8} {'peak RSS':>9}")
+    for result in results:
+        old = before.get((result["endpoint"], result["pages"], result["concurrency"]))
+        if old is None:
+            continue
+        print(f"{result['endpoint']:<15} {result['pages']:>5} {result['concurrency']:>4} "
+              f"{change(result['throughput'], old['throughput']):>8} {change(result['p50_ms'], old['p50_ms']):>8} "
+              f"{change(result['p95_ms'], old['p95_ms']):>8} {change(result['peak_rss_mb'], old['peak_rss_mb']):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument("--pages", type=int, nargs="+", default=[5, 50])
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--embed-ms", type=float, default=50)
+    parser.add_argument("--model-ms", type=float, default=300)
+    parser.add_argument("--search-ms", type=float, default=300)
+    parser.add_argument("--arxiv-ms", type=float, default=200)
+    parser.add_argument("--fallback-ratio", type=float, default=0.2,
+                        help="share of questions the fake model cannot answer from the documents")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/e2e-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else os.path.join(
+        RESULTS_DIR, f"e2e-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+
+    # The app keeps its collections and caches under the working directory
+    os.chdir(tempfile.mkdtemp())
+    import logging
+    from fakes import install_fakes
+    import app
+    logging.getLogger().setLevel(logging.WARNING)
+
+    web_stub, arxiv_stub = install_fakes(args.embed_ms, args.model_ms, args.search_ms, args.arxiv_ms,
+                                         args.fallback_ratio)
+    driver = Driver(app.app)
+    # Warm up: first-use imports, model clients and pools are not what is measured
+    driver.ask(driver.upload(synthetic_pdf(2, 0)), "warm up")
+
+    print(f"fakes: embed {args.embed_ms:.0f}ms, model {args.model_ms:.0f}ms, web search {args.search_ms:.0f}ms, "
+          f"arXiv {args.arxiv_ms:.0f}ms; {args.requests} requests per run")
+    print(f"{'endpoint':<15} {'pages':>5} {'conc':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>6} {'peak RSS MB':>12}")
+    results = []
+    for endpoint in args.endpoints:
+        for pages in args.pages:
+            for concurrency in args.concurrency:
+                result = run_scenario(driver, endpoint, pages, args.requests, concurrency)
+                results.append(result)
+                print(f"{endpoint:<15} {pages:>5} {concurrency:>4} {result['throughput']:>8.2f} {result['p50_ms']:>8.0f} "
+                      f"{result['p95_ms']:>8.0f} {result['errors']:>6} {result['peak_rss_mb']:>12.0f}")
+    web_stub.stop()
+    arxiv_stub.stop()
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+            "results": results,
+        }, f, indent=2)
+    print(f"\nSaved {output}")
+    if compare_path:
+        compare(results, compare_path)
+
+
+if __name__ == "__main__":
+    main()
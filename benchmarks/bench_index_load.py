@@ -0,0 +1,126 @@
+# benchmarks/bench_index_load.py
+"""Load time and memory of a collection: pickled FAISS.save_local vs. the mmap-able format.
+
+Usage: python benchmarks/bench_index_load.py [--chunks 20000 100000] [--dim 768] [--queries 50]
+
+Each corpus is saved both ways, then loaded in a fresh subprocess (cold
+Python, warm page cache) to time the load, the first query and the mean
+query, and the memory added by loading: resident, and private (not shared
+with other processes mapping the same files). The legacy format unpickles
+every chunk up front; the new one maps the index and vectors and reads
+chunks from SQLite on demand (mmap), or reads them into a private copy
+as writers do (private).
+"""
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import argparse
+import subprocess
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def memory_mb():
+    """(resident, private) memory of this process in MB; the rest are file pages shared with other processes."""
+    with open("/proc/self/statm") as f:
+        _, resident, shared = (int(field) for field in f.read().split()[:3])
+    page_mb = os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    return resident * page_mb, (resident - shared) * page_mb
+
+
+class RandomEmbeddings(Embeddings):
+    """Embeds queries as random vectors; the benchmark measures storage, not relevance."""
+
+    def __init__(self, dimension):
+        self.rng = np.random.default_rng(0)
+        self.dimension = dimension
+
+    def embed_query(self, text):
+        return self.rng.standard_normal(self.dimension).astype(np.float32).tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def measure(layout, index_dir, dimension, queries):
+    """Runs in the subprocess: load one layout and report timings as JSON."""
+    import warnings
+    warnings.filterwarnings("ignore")
+    from langchain.vectorstores import FAISS
+    from services.collection_index import CollectionIndex
+
+    embeddings = RandomEmbeddings(dimension)
+    before = memory_mb()
+    start = time.perf_counter()
+    if layout == "pickle":
+        store = FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+    else:
+        store = CollectionIndex.load(index_dir, embeddings, mmap=layout == "mmap")
+    load_seconds = time.perf_counter() - start
+    latencies = []
+    for i in range(queries):
+        start = time.perf_counter()
+        store.similarity_search_by_vector(embeddings.embed_query(str(i)), k=4)
+        latencies.append(time.perf_counter() - start)
+    print(json.dumps({"load": load_seconds, "first": latencies[0], "mean": float(np.mean(latencies[1:] or latencies)),
+                      "rss": memory_mb()[0] - before[0], "private": memory_mb()[1] - before[1]}))
+
+
+def build(chunks, dimension, directory):
+    import warnings
+    warnings.filterwarnings("ignore")
+    import faiss
+    from langchain.vectorstores import FAISS
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from services.collection_index import CollectionIndex, chunk_ids
+
+    rng = random.Random(0)
+    words = [f"w{i}" for i in range(20000)]
+    texts = [" ".join(rng.choices(words, k=300)) for _ in range(chunks)]
+    vectors = np.random.default_rng(0).standard_normal((chunks, dimension)).astype(np.float32)
+    pairs = list(zip(texts, vectors.tolist()))
+    metadatas = [{"doc_id": f"doc{i // 100}", "page": i % 100 + 1, "start_index": 0} for i in range(chunks)]
+    ids = chunk_ids("bench", chunks)
+    embeddings = RandomEmbeddings(dimension)
+    FAISS.from_embeddings(pairs, embeddings, metadatas=metadatas, ids=ids).save_local(os.path.join(directory, "pickle"))
+    store = CollectionIndex(embeddings, faiss.IndexFlatL2(dimension), InMemoryDocstore(), {})
+    store.add_embeddings(pairs, metadatas=metadatas, ids=ids)
+    store.save_local(os.path.join(directory, "store"))
+    with open(os.path.join(directory, "store", "documents.json"), "w") as f:
+        json.dump({"documents": {}, "deleted": {}, "writes_since_compaction": 0}, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, nargs="+", default=[20000, 100000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--measure", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        measure(args.measure[0], args.measure[1], args.dim, args.queries)
+        return
+
+    print(f"{'chunks':>8} {'layout':<8} {'load s':>8} {'1st query ms':>13} {'query ms':>9} {'RSS MB':>8} {'private MB':>11}")
+    for chunks in args.chunks:
+        with tempfile.TemporaryDirectory() as directory:
+            build(chunks, args.dim, directory)
+            for layout, subdir in (("pickle", "pickle"), ("private", "store"), ("mmap", "store")):
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--dim", str(args.dim), "--queries", str(args.queries),
+                     "--measure", layout, os.path.join(directory, subdir)],
+                    capture_output=True, text=True, check=True, cwd=ROOT,
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(f"{chunks:>8} {layout:<8} {result['load']:>8.3f} {result['first'] * 1000:>13.2f} "
+                      f"{result['mean'] * 1000:>9.2f} {result['rss']:>8.0f} {result['private']:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
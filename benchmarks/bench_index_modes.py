@@ -0,0 +1,105 @@
+# benchmarks/bench_index_modes.py
+"""Build time, memory, query latency and recall of each FAISS index mode against flat.
+
+Usage: python benchmarks/bench_index_modes.py [--sizes 10000 100000 1000000] [--dim 768]
+                                              [--queries 200] [--k 10] [--modes flat ivf ivfpq hnsw]
+
+Vectors are synthetic: Gaussian clusters in --dim dimensions, roughly the shape
+of sentence embeddings of a set of papers. Queries are perturbed corpus vectors.
+recall@k is the share of the exact (flat) top k each mode returns. Every index is
+built with services.index_modes.build_index, as at upload, then saved and loaded
+back both into memory and memory-mapped to compare load time and resident size.
+1M vectors of 768 dimensions take 3 GB as float32; pick --sizes to fit the machine.
+"""
+import os
+import sys
+import time
+import tempfile
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.index_modes import MODES, build_index, read_index
+
+
+def rss_mb():
+    """Resident set size of this process in MB (Linux)."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def clustered_vectors(count, dimension, rng, clusters=256):
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = np.empty((count, dimension), dtype=np.float32)
+    for start in range(0, count, 100000):
+        stop = min(start + 100000, count)
+        labels = rng.integers(0, clusters, stop - start)
+        vectors[start:stop] = centers[labels] + 0.6 * rng.standard_normal((stop - start, dimension), dtype=np.float32)
+    return vectors
+
+
+def run_queries(index, queries, k):
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        _, positions = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        results.append(positions[0])
+    return np.asarray(results), np.asarray(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    args = parser.parse_args()
+
+    import faiss
+    rng = np.random.default_rng(0)
+    print(f"{'vectors':>8} {'mode':<6} {'build s':>8} {'RAM MB':>8} {'file MB':>8} {'load s':>7} "
+          f"{'mmap s':>7} {'mmap MB':>8} {'mean ms':>8} {'p95 ms':>7} {'recall':>7}")
+    for size in args.sizes:
+        vectors = clustered_vectors(size, args.dim, rng)
+        picks = rng.choice(size, args.queries, replace=False)
+        queries = vectors[picks] + 0.3 * rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+        exact = None
+        for mode in ["flat"] + [m for m in args.modes if m != "flat"]:
+            before = rss_mb()
+            start = time.perf_counter()
+            index = build_index(vectors, mode)
+            build_seconds = time.perf_counter() - start
+            ram = rss_mb() - before
+            results, latencies = run_queries(index, queries, args.k)
+            if exact is None:
+                exact = results
+            recall = np.mean([len(set(r) & set(e)) / args.k for r, e in zip(results, exact)])
+
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "index.faiss")
+                faiss.write_index(index, path)
+                file_mb = os.path.getsize(path) / 2 ** 20
+                del index
+                start = time.perf_counter()
+                loaded = read_index(path, mmap=False)
+                load_seconds = time.perf_counter() - start
+                del loaded
+                before = rss_mb()
+                start = time.perf_counter()
+                mapped = read_index(path, mmap=True)
+                mmap_seconds = time.perf_counter() - start
+                mmap_ram = rss_mb() - before
+                del mapped
+            if mode in args.modes:
+                print(f"{size:>8} {mode:<6} {build_seconds:>8.2f} {ram:>8.0f} {file_mb:>8.0f} {load_seconds:>7.3f} "
+                      f"{mmap_seconds:>7.3f} {mmap_ram:>8.0f} {np.mean(latencies):>8.3f} "
+                      f"{np.percentile(latencies, 95):>7.3f} {recall:>7.3f}")
+        del vectors
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# benchmarks/bench_keywords.py
+"""Keyword extraction throughput (docs/sec) on large texts: KeywordExtractor vs. the old NLTK path.
+
+Usage: python benchmarks/bench_keywords.py [--docs 20] [--words 20000] [pdf ...]
+
+Documents are synthetic unless PDF paths are given. The old implementation
+(per-call resource probe, word_tokenize + pos_tag, stopword set rebuilt per
+call) needs the NLTK punkt, averaged_perceptron_tagger and stopwords data; it
+is skipped when those are not installed.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.keywords import get_keyword_extractor
+
+VOCABULARY = (
+    "neural network transformer attention model training data gradient descent optimization loss "
+    "convolutional layer image segmentation classification accuracy benchmark dataset graph molecule "
+    "protein structure prediction reinforcement learning policy reward agent language translation "
+    "retrieval embedding vector index query document corpus evaluation baseline ablation"
+).split()
+FILLER = "the of and in to a is for with that on we this are by as an be from".split()
+NLTK_RESOURCES = ['tokenizers/punkt', 'taggers/averaged_perceptron_tagger', 'corpora/stopwords']
+
+
+def synthetic_document(words, rng):
+    tokens = []
+    while len(tokens) < words:
+        sentence = [rng.choice(VOCABULARY if rng.random() < 0.6 else FILLER) for _ in range(rng.randint(8, 20))]
+        tokens.extend(sentence)
+        tokens[-1] += "."
+    return " ".join(tokens)
+
+
+def pdf_documents(paths):
+    from PyPDF2 import PdfReader
+    return ["\n".join(page.extract_text() or "" for page in PdfReader(path).pages) for path in paths]
+
+
+def nltk_available():
+    import nltk
+    try:
+        for path in NLTK_RESOURCES:
+            nltk.data.find(path)
+        return True
+    except LookupError:
+        return False
+
+
+def legacy_extract_keywords(text, num_keywords=5):
+    """The previous services.external.extract_keywords, minus its download fallback."""
+    import nltk
+    from nltk.tokenize import word_tokenize
+    from nltk.corpus import stopwords
+    from nltk.tag import pos_tag
+    for path in NLTK_RESOURCES:
+        nltk.data.find(path)
+    tokens = word_tokenize(text.lower())
+    tagged = pos_tag(tokens)
+    stop_words = set(stopwords.words('english'))
+    keywords = [word for word, tag in tagged
+                if word.isalnum() and word not in stop_words
+                and len(word) > 2
+                and tag in ('NN', 'NNS', 'NNP', 'NNPS', 'JJ')]
+    return [word for word, _ in Counter(keywords).most_common(num_keywords)]
+
+
+def throughput(fn, documents):
+    start = time.perf_counter()
+    results = fn(documents)
+    elapsed = time.perf_counter() - start
+    return len(documents) / elapsed, elapsed, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--words", type=int, default=20000)
+    parser.add_argument("pdfs", nargs="*")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    documents = pdf_documents(args.pdfs) if args.pdfs else [
+        synthetic_document(args.words, rng) for _ in range(args.docs)
+    ]
+    print(f"documents: {len(documents)}, avg chars: {sum(map(len, documents)) // len(documents)}")
+
+    start = time.perf_counter()
+    extractor = get_keyword_extractor()
+    print(f"engine init (once):  {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    rate, elapsed, results = throughput(lambda docs: [extractor.extract(doc) for doc in docs], documents)
+    print(f"engine, one by one:  {rate:8.1f} docs/sec ({elapsed:.2f}s)  e.g. {results[0]}")
+    rate, elapsed, results = throughput(extractor.extract_batch, documents)
+    print(f"engine, batch+idf:   {rate:8.1f} docs/sec ({elapsed:.2f}s)  e.g. {results[0]}")
+
+    if nltk_available():
+        rate, elapsed, results = throughput(lambda docs: [legacy_extract_keywords(doc) for doc in docs], documents)
+        print(f"legacy NLTK:         {rate:8.1f} docs/sec ({elapsed:.2f}s)  e.g. {results[0]}")
+    else:
+        print("legacy NLTK:         skipped (punkt/tagger/stopwords data not installed)")
+
+
+if __name__ == "__main__":
+    main()
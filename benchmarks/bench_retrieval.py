@@ -0,0 +1,146 @@
+# benchmarks/bench_retrieval.py
+"""Retrieval quality and latency: dense vs. hybrid (dense + BM25, RRF) vs. hybrid + MMR.
+
+Usage: python benchmarks/bench_retrieval.py [--chunks 2000] [--queries 200] [--k 1 4 10]
+                                            [--embeddings hashing|google]
+
+The corpus is synthetic with known answers. Every chunk carries a unique
+identifier (like "resnet-50" or "eq-17") and a few content terms, and chunks
+overlap the way the app's splitter makes them. Each query names the target's
+identifier, one of its content terms verbatim and two paraphrased ("syn")
+forms of others. recall@k is the share of queries whose target chunk is
+among the k results.
+
+The default embeddings are a local hashed bag-of-words model that, like a
+semantic model, matches paraphrases but blurs identifiers (it ignores tokens
+with digits), while BM25 matches identifiers but not paraphrases; hybrid
+retrieval should beat both. --embeddings google uses the app's Gemini
+embedding model instead (GOOGLE_API_KEY needed).
+"""
+import os
+import sys
+import time
+import random
+import zlib
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.embeddings import Embeddings
+from services.collection_index import CollectionIndex, chunk_ids
+from services.retrieval import tokenize
+
+VOCABULARY = 5000
+CONTENT_TERMS = 8
+FILLER = "we show that the results of this method are consistent with prior work in the field".split()
+
+
+class HashingEmbeddings(Embeddings):
+    """Hashed bag-of-words vectors: a local stand-in for a semantic embedding model.
+
+    "synN" is embedded like "termN" (a paraphrase) and tokens containing digits
+    only as far as their letters go, so "eq-17" and "eq-18" look alike.
+    """
+
+    def __init__(self, size=1024):
+        self.size = size
+
+    def _embed(self, text):
+        vector = np.zeros(self.size, dtype=np.float32)
+        for term in tokenize(text):
+            if term.startswith("syn"):
+                term = "term" + term[3:]
+            elif not term.startswith("term"):
+                term = "".join(ch for ch in term if not ch.isdigit())
+            vector[zlib.crc32(term.encode()) % self.size] += 1.0
+        return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def make_corpus(chunks, rng):
+    """Chunk texts with a unique identifier and content terms each; neighbours overlap."""
+    identifiers = [f"{rng.choice(['resnet', 'bert', 'eq', 'thm', 'alg', 'fig'])}-{i}" for i in range(chunks)]
+    contents = [rng.sample(range(VOCABULARY), CONTENT_TERMS) for _ in range(chunks)]
+    passages = []
+    for identifier, content in zip(identifiers, contents):
+        words = [rng.choice(FILLER) for _ in range(50)] + [f"term{j}" for j in content]
+        rng.shuffle(words)
+        words.insert(rng.randrange(len(words)), identifier)
+        passages.append(" ".join(words))
+    texts = []
+    for i, passage in enumerate(passages):
+        # Like CHUNK_OVERLAP: the tail of the previous passage is repeated at the start
+        previous_tail = " ".join(passages[i - 1].split()[-15:]) if i else ""
+        texts.append(f"{previous_tail} {passage}".strip())
+    return texts, identifiers, contents
+
+
+def make_queries(identifiers, contents, count, rng):
+    queries = []
+    for target in rng.sample(range(len(identifiers)), count):
+        exact, *paraphrased = rng.sample(contents[target], 3)
+        terms = [f"term{exact}"] + [f"syn{j}" for j in paraphrased]
+        queries.append((f"what does {identifiers[target]} say about {' '.join(terms)}", target))
+    return queries
+
+
+def evaluate(store, embeddings, queries, k, **options):
+    hits, latencies = 0, []
+    for query, target in queries:
+        start = time.perf_counter()
+        docs = store.hybrid_search(query, embeddings.embed_query(query), k=k, **options)
+        latencies.append(time.perf_counter() - start)
+        hits += any(doc.metadata["chunk"] == target for doc in docs)
+    latencies = np.asarray(latencies) * 1000
+    return hits / len(queries), float(np.mean(latencies)), float(np.percentile(latencies, 95))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 4, 10])
+    parser.add_argument("--fetch-k", type=int, default=20)
+    parser.add_argument("--embeddings", choices=["hashing", "google"], default="hashing")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    texts, identifiers, contents = make_corpus(args.chunks, rng)
+    queries = make_queries(identifiers, contents, min(args.queries, args.chunks), rng)
+    if args.embeddings == "google":
+        from services.clients import clients
+        embeddings = clients.get("embeddings")
+    else:
+        embeddings = HashingEmbeddings()
+
+    start = time.perf_counter()
+    ids = chunk_ids("bench", len(texts))
+    store = CollectionIndex.from_texts(texts, embeddings, metadatas=[{"chunk": i} for i in range(len(texts))], ids=ids)
+    build_dense = time.perf_counter() - start
+    start = time.perf_counter()
+    store.lexical
+    build_lexical = time.perf_counter() - start
+    print(f"chunks: {len(texts)}, queries: {len(queries)}, embeddings: {args.embeddings}")
+    print(f"build: dense {build_dense:.2f}s (includes embedding), BM25 {build_lexical:.2f}s")
+
+    modes = {
+        "dense": {"lexical": False},
+        "hybrid": {"lexical": True},
+        "hybrid+mmr": {"lexical": True, "mmr": True},
+    }
+    print(f"{'mode':<12} {'k':>3} {'recall@k':>9} {'mean ms':>8} {'p95 ms':>8}")
+    for k in args.k:
+        for name, options in modes.items():
+            recall, mean_ms, p95_ms = evaluate(store, embeddings, queries, k,
+                                               fetch_k=max(args.fetch_k, k), **options)
+            print(f"{name:<12} {k:>3} {recall:>9.3f} {mean_ms:>8.2f} {p95_ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
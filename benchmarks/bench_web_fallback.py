@@ -0,0 +1,90 @@
+# benchmarks/bench_web_fallback.py
+"""/ask latency when the documents do not answer and the internet fallback runs.
+
+Usage: python benchmarks/bench_web_fallback.py [--questions 10] [--model-ms 800]
+                                               [--search-ms 600 3000] [--deadline 2.0]
+
+Offline: the chat model is a local stand-in that always says the documents do
+not contain the answer after --model-ms, and the search backend is
+benchmarks/web_search_stub.py with --search-ms latency. Compares searching
+after the answer with no deadline (the old behaviour), after the answer
+with the deadline, and speculatively alongside the answer, then the same
+questions again from the result cache. A slow search shows the deadline
+capping what the fallback adds.
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(tempfile.mkdtemp())
+
+from bench_ask_batch import SlowChatModel
+from bench_retrieval import HashingEmbeddings, make_corpus
+from web_search_stub import WebSearchStubServer
+from services.clients import clients
+from services.collection_index import CollectionIndex, chunk_ids
+from services.collection_store import empty_manifest, new_collection_id, save_collection
+from services.web_search import WebSearch, HttpSearchBackend
+from services import chatutils
+
+
+def run(collection_id, questions):
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        chatutils.answer_from_collection(collection_id, question)
+        latencies.append(time.perf_counter() - start)
+    return np.asarray(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--model-ms", type=float, default=800)
+    parser.add_argument("--search-ms", type=float, nargs="+", default=[600, 3000])
+    parser.add_argument("--deadline", type=float, default=2.0)
+    args = parser.parse_args()
+
+    os.environ.setdefault("GOOGLE_API_KEY", "unused")
+    clients.register("embeddings", HashingEmbeddings)
+    clients.register("chat_model", lambda: SlowChatModel(
+        responses=["unused"], latency=args.model_ms / 1000, answer=chatutils.NO_ANSWER_MARKER
+    ))
+    texts, _, _ = make_corpus(500, random.Random(0))
+    store = CollectionIndex.from_texts(texts, HashingEmbeddings(), ids=chunk_ids("bench", len(texts)))
+    manifest = empty_manifest()
+    manifest["documents"]["bench"] = {"filename": "bench.pdf", "chunk_count": len(texts)}
+    collection_id = new_collection_id()
+    save_collection(collection_id, manifest, store)
+
+    print(f"questions: {args.questions}, model: {args.model_ms:.0f}ms, deadline: {args.deadline:.1f}s")
+    print(f"{'search ms':>9} {'mode':<22} {'mean ms':>8} {'p95 ms':>8} {'added ms':>9}")
+    for search_ms in args.search_ms:
+        stub = WebSearchStubServer(latency=search_ms / 1000).start()
+        modes = [
+            ("after, no deadline", False, 3600.0),
+            ("after, deadline", False, args.deadline),
+            ("speculative", True, args.deadline),
+            ("speculative, cached", True, args.deadline),
+        ]
+        for i, (name, speculative, deadline) in enumerate(modes):
+            if name != "speculative, cached":
+                web_search = WebSearch(HttpSearchBackend(stub.url), deadline=deadline, speculative=speculative)
+                clients.register("web_search", lambda web_search=web_search: web_search)
+            chatutils.answer_cache.invalidate(collection_id)
+            # Fresh questions per mode, except the cached run which repeats the previous ones
+            offset = (i - (name == "speculative, cached")) * args.questions
+            latencies = run(collection_id, [f"question {search_ms} {offset + n}" for n in range(args.questions)])
+            print(f"{search_ms:>9.0f} {name:<22} {np.mean(latencies):>8.0f} {np.percentile(latencies, 95):>8.0f} "
+                  f"{np.mean(latencies) - args.model_ms:>9.0f}")
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/fakes.py
+"""Deterministic local stand-ins for every external service the app calls, with injected latency.
+
+install_fakes() registers them in the app's client registry:
+- embeddings: hashed bag-of-words vectors (bench_retrieval.HashingEmbeddings)
+  behind the app's embedding cache, one round trip per request
+- chat_model and summary_model: a chat model that answers after a round trip,
+  saying the documents do not contain the answer for `fallback_ratio` of questions
+- web_search: the HTTP backend pointed at web_search_stub.WebSearchStubServer
+- arxiv_search: the arXiv client pointed at arxiv_stub.ArxivStubServer, unthrottled
+
+and returns the stub servers so callers can stop them.
+"""
+import os
+import sys
+import time
+import zlib
+from typing import Any, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.language_models.chat_models import SimpleChatModel
+from langchain_core.messages import BaseMessage
+from arxiv_stub import ArxivStubServer
+from bench_retrieval import HashingEmbeddings
+from web_search_stub import WebSearchStubServer
+from services.clients import clients
+from services.embedding_cache import CachedEmbeddings
+from services.web_search import WebSearch, HttpSearchBackend
+from services.arxiv_search import ArxivSearch
+from services.chatutils import NO_ANSWER_MARKER
+
+ANSWER = "The documents describe this in detail. It is covered in the sections on retrieval and indexing."
+
+
+class FakeEmbeddings(HashingEmbeddings):
+    """Hashing embeddings with a fixed round trip per request, as with a remote batch endpoint."""
+
+    def __init__(self, latency=0.0, size=768):
+        super().__init__(size)
+        self.latency = latency
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        time.sleep(self.latency)
+        return super().embed_query(text)
+
+
+class FakeChatModel(SimpleChatModel):
+    """Chat model that answers every prompt after `latency` seconds.
+
+    A deterministic `fallback_ratio` of prompts (by hash) get the "documents do
+    not contain this information" answer, which sends /ask to the internet fallback.
+    """
+
+    latency: float = 0.0
+    fallback_ratio: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return "fake-latency-chat-model"
+
+    def _call(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None,
+              **kwargs: Any) -> str:
+        time.sleep(self.latency)
+        prompt = messages[-1].content if messages else ""
+        if zlib.crc32(prompt.encode()) % 1000 < self.fallback_ratio * 1000:
+            return NO_ANSWER_MARKER
+        return ANSWER
+
+
+def install_fakes(embed_ms=0.0, model_ms=0.0, search_ms=0.0, arxiv_ms=0.0, fallback_ratio=0.0):
+    """Swap every external client of the app for a local fake; returns (web search stub, arXiv stub)."""
+    os.environ.setdefault("GOOGLE_API_KEY", "unused")
+    web_stub = WebSearchStubServer(latency=search_ms / 1000).start()
+    arxiv_stub = ArxivStubServer(latency=arxiv_ms / 1000).start()
+    clients.register("embeddings", lambda: CachedEmbeddings(FakeEmbeddings(embed_ms / 1000), "fake-hashing"))
+    clients.register("chat_model", lambda: FakeChatModel(latency=model_ms / 1000, fallback_ratio=fallback_ratio))
+    clients.register("summary_model", lambda: FakeChatModel(latency=model_ms / 1000))
+    clients.register("web_search", lambda: WebSearch(HttpSearchBackend(web_stub.url)))
+    clients.register("arxiv_search", lambda: ArxivSearch(api_url=arxiv_stub.url, min_interval=0))
+    return web_stub, arxiv_stub
@@ -0,0 +1,84 @@
+# benchmarks/synthetic_pdf.py
+"""Synthetic PDFs with real extractable text, for benchmarks that go through the upload path.
+
+Usage: python benchmarks/synthetic_pdf.py [--pages 20] [--seed 0] out.pdf
+
+Pages are written as plain Helvetica text in a minimal hand-built PDF, so no
+PDF library is needed to make them and PyPDF2 extracts the text back. The text
+is seeded: the same (pages, seed) always gives the same bytes, and different
+seeds give documents that share no stored pages or cached embeddings.
+"""
+import random
+import argparse
+
+LINES_PER_PAGE = 45
+WORDS_PER_LINE = 12
+TOPICS = [
+    "retrieval", "embedding", "transformer", "attention", "gradient", "corpus", "index", "latency",
+    "summary", "citation", "dataset", "benchmark", "encoder", "decoder", "token", "vector",
+]
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages):
+    """A PDF with one page per string of `pages`; lines are separated by newlines."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(len(pages)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    font_id = 3 + 2 * len(pages)
+    for i, text in enumerate(pages):
+        lines = " ".join(f"({_escape(line)}) Tj T*" for line in text.split("\n"))
+        stream = f"BT /F1 10 Tf 40 800 Td 12 TL {lines} ET".encode("latin-1", "replace")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Contents {4 + 2 * i} 0 R "
+                       f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>".encode())
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def synthetic_pages(pages, seed=0):
+    """Page texts about a few topics each, with seed-specific terms so documents differ."""
+    rng = random.Random(seed)
+    vocabulary = [f"{topic}{rng.randint(0, 999)}" for topic in TOPICS] + TOPICS
+    texts = []
+    for page in range(pages):
+        topics = rng.sample(vocabulary, 6)
+        lines = [
+            " ".join(rng.choice(topics) if rng.random() < 0.4 else rng.choice(vocabulary) for _ in range(WORDS_PER_LINE))
+            .capitalize() + "."
+            for _ in range(LINES_PER_PAGE)
+        ]
+        texts.append(f"Document {seed} page {page + 1}\n" + "\n".join(lines))
+    return texts
+
+
+def synthetic_pdf(pages, seed=0):
+    return make_pdf(synthetic_pages(pages, seed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("output")
+    args = parser.parse_args()
+    with open(args.output, "wb") as f:
+        f.write(synthetic_pdf(args.pages, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/web_search_stub.py
+"""Local stand-in for a JSON web search API, for exercising the internet fallback offline.
+
+Usage: python benchmarks/web_search_stub.py [--port 8766] [--latency 1.0]
+then run the app with WEB_SEARCH_BACKEND=http WEB_SEARCH_URL=http://127.0.0.1:8766/search.
+
+Answers GET /search?q=...&format=json in SearXNG's result format with three
+deterministic results per query, after `latency` seconds.
+"""
+import json
+import time
+import hashlib
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+def results_for(query):
+    digest = hashlib.sha256(query.encode()).hexdigest()[:8]
+    return {"query": query, "results": [
+        {"url": f"https://example.org/{digest}/{i}", "title": f"Result {i + 1} for {query}",
+         "content": f"A page about {query}."}
+        for i in range(3)
+    ]}
+
+
+class WebSearchStubServer:
+    """Stub search API on 127.0.0.1 in a background thread; counts requests served."""
+
+    def __init__(self, port=0, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                time.sleep(stub.latency)
+                query = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+                body = json.dumps(results_for(query)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up waiting
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/search"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds added to every response")
+    args = parser.parse_args()
+    stub = WebSearchStubServer(args.port, args.latency)
+    print(f"Serving stub search API at {stub.url}")
+    stub.server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
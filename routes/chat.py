@@ -1,44 +1,278 @@
 # routes/chat.py
-from flask import Blueprint, request, render_template, jsonify
+import time
+import logging
+from flask import Blueprint, request, render_template, jsonify, url_for
 from services.chatutils import (
-    get_pdf_text,
-    get_text_chunks,
-    get_vector_store,
-    get_conversational_chain,
-    search_internet,
+    get_pdf_documents,
+    add_documents_to_collection,
+    document_collection,
+    remove_document_from_collection,
+    compact_collection,
+    answer_from_collection,
+    answer_batch_from_collection,
+    retrieve,
+    build_context,
+    stream_answer,
+    start_internet_search,
+    with_internet_fallback,
     normalize_question,
+    get_embeddings,
+    index_registry,
+    answer_cache,
+    context_stats,
+    ASK_BATCH_MAX_QUESTIONS,
 )
-from langchain.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from services.collection_store import (
+    new_collection_id,
+    current_version,
+    read_manifest,
+    CollectionNotFoundError,
+    DocumentNotFoundError,
+)
+from services.pdf_extract import spool_pdf_files, load_spooled_pdf_files
+from services.documents import get_document, DocumentNotIngestedError, NoExtractableTextError
+from services.jobs import job_queue
+from services.keywords import get_keyword_extractor, group_chunks_by_document
+from services.streaming import sse_event, sse_response
+from services.web_search import get_web_search
 
 chat_bp = Blueprint('chat', __name__)
+logger = logging.getLogger(__name__)
 
 @chat_bp.route('/')
 def index():
     return render_template('index.html')
 
+def requested_collection_id(values):
+    """The collection to answer from: `collection_id`, or the single-document collection of an ingested `doc_id`."""
+    collection_id = values.get('collection_id')
+    doc_id = values.get('doc_id')
+    if not collection_id and doc_id:
+        collection_id = document_collection(doc_id)
+    return collection_id
+
+def run_upload_job(job):
+    """Background half of /upload: extract, embed and publish the new collection."""
+    collection_id = job.payload["collection_id"]
+    documents = load_spooled_pdf_files(job.dir, job.payload["files"])
+    doc_ids, embedding_stats = add_documents_to_collection(collection_id, documents, on_stage=job.stage)
+    return {
+        "message": "Files processed successfully",
+        "collection_id": collection_id,
+        "doc_ids": doc_ids,
+        "embedding_cache": embedding_stats
+    }
+
+job_queue.register("upload", run_upload_job)
+
 @chat_bp.route('/upload', methods=['POST'])
 def upload_files():
-    uploaded_files = request.files.getlist("files")
-    text = get_pdf_text(uploaded_files)
-    text_chunks = get_text_chunks(text)
-    vectorstore = get_vector_store(text_chunks)
-    return jsonify({"message": "Files processed successfully"})
+    """Queue the uploaded files for indexing; poll /jobs/<job_id> until the collection is ready."""
+    documents = get_pdf_documents(request.files.getlist("files"))
+    if not documents:
+        return jsonify({"error": "No files uploaded"}), 400
+    collection_id = new_collection_id()
+    listing, files = spool_pdf_files(documents)
+    job_id = job_queue.submit("upload", {"collection_id": collection_id, "files": listing}, files)
+    return jsonify({
+        "message": "Files queued for processing",
+        "collection_id": collection_id,
+        "doc_ids": [document["doc_id"] for document in documents],
+        "job_id": job_id,
+        "status_url": url_for('jobs.job_status', job_id=job_id)
+    }), 202
+
+@chat_bp.route('/documents/<doc_id>', methods=['GET'])
+def get_ingested_document(doc_id):
+    """Record of an ingested document: pages, characters and chunk counts per granularity."""
+    try:
+        return jsonify(get_document(doc_id))
+    except DocumentNotIngestedError as e:
+        return jsonify({"error": str(e)}), 404
+
+@chat_bp.route('/collections/<collection_id>/documents', methods=['GET'])
+def list_documents(collection_id):
+    try:
+        _, index_dir = current_version(collection_id)
+    except CollectionNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    return jsonify({"collection_id": collection_id, "documents": read_manifest(index_dir)["documents"]})
+
+@chat_bp.route('/collections/<collection_id>/documents', methods=['POST'])
+def append_documents(collection_id):
+    try:
+        # Appending never creates a collection implicitly
+        current_version(collection_id)
+        documents = get_pdf_documents(request.files.getlist("files"))
+        doc_ids, embedding_stats = add_documents_to_collection(collection_id, documents)
+    except CollectionNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    return jsonify({
+        "message": "Files processed successfully",
+        "collection_id": collection_id,
+        "doc_ids": doc_ids,
+        "embedding_cache": embedding_stats
+    })
+
+@chat_bp.route('/collections/<collection_id>/documents/<doc_id>', methods=['DELETE'])
+def delete_document(collection_id, doc_id):
+    try:
+        remove_document_from_collection(collection_id, doc_id)
+    except (CollectionNotFoundError, DocumentNotFoundError) as e:
+        return jsonify({"error": str(e)}), 404
+    return jsonify({"message": f"Document {doc_id} deleted", "collection_id": collection_id})
+
+@chat_bp.route('/collections/<collection_id>/keywords', methods=['GET'])
+def collection_keywords(collection_id):
+    """Key phrases of every document in a collection, scored against the whole collection."""
+    num_keywords = request.args.get('k', 5, type=int)
+    try:
+        vector_store = index_registry.get(collection_id)
+    except CollectionNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    groups = group_chunks_by_document(vector_store.iter_chunks())
+    return jsonify({
+        "collection_id": collection_id,
+        "keywords": get_keyword_extractor().extract_grouped(groups, num_keywords)
+    })
+
+@chat_bp.route('/collections/<collection_id>/compact', methods=['POST'])
+def compact(collection_id):
+    try:
+        current_version(collection_id)
+        removed = compact_collection(collection_id)
+    except CollectionNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    return jsonify({"collection_id": collection_id, "removed_chunks": removed})
 
 @chat_bp.route('/ask', methods=['POST'])
 def ask_question():
     user_question = request.form['question']
+    if not request.form.get('collection_id') and not request.form.get('doc_id'):
+        return jsonify({"error": "No collection_id or doc_id provided"}), 400
     normalized_question = normalize_question(user_question)
 
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    vector_store = FAISS.load_local("faiss_index", embeddings, allow_dangerous_deserialization=True)
-    docs = vector_store.similarity_search(normalized_question)
-    
-    chain = get_conversational_chain()
-    response = chain.invoke({"input_documents": docs, "question": normalized_question})
+    try:
+        collection_id = requested_collection_id(request.form)
+        answer, cached = answer_from_collection(collection_id, normalized_question)
+    except (CollectionNotFoundError, DocumentNotIngestedError) as e:
+        return jsonify({"error": str(e)}), 404
+    except NoExtractableTextError as e:
+        return jsonify({"error": str(e)}), 422
     
-    if not response["output_text"].strip() or "The provided documents do not contain this information" in response["output_text"]:
-        internet_result = search_internet(normalized_question)
-        response["output_text"] += f"\n\nInternet Search Result:\n{internet_result}"
-    
-    return jsonify({"response": response["output_text"]})
+    return jsonify({"response": answer, "cached": cached})
+
+@chat_bp.route('/ask/batch', methods=['POST'])
+def ask_questions_batch():
+    """Answer a list of questions in one request; results come back in the order asked."""
+    data = request.get_json(silent=True) or {}
+    questions = data.get('questions')
+    if not data.get('collection_id') and not data.get('doc_id'):
+        return jsonify({"error": "No collection_id or doc_id provided"}), 400
+    if not isinstance(questions, list) or not questions or not all(isinstance(q, str) and q.strip() for q in questions):
+        return jsonify({"error": "questions must be a non-empty list of strings"}), 400
+    if len(questions) > ASK_BATCH_MAX_QUESTIONS:
+        return jsonify({"error": f"At most {ASK_BATCH_MAX_QUESTIONS} questions per batch"}), 400
+
+    try:
+        collection_id = requested_collection_id(data)
+        results, timings = answer_batch_from_collection(collection_id, [normalize_question(q) for q in questions])
+    except (CollectionNotFoundError, DocumentNotIngestedError) as e:
+        return jsonify({"error": str(e)}), 404
+    except NoExtractableTextError as e:
+        return jsonify({"error": str(e)}), 422
+    for result, question in zip(results, questions):
+        result["question"] = question
+    return jsonify({"results": results, "timings": timings})
+
+@chat_bp.route('/ask/stream', methods=['POST'])
+def ask_question_stream():
+    """Answer a question as server-sent events: retrieval results, then tokens, then timings."""
+    user_question = request.form['question']
+    if not request.form.get('collection_id') and not request.form.get('doc_id'):
+        return jsonify({"error": "No collection_id or doc_id provided"}), 400
+    normalized_question = normalize_question(user_question)
+
+    start = time.perf_counter()
+    try:
+        collection_id = requested_collection_id(request.form)
+        stamp, vector_store = index_registry.get_versioned(collection_id)
+    except (CollectionNotFoundError, DocumentNotIngestedError) as e:
+        return jsonify({"error": str(e)}), 404
+    except NoExtractableTextError as e:
+        return jsonify({"error": str(e)}), 422
+
+    def generate():
+        try:
+            cached = answer_cache.get(collection_id, stamp, normalized_question)
+            query_vector = None
+            if cached is None:
+                query_vector = get_embeddings().embed_query(normalized_question)
+                cached = answer_cache.get_similar(collection_id, stamp, query_vector)
+            if cached is not None:
+                ttft_ms = (time.perf_counter() - start) * 1000
+                yield sse_event("token", {"text": cached})
+                # The fallback is never cached; it is looked up again (from the web search cache, usually)
+                answer = with_internet_fallback(normalized_question, cached)
+                if len(answer) > len(cached):
+                    yield sse_event("token", {"text": answer[len(cached):]})
+                total_ms = (time.perf_counter() - start) * 1000
+                yield sse_event("done", {"ttft_ms": round(ttft_ms, 1), "total_ms": round(total_ms, 1), "cached": True})
+                return
+
+            search = start_internet_search(normalized_question)
+            docs, context = build_context(retrieve(vector_store, normalized_question, query_vector))
+            retrieval_ms = (time.perf_counter() - start) * 1000
+            yield sse_event("retrieval", {
+                "documents": [
+                    {"source": doc.metadata.get("source"), "page": doc.metadata.get("page"), "text": doc.page_content[:300]}
+                    for doc in docs
+                ],
+                "context_tokens": context["tokens_after"],
+                "retrieved_tokens": context["tokens_before"],
+                "retrieval_ms": round(retrieval_ms, 1),
+            })
+
+            answer = []
+            ttft_ms = None
+            for token in stream_answer(docs, normalized_question):
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - start) * 1000
+                answer.append(token)
+                yield sse_event("token", {"text": token})
+
+            answer = "".join(answer)
+            answer_cache.put(collection_id, stamp, normalized_question, answer, query_vector)
+            full_answer = with_internet_fallback(normalized_question, answer, search)
+            if len(full_answer) > len(answer):
+                yield sse_event("token", {"text": full_answer[len(answer):]})
+
+            total_ms = (time.perf_counter() - start) * 1000
+            logger.info(f"/ask/stream: retrieval {retrieval_ms:.0f}ms, first token {ttft_ms or 0:.0f}ms, total {total_ms:.0f}ms")
+            yield sse_event("done", {
+                "retrieval_ms": round(retrieval_ms, 1),
+                "ttft_ms": round(ttft_ms, 1) if ttft_ms is not None else None,
+                "total_ms": round(total_ms, 1),
+                "cached": False,
+            })
+        except Exception as e:
+            logger.error(f"Error in ask_question_stream: {e}")
+            yield sse_event("error", {"error": str(e)})
+
+    return sse_response(generate())
+
+@chat_bp.route('/index/stats', methods=['GET'])
+def index_stats():
+    return jsonify(index_registry.stats())
+
+@chat_bp.route('/answer-cache/stats', methods=['GET'])
+def answer_cache_stats():
+    return jsonify(answer_cache.stats())
+
+@chat_bp.route('/context/stats', methods=['GET'])
+def context_size_stats():
+    return jsonify(context_stats.stats())
+
+@chat_bp.route('/web-search/stats', methods=['GET'])
+def web_search_stats():
+    return jsonify(get_web_search().stats())
@@ -1,54 +1,98 @@
 # routes/external.py
-from flask import Blueprint, request, jsonify
-from services.summ import get_pdf_text, get_text_chunks, summarize_text
-from services.external import extract_keywords, search_papers, clean_paper_data,download_paper
+import logging
+from flask import Blueprint, request, jsonify, url_for
+from services.summ import get_pdf_chunks, summarize_text
+from services.external import (
+    extract_keywords,
+    extract_keywords_batch,
+    extract_chunk_keywords,
+    search_papers,
+    clean_paper_data,
+    download_paper,
+)
+from services.pdf_extract import read_pdf_files, spool_pdf_files, load_spooled_pdf_files
+from services.documents import get_documents, DocumentNotIngestedError
+from services.jobs import job_queue
 
 external_bp = Blueprint('external', __name__)
+logger = logging.getLogger(__name__)
+
+def run_search_related_job(job):
+    """Summarize the PDF files, extract keywords and search for related papers."""
+    job.stage("extract")
+    # Ingested documents are referenced by ID; only new uploads are spooled and parsed
+    pdf_files = [{"doc_id": doc_id} for doc_id in job.payload.get("doc_ids", [])]
+    pdf_files += load_spooled_pdf_files(job.dir, job.payload["files"])
+    text_chunks = get_pdf_chunks(pdf_files)
+    if not text_chunks:
+        raise ValueError("No text chunks created from the uploaded files.")
+
+    # Generate the summary
+    job.stage("summarize", chunks=len(text_chunks))
+    summary = summarize_text(text_chunks)
+
+    # Extract keywords from the document text itself, scored across its chunks
+    job.stage("keywords")
+    keywords = extract_chunk_keywords(text_chunks)
+
+    # Search for related papers using the keywords
+    job.stage("search", keywords=len(keywords))
+    papers = search_papers(keywords, document_text=summary)
+
+    # Clean and validate paper data
+    cleaned_papers = clean_paper_data(papers)
+    job.progress(papers=len(cleaned_papers))
+
+    return {
+        "doc_ids": [f["doc_id"] for f in pdf_files],
+        "summary": summary,
+        "keywords": keywords,
+        "related_papers": cleaned_papers
+    }
+
+job_queue.register("search_related", run_search_related_job)
 
 @external_bp.route('/search_related', methods=['POST'])
 def search_related_papers():
-    """Endpoint to summarize PDF files, extract keywords and search for related papers."""
+    """Queue a related-paper search for the uploaded PDF files and/or ingested `doc_id`s; poll /jobs/<job_id> for the result."""
     try:
-        uploaded_files = request.files.getlist("files")
-        text = get_pdf_text(uploaded_files)
-        text_chunks = get_text_chunks(text)
-        
-        if not text_chunks:
-            return jsonify({"error": "No text chunks created from the uploaded files."}), 400
-            
-        # Generate the summary
-        summary = summarize_text(text_chunks)
-        
-        # Extract keywords from the summary
-        keywords = extract_keywords(summary)
-        
-        # Search for related papers using the keywords
-        papers = search_papers(keywords)
-        
-        # Clean and validate paper data
-        cleaned_papers = clean_paper_data(papers)
-        
+        doc_ids = [document["doc_id"] for document in get_documents(request.form.getlist("doc_id"))]
+        pdf_files = read_pdf_files(request.files.getlist("files"))
+        if not pdf_files and not doc_ids:
+            return jsonify({"error": "No files uploaded"}), 400
+
+        listing, files = spool_pdf_files(pdf_files)
+        job_id = job_queue.submit("search_related", {"files": listing, "doc_ids": doc_ids}, files)
         return jsonify({
-            "summary": summary,
-            "keywords": keywords,
-            "related_papers": cleaned_papers
-        })
-        
+            "job_id": job_id,
+            "status_url": url_for('jobs.job_status', job_id=job_id)
+        }), 202
+
+    except DocumentNotIngestedError as e:
+        return jsonify({"error": str(e)}), 404
     except Exception as e:
         logger.error(f"Error in search_related_papers: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 @external_bp.route('/extract_keywords', methods=['POST'])
 def get_keywords():
-    """Endpoint to extract keywords from the summary."""
+    """Endpoint to extract keywords from a summary, or from each of a batch of texts."""
     try:
         data = request.get_json()
+        num_keywords = int(data.get('num_keywords', 5))
+
+        texts = data.get('texts')
+        if texts is not None:
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                return jsonify({"error": "texts must be a list of strings"}), 400
+            return jsonify({"keywords": extract_keywords_batch(texts, num_keywords)})
+
         summary = data.get('summary', '')
         
         if not summary:
             return jsonify({"error": "No summary provided"}), 400
             
-        keywords = extract_keywords(summary)
+        keywords = extract_keywords(summary, num_keywords)
         return jsonify({"keywords": keywords})
         
     except Exception as e:
@@ -0,0 +1,13 @@
+# routes/jobs.py
+from flask import Blueprint, jsonify
+from services.jobs import job_queue, JobNotFoundError
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Status of a background job with per-stage progress and timings, and its result once done."""
+    try:
+        return jsonify(job_queue.status(job_id))
+    except JobNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
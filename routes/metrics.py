@@ -0,0 +1,55 @@
+# routes/metrics.py
+import re
+import time
+from flask import Blueprint, Response, g, jsonify, request
+from services.metrics import metrics
+from services.boot import boot_report
+from services.request_log import (
+    REQUEST_ID_HEADER,
+    new_request_id,
+    set_request_id,
+    reset_request_id,
+)
+
+metrics_bp = Blueprint('metrics', __name__)
+
+request_seconds = metrics.histogram(
+    "pdfchat_request_seconds",
+    "Time to respond to an HTTP request, until the first byte for streamed responses",
+    ("endpoint", "method", "status"),
+)
+
+# Accept a caller's request ID only if it is short and printable
+VALID_REQUEST_ID = re.compile(r"^[\w.:-]{1,64}$")
+
+@metrics_bp.before_app_request
+def start_request():
+    request_id = request.headers.get(REQUEST_ID_HEADER, "")
+    g.request_id = request_id if VALID_REQUEST_ID.match(request_id) else new_request_id()
+    g.request_id_token = set_request_id(g.request_id)
+    g.request_start = time.perf_counter()
+
+@metrics_bp.after_app_request
+def finish_request(response):
+    if "request_start" in g:
+        endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        request_seconds.observe(time.perf_counter() - g.request_start,
+                                endpoint=endpoint, method=request.method, status=response.status_code)
+        response.headers[REQUEST_ID_HEADER] = g.request_id
+    return response
+
+@metrics_bp.teardown_app_request
+def end_request(exception=None):
+    token = g.pop("request_id_token", None)
+    if token is not None:
+        reset_request_id(token)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage and request latency histograms of this process, in the Prometheus text format."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@metrics_bp.route('/boot', methods=['GET'])
+def boot_stats():
+    """Import and warmup timings of this worker, and which heavy dependencies it has loaded so far."""
+    return jsonify(boot_report.as_dict())
@@ -1,21 +1,72 @@
 # routes/summ.py
+import time
+import logging
 from flask import Blueprint, request, jsonify
-from services.summ import get_pdf_text, get_text_chunks, summarize_text
+from services.summ import get_pdf_chunks, summarize_text, stream_summary
+from services.pdf_extract import read_pdf_files
+from services.documents import get_documents, DocumentNotIngestedError
+from services.streaming import sse_event, sse_response
+from services.request_log import debug_sample
 
 summ_bp = Blueprint('summ', __name__)
+logger = logging.getLogger(__name__)
+
+def _requested_documents():
+    """Documents already ingested (repeated `doc_id` fields) followed by the uploaded `files`."""
+    return get_documents(request.form.getlist("doc_id")) + read_pdf_files(request.files.getlist("files"))
 
 @summ_bp.route('/summarize', methods=['POST'])
 def summarize_files():
-    uploaded_files = request.files.getlist("files")
-    text = get_pdf_text(uploaded_files)
-    text_chunks = get_text_chunks(text)
+    try:
+        pdf_files = _requested_documents()
+    except DocumentNotIngestedError as e:
+        return jsonify({"error": str(e)}), 404
+    text_chunks = get_pdf_chunks(pdf_files)
 
-    # Debugging: Print text and text chunks
-    print("Extracted Text:", text)
-    print("Text Chunks:", text_chunks)
+    debug_sample(logger, lambda: f"Text chunks ({len(text_chunks)}): "
+                                 + " | ".join(chunk[:200] for chunk in text_chunks[:5]))
 
     if not text_chunks:
         return jsonify({"error": "No text chunks created from the uploaded files."}), 400
 
     summary = summarize_text(text_chunks)
-    return jsonify({"summary": summary})
+    return jsonify({"summary": summary, "doc_ids": [f["doc_id"] for f in pdf_files]})
+
+@summ_bp.route('/summarize/stream', methods=['POST'])
+def summarize_files_stream():
+    """Summarize PDF files as server-sent events: progress, then summary tokens, then timings."""
+    # Read the uploads now; the request body is gone once streaming starts
+    try:
+        pdf_files = _requested_documents()
+    except DocumentNotIngestedError as e:
+        return jsonify({"error": str(e)}), 404
+    start = time.perf_counter()
+
+    def generate():
+        try:
+            text_chunks = get_pdf_chunks(pdf_files)
+            if not text_chunks:
+                yield sse_event("error", {"error": "No text chunks created from the uploaded files."})
+                return
+            extract_ms = (time.perf_counter() - start) * 1000
+            yield sse_event("status", {"stage": "extracted", "chunks": len(text_chunks), "elapsed_ms": round(extract_ms, 1),
+                                       "doc_ids": [f["doc_id"] for f in pdf_files]})
+
+            ttft_ms = None
+            for token in stream_summary(text_chunks):
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - start) * 1000
+                yield sse_event("token", {"text": token})
+
+            total_ms = (time.perf_counter() - start) * 1000
+            logger.info(f"/summarize/stream: extraction {extract_ms:.0f}ms, first token {ttft_ms or 0:.0f}ms, total {total_ms:.0f}ms")
+            yield sse_event("done", {
+                "extract_ms": round(extract_ms, 1),
+                "ttft_ms": round(ttft_ms, 1) if ttft_ms is not None else None,
+                "total_ms": round(total_ms, 1),
+            })
+        except Exception as e:
+            logger.error(f"Error in summarize_files_stream: {e}")
+            yield sse_event("error", {"error": str(e)})
+
+    return sse_response(generate())
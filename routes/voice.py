@@ -1,94 +1,131 @@
 #voice_interactive.py
 from flask import Blueprint, jsonify, request
-import speech_recognition as sr
-from langchain.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+import time
 import logging
-from services.chatutils import get_conversational_chain, normalize_question
+from services.chatutils import normalize_question, answer_from_collection
+from services.collection_store import CollectionNotFoundError
+from services.clients import clients
+from services.voice import (
+    get_speech_to_text,
+    load_audio,
+    audio_seconds,
+    voice_uploads,
+    UploadNotFoundError,
+    PCM_SAMPLE_RATE,
+    PCM_SAMPLE_WIDTH,
+)
 
 voice_interactive_bp = Blueprint('voice-interactive', __name__, url_prefix='/voice-interactive')
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _ms(since):
+    return round((time.perf_counter() - since) * 1000, 1)
+
 class VoiceHandler:
-    def __init__(self):
-        self.recognizer = sr.Recognizer()
-        self.embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        self.chain = get_conversational_chain()
-        
-    def get_answer_from_docs(self, question):
+    def get_answer_from_docs(self, question, collection_id, timings=None):
         """Get answer from the processed documents"""
         try:
-            # Load the existing vector store
-            vector_store = FAISS.load_local(
-                "faiss_index",
-                self.embeddings,
-                allow_dangerous_deserialization=True
-            )
-            
-            # Get relevant documents
+            # Same cached retrieval and answer path as /ask
             normalized_question = normalize_question(question)
-            docs = vector_store.similarity_search(normalized_question)
-            
-            # Get response using the chain
-            response = self.chain.invoke({
-                "input_documents": docs,
-                "question": normalized_question
-            })
-            
-            return response.get("output_text", "").strip()
-            
+            answer, _ = answer_from_collection(collection_id, normalized_question, timings)
+
+            return answer.strip()
+
         except Exception as e:
             logger.error(f"Error getting answer: {e}")
             raise
 
-    def transcribe_audio(self):
-        """Capture and transcribe audio"""
+    def transcribe_audio(self, audio):
+        """Transcribe a recording uploaded by the browser"""
         try:
-            with sr.Microphone() as source:
-                logger.info("Adjusting for ambient noise...")
-                self.recognizer.adjust_for_ambient_noise(source, duration=1)
-                
-                logger.info("Listening for speech...")
-                audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=15)
-                
-                logger.info("Transcribing speech...")
-                text = self.recognizer.recognize_google(audio)
-                logger.info(f"Transcribed text: {text}")
-                
-                return text
-                
-        except sr.UnknownValueError:
-            logger.error("Could not understand audio")
-            raise ValueError("Could not understand audio")
-        except sr.RequestError as e:
-            logger.error(f"Could not request results: {e}")
+            text = get_speech_to_text().transcribe(audio)
+            logger.info(f"Transcribed text: {text}")
+            return text
+        except ValueError as e:
+            logger.error(f"Could not transcribe audio: {e}")
             raise
         except Exception as e:
             logger.error(f"Error during transcription: {e}")
             raise
 
+# One handler per worker instead of one per request
+clients.register("voice_handler", VoiceHandler)
+
+@voice_interactive_bp.route('/uploads', methods=['POST'])
+def create_upload():
+    """Open an upload for a recording streamed in chunks"""
+    return jsonify({"upload_id": voice_uploads.create()}), 201
+
+@voice_interactive_bp.route('/uploads/<upload_id>', methods=['PUT'])
+def append_upload(upload_id):
+    """Append a chunk of raw PCM (the request body) starting at byte ?offset="""
+    try:
+        offset = request.args.get('offset', type=int)
+        received = voice_uploads.append(upload_id, request.get_data(cache=False), offset)
+        return jsonify({"upload_id": upload_id, "received": received})
+    except UploadNotFoundError as ue:
+        return jsonify({"error": str(ue)}), 404
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 409
+
 @voice_interactive_bp.route('/start-conversation', methods=['POST'])
 def start_conversation():
-    """Handle voice input and return chat response"""
+    """Transcribe an uploaded recording and answer it from a collection.
+
+    The recording is either a streamed upload (`upload_id`, raw PCM at
+    `sample_rate`, default 16 kHz, 16-bit mono) or an `audio` file: WAV, AIFF,
+    FLAC, or raw PCM sent as audio/L16. The answer is retrieved as soon as the
+    transcript is final; timings has the upload, transcribe, retrieve and
+    generate stages in ms.
+    """
+    start = time.perf_counter()
     try:
-        voice_handler = VoiceHandler()
-        
+        collection_id = request.form.get('collection_id')
+        if not collection_id:
+            return jsonify({"error": "No collection_id provided"}), 400
+
+        upload_id = request.form.get('upload_id')
+        audio_file = request.files.get('audio')
+        if upload_id:
+            # Chunks arrived while the user spoke; only the assembly is left
+            data, content_type = voice_uploads.take(upload_id), "audio/l16"
+        elif audio_file:
+            data, content_type = audio_file.read(), audio_file.mimetype
+        else:
+            return jsonify({"error": "No audio provided"}), 400
+        audio = load_audio(
+            data,
+            content_type,
+            sample_rate=request.form.get('sample_rate', PCM_SAMPLE_RATE, type=int),
+            sample_width=request.form.get('sample_width', PCM_SAMPLE_WIDTH, type=int),
+        )
+        timings = {"upload_ms": _ms(start)}
+
+        voice_handler = clients.get("voice_handler")
+
         # Get transcribed text
-        transcribed_text = voice_handler.transcribe_audio()
-        if not transcribed_text:
-            return jsonify({"error": "No speech detected"}), 400
-        
+        stage = time.perf_counter()
+        transcribed_text = voice_handler.transcribe_audio(audio)
+        timings["transcribe_ms"] = _ms(stage)
+
         # Get answer from documents
-        response = voice_handler.get_answer_from_docs(transcribed_text)
-        
+        response = voice_handler.get_answer_from_docs(transcribed_text, collection_id, timings)
+        timings["total_ms"] = _ms(start)
+        logger.info(f"Voice question ({audio_seconds(audio):.1f}s of audio): upload {timings['upload_ms']:.0f}ms, "
+                    f"transcribe {timings['transcribe_ms']:.0f}ms, retrieve {timings['retrieve_ms']:.0f}ms, "
+                    f"generate {timings['generate_ms']:.0f}ms")
+
         return jsonify({
             "transcribed_text": transcribed_text,
-            "response": response
+            "response": response,
+            "audio_seconds": round(audio_seconds(audio), 2),
+            "timings": timings,
         })
-        
+
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
+    except (CollectionNotFoundError, UploadNotFoundError) as ne:
+        return jsonify({"error": str(ne)}), 404
     except Exception as e:
         logger.error(f"Error in conversation: {e}")
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
@@ -0,0 +1,118 @@
+# services/answer_cache.py
+import os
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_SEMANTIC = os.getenv("ANSWER_CACHE_SEMANTIC", "0") == "1"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+# Questions remembered per collection for the semantic tier
+SEMANTIC_MAX_PER_COLLECTION = 500
+
+
+def cache_question(question):
+    """Cache key form of a normalized question: whitespace collapsed, trailing punctuation dropped."""
+    return re.sub(r"\s+", " ", question).strip().rstrip("?.!").strip()
+
+
+class AnswerCache:
+    """Answers keyed on (collection, collection version, question).
+
+    The exact tier matches normalized question text. The optional semantic tier
+    reuses an answer when a new question's embedding has cosine similarity of at
+    least `threshold` with a cached question of the same collection version.
+    Entries of a collection are dropped as soon as a different version is seen.
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_MAX_ENTRIES, semantic=ANSWER_CACHE_SEMANTIC,
+                 threshold=ANSWER_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.semantic = semantic
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._exact = OrderedDict()
+        self._versions = {}
+        self._vectors = {}
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _check_version(self, collection_id, stamp):
+        # Caller holds self._lock
+        if self._versions.get(collection_id) != stamp:
+            self._drop(collection_id)
+            self._versions[collection_id] = stamp
+
+    def _drop(self, collection_id):
+        # Caller holds self._lock
+        for key in [key for key in self._exact if key[0] == collection_id]:
+            del self._exact[key]
+        self._vectors.pop(collection_id, None)
+        self._versions.pop(collection_id, None)
+
+    def get(self, collection_id, stamp, question):
+        """Exact-tier lookup; returns the cached answer or None."""
+        with self._lock:
+            self._check_version(collection_id, stamp)
+            key = (collection_id, stamp, cache_question(question))
+            answer = self._exact.get(key)
+            if answer is not None:
+                self._exact.move_to_end(key)
+                self.exact_hits += 1
+            elif not self.semantic:
+                self.misses += 1
+            return answer
+
+    def get_similar(self, collection_id, stamp, vector):
+        """Semantic-tier lookup by question embedding; returns the cached answer or None."""
+        if not self.semantic:
+            return None
+        query = np.asarray(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        with self._lock:
+            self._check_version(collection_id, stamp)
+            entry = self._vectors.get(collection_id)
+            if entry is not None and entry["answers"]:
+                scores = np.vstack(entry["vectors"]) @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self.semantic_hits += 1
+                    return entry["answers"][best]
+            self.misses += 1
+            return None
+
+    def put(self, collection_id, stamp, question, answer, vector=None):
+        with self._lock:
+            self._check_version(collection_id, stamp)
+            self._exact[(collection_id, stamp, cache_question(question))] = answer
+            while len(self._exact) > self.max_entries:
+                self._exact.popitem(last=False)
+
+            if self.semantic and vector is not None:
+                normalized = np.asarray(vector, dtype=np.float32)
+                normalized /= np.linalg.norm(normalized) or 1.0
+                entry = self._vectors.setdefault(collection_id, {"vectors": [], "answers": []})
+                entry["vectors"].append(normalized)
+                entry["answers"].append(answer)
+                if len(entry["answers"]) > SEMANTIC_MAX_PER_COLLECTION:
+                    del entry["vectors"][0], entry["answers"][0]
+
+    def invalidate(self, collection_id):
+        """Forget every answer of a collection, e.g. after this process changed its index."""
+        with self._lock:
+            self._drop(collection_id)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+                "entries": len(self._exact),
+                "semantic_enabled": self.semantic,
+                "threshold": self.threshold,
+            }
@@ -0,0 +1,281 @@
+# services/arxiv_search.py
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+from services.clients import clients
+from services.metrics import timed
+from services.boot import warmup
+
+logger = logging.getLogger(__name__)
+
+ARXIV_API_URL = os.getenv("ARXIV_API_URL", "https://export.arxiv.org/api/query")
+# arXiv asks API users for no more than one request every three seconds
+ARXIV_MIN_INTERVAL_SECONDS = float(os.getenv("ARXIV_MIN_INTERVAL_SECONDS", "3.0"))
+ARXIV_CONCURRENCY = int(os.getenv("ARXIV_CONCURRENCY", "4"))
+ARXIV_CACHE_DIR = os.getenv("ARXIV_CACHE_DIR", "arxiv_cache")
+ARXIV_CACHE_TTL_SECONDS = int(os.getenv("ARXIV_CACHE_TTL_SECONDS", str(24 * 3600)))
+ARXIV_NUM_RETRIES = 3
+ARXIV_TIMEOUT_SECONDS = 30
+# Results fetched per keyword sub-query before merging and re-ranking
+RESULTS_PER_KEYWORD = 10
+
+
+class RateLimiter:
+    """Spaces calls at least `min_interval` seconds apart across all threads."""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class RateLimitedSession(requests.Session):
+    """requests session that takes a rate limiter slot before every request, retries included."""
+
+    def __init__(self, limiter):
+        super().__init__()
+        self.limiter = limiter
+
+    def request(self, *args, **kwargs):
+        self.limiter.acquire()
+        return super().request(*args, **kwargs)
+
+
+class ArxivCache:
+    """Persistent TTL cache of query -> arxiv_ids and arxiv_id -> paper metadata (SQLite)."""
+
+    def __init__(self, cache_dir=ARXIV_CACHE_DIR, ttl_seconds=ARXIV_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "arxiv.sqlite"), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS queries (query TEXT PRIMARY KEY, arxiv_ids TEXT NOT NULL, fetched_at REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS papers (arxiv_id TEXT PRIMARY KEY, metadata TEXT NOT NULL, fetched_at REAL NOT NULL);
+        """)
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh_after(self):
+        return time.time() - self.ttl_seconds
+
+    def get_papers(self, arxiv_ids):
+        """Cached metadata of the given IDs, as {arxiv_id: paper}; expired or unknown IDs are left out."""
+        if not arxiv_ids:
+            return {}
+        placeholders = ",".join("?" * len(arxiv_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT arxiv_id, metadata FROM papers WHERE arxiv_id IN ({placeholders}) AND fetched_at >= ?",
+                (*arxiv_ids, self._fresh_after()),
+            ).fetchall()
+        return {arxiv_id: json.loads(metadata) for arxiv_id, metadata in rows}
+
+    def get_query(self, query):
+        """Cached results of a query in rank order, or None if missing, expired or incomplete."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT arxiv_ids FROM queries WHERE query = ? AND fetched_at >= ?", (query, self._fresh_after())
+            ).fetchone()
+        if row is not None:
+            arxiv_ids = json.loads(row[0])
+            papers = self.get_papers(arxiv_ids)
+            if len(papers) == len(arxiv_ids):
+                self.hits += 1
+                return [papers[arxiv_id] for arxiv_id in arxiv_ids]
+        self.misses += 1
+        return None
+
+    def put_papers(self, papers):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO papers (arxiv_id, metadata, fetched_at) VALUES (?, ?, ?)",
+                [(paper["arxiv_id"], json.dumps(paper), now) for paper in papers],
+            )
+
+    def put_query(self, query, papers):
+        self.put_papers(papers)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO queries (query, arxiv_ids, fetched_at) VALUES (?, ?, ?)",
+                (query, json.dumps([paper["arxiv_id"] for paper in papers]), time.time()),
+            )
+
+    def purge(self):
+        """Delete expired entries."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM queries WHERE fetched_at < ?", (self._fresh_after(),))
+            self._conn.execute("DELETE FROM papers WHERE fetched_at < ?", (self._fresh_after(),))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+def paper_dict(entry):
+    """Plain metadata of an entry of an arXiv Atom feed (as parsed by feedparser)."""
+    pdf_url = next((link.href for link in entry.get("links", []) if link.get("title") == "pdf"), None)
+    return {
+        'title': re.sub(r"\s+", " ", entry.title),
+        'authors': [author.name for author in entry.get("authors", [])],
+        'url': entry.id,
+        'pdf_url': pdf_url,
+        'abstract': entry.summary,
+        'published': time.strftime('%Y-%m-%d', entry.published_parsed),
+        'doi': entry.get("arxiv_doi"),
+        'source': 'arXiv',
+        'arxiv_id': entry.id.split("arxiv.org/abs/")[-1]
+    }
+
+
+def keyword_query(keyword):
+    """arXiv query for one keyword; multi-word phrases are matched as phrases."""
+    return f'all:"{keyword}"' if ' ' in keyword else f'all:{keyword}'
+
+
+class ArxivSearch:
+    """Related-paper search over arXiv shared by all requests of a process.
+
+    Requests to the export API go through one session rate limited across
+    threads and are parsed with feedparser. A persistent cache sits in front of
+    it; there is one sub-query per keyword, issued concurrently and merged by
+    arxiv_id, and optional re-ranking by embedding similarity.
+    """
+
+    def __init__(self, api_url=ARXIV_API_URL, min_interval=ARXIV_MIN_INTERVAL_SECONDS,
+                 concurrency=ARXIV_CONCURRENCY, cache=None):
+        self.api_url = api_url
+        self.session = RateLimitedSession(RateLimiter(min_interval))
+        self.cache = cache if cache is not None else ArxivCache()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="arxiv")
+
+    def _get_feed(self, params):
+        """One export API request, retried on failure; returns the parsed feed."""
+        import feedparser
+        for attempt in range(ARXIV_NUM_RETRIES + 1):
+            try:
+                response = self.session.get(self.api_url, params=params, timeout=ARXIV_TIMEOUT_SECONDS)
+                response.raise_for_status()
+                return feedparser.parse(response.content)
+            except requests.RequestException as e:
+                if attempt == ARXIV_NUM_RETRIES:
+                    raise
+                logger.warning(f"arXiv request failed ({e}), retrying")
+
+    def _fetch(self, params, max_results):
+        papers = []
+        with timed("arxiv_fetch"):
+            feed = self._get_feed({**params, "start": 0, "max_results": max_results})
+            for entry in feed.entries[:max_results]:
+                try:
+                    papers.append(paper_dict(entry))
+                except Exception as entry_error:
+                    logger.error(f"Error processing paper entry: {str(entry_error)}")
+        return papers
+
+    def query(self, query, max_results=RESULTS_PER_KEYWORD):
+        """Results of one arXiv query, by relevance, served from the cache when fresh."""
+        cache_key = f"{query}\n{max_results}"
+        papers = self.cache.get_query(cache_key)
+        if papers is None:
+            papers = self._fetch({"search_query": query, "sortBy": "relevance", "sortOrder": "descending"},
+                                 max_results)
+            self.cache.put_query(cache_key, papers)
+        return papers
+
+    def lookup(self, arxiv_ids):
+        """Metadata of papers by arxiv_id, from the cache or one id_list request for the rest."""
+        papers = self.cache.get_papers(arxiv_ids)
+        missing = [arxiv_id for arxiv_id in arxiv_ids if arxiv_id not in papers]
+        if missing:
+            fetched = self._fetch({"id_list": ",".join(missing)}, len(missing))
+            self.cache.put_papers(fetched)
+            papers.update((paper["arxiv_id"], paper) for paper in fetched)
+        return [papers[arxiv_id] for arxiv_id in arxiv_ids if arxiv_id in papers]
+
+    def download_pdf(self, paper, filepath):
+        """Save a paper's PDF to filepath through the shared, rate-limited session."""
+        response = self.session.get(paper["pdf_url"], stream=True, timeout=60)
+        response.raise_for_status()
+        with open(filepath, "wb") as f:
+            for block in response.iter_content(chunk_size=1 << 16):
+                f.write(block)
+        return filepath
+
+    def search(self, keywords, max_results=10, document_text=None):
+        """Papers related to the keywords, best first.
+
+        Each keyword is its own sub-query. Results are merged by arxiv_id with
+        reciprocal-rank scores summed over sub-queries, then re-ranked by cosine
+        similarity to `document_text` when it is given.
+        """
+        with timed("arxiv_search"):
+            return self._search(keywords, max_results, document_text)
+
+    def _search(self, keywords, max_results, document_text):
+        futures = {keyword: self._executor.submit(self.query, keyword_query(keyword)) for keyword in keywords}
+        scores, papers = {}, {}
+        for keyword, future in futures.items():
+            try:
+                results = future.result()
+            except Exception as e:
+                logger.error(f"arXiv sub-query for {keyword!r} failed: {e}")
+                continue
+            for rank, paper in enumerate(results):
+                papers.setdefault(paper["arxiv_id"], paper)
+                scores[paper["arxiv_id"]] = scores.get(paper["arxiv_id"], 0.0) + 1.0 / (rank + 1)
+
+        ranked = sorted(papers.values(), key=lambda paper: scores[paper["arxiv_id"]], reverse=True)
+        if document_text and len(ranked) > 1:
+            ranked = self.rerank(ranked, document_text)
+        return ranked[:max_results]
+
+    def rerank(self, papers, document_text):
+        """Order papers by embedding similarity of title + abstract to the document."""
+        try:
+            embeddings = clients.get("embeddings")
+            # Search results are one-off texts: keep them out of the chunk embedding cache
+            embed_documents = getattr(embeddings, "embed_documents_uncached", embeddings.embed_documents)
+            document = np.asarray(embeddings.embed_query(document_text), dtype=np.float32)
+            vectors = np.asarray(embed_documents(
+                [f"{paper['title']}\n{paper['abstract']}" for paper in papers]
+            ), dtype=np.float32)
+        except Exception as e:
+            # Keep the merged keyword ranking if embeddings are unavailable
+            logger.warning(f"Skipping embedding re-ranking: {e}")
+            return papers
+        similarities = vectors @ document / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(document) + 1e-12)
+        order = np.argsort(-similarities, kind="stable")
+        return [{**papers[i], 'similarity': round(float(similarities[i]), 4)} for i in order]
+
+
+clients.register("arxiv_search", ArxivSearch)
+
+
+def _warm_feed_parser():
+    import feedparser
+
+
+warmup.register("feed_parser", _warm_feed_parser)
+
+
+def get_arxiv_search():
+    """The process-wide arXiv search layer."""
+    return clients.get("arxiv_search")
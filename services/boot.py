@@ -0,0 +1,118 @@
+# services/boot.py
+import os
+import sys
+import time
+import logging
+import threading
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Run the warmup steps when the app is imported, i.e. before the worker accepts traffic
+BOOT_WARMUP = os.getenv("BOOT_WARMUP", "0") == "1"
+# Comma-separated subset of steps to run (default: every registered step)
+BOOT_WARMUP_STEPS = [step.strip() for step in os.getenv("BOOT_WARMUP_STEPS", "").split(",") if step.strip()]
+
+# Dependencies loaded on first use rather than at import; the report says which a worker has paid for
+HEAVY_MODULES = (
+    "langchain", "langchain_core", "langchain_google_genai", "faiss", "nltk",
+    "feedparser", "speech_recognition", "vosk", "PyPDF2", "numpy",
+)
+
+boot_seconds = metrics.histogram(
+    "pdfchat_boot_seconds", "Worker start-up time by phase (import, warmup:<step>)", ("phase",)
+)
+
+# Starts when app.py first imports this module, so "import" covers the blueprints and services
+_started = time.perf_counter()
+
+
+class Warmup:
+    """Named steps that load what the first requests would otherwise pay for.
+
+    Services register a step next to the state it prepares (clients, indexes,
+    ...); run() calls them in registration order. A failing step is logged and
+    reported but does not stop the worker: the request that needs it will load
+    it, or fail, as it would without warmup.
+    """
+
+    def __init__(self):
+        self._steps = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, step):
+        with self._lock:
+            self._steps[name] = step
+
+    def names(self):
+        with self._lock:
+            return list(self._steps)
+
+    def run(self, names=None):
+        """Run the given steps (default: all); returns [{"step", "ms", "ok", "error"}]."""
+        with self._lock:
+            steps = [(name, step) for name, step in self._steps.items() if not names or name in names]
+        results = []
+        for name, step in steps:
+            start = time.perf_counter()
+            error = None
+            try:
+                step()
+            except Exception as e:
+                error = str(e)
+                logger.warning(f"Warmup step {name} failed: {e}")
+            seconds = time.perf_counter() - start
+            boot_seconds.observe(seconds, phase=f"warmup:{name}")
+            results.append({"step": name, "ms": round(seconds * 1000, 1), "ok": error is None, "error": error})
+        return results
+
+
+warmup = Warmup()
+
+
+class BootReport:
+    """Import and warmup timings of this worker, for tracking cold start."""
+
+    def __init__(self, started=_started):
+        self.started = started
+        self.import_ms = None
+        self.warmup = []
+        self.ready_ms = None
+
+    def imported(self):
+        seconds = time.perf_counter() - self.started
+        boot_seconds.observe(seconds, phase="import")
+        self.import_ms = round(seconds * 1000, 1)
+
+    def warmed_up(self, results):
+        self.warmup = results
+
+    def ready(self):
+        self.ready_ms = round((time.perf_counter() - self.started) * 1000, 1)
+        logger.info(
+            f"Worker {os.getpid()} ready in {self.ready_ms:.0f}ms: import {self.import_ms or 0:.0f}ms"
+            + "".join(f", {result['step']} {result['ms']:.0f}ms" + ("" if result["ok"] else " (failed)")
+                      for result in self.warmup)
+        )
+
+    def as_dict(self):
+        return {
+            "pid": os.getpid(),
+            "import_ms": self.import_ms,
+            "warmup": self.warmup,
+            "warmup_ms": round(sum(result["ms"] for result in self.warmup), 1),
+            "ready_ms": self.ready_ms,
+            "modules_loaded": {name: name in sys.modules for name in HEAVY_MODULES},
+        }
+
+
+boot_report = BootReport()
+
+
+def boot(run_warmup=BOOT_WARMUP, steps=BOOT_WARMUP_STEPS):
+    """Finish starting the worker: record the import time, optionally warm up, and log the report."""
+    boot_report.imported()
+    if run_warmup:
+        boot_report.warmed_up(warmup.run(steps))
+    boot_report.ready()
+    return boot_report
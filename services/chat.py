@@ -2,7 +2,10 @@
 from services.chatutils import (
     get_pdf_text,
     get_text_chunks,
-    get_vector_store,
+    get_pdf_documents,
+    add_documents_to_collection,
+    remove_document_from_collection,
+    compact_collection,
     get_conversational_chain,
     search_internet,
     normalize_question,
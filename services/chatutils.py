@@ -1,38 +1,247 @@
-# services/utils.py
-from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain.vectorstores import FAISS
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.chains.question_answering import load_qa_chain
-from langchain.prompts import PromptTemplate
-from googlesearch import search
+# services/chatutils.py
+from services.index_registry import IndexRegistry
+from services.collection_store import (
+    current_version,
+    save_collection,
+    evict_collections,
+    recently_used_collections,
+    collection_lock,
+    empty_manifest,
+    read_manifest,
+    CollectionNotFoundError,
+    DocumentNotFoundError,
+)
+from services.clients import clients
+from services.pdf_extract import read_pdf_files
+from services.documents import (
+    ingest_documents,
+    iter_document_pages,
+    iter_document_chunks,
+    GRANULARITIES,
+    NoExtractableTextError,
+)
+from services.answer_cache import AnswerCache
+from services.context import assemble_context, ContextStats
+from services.web_search import get_web_search, format_results
+from services.metrics import timed, observe_stage
+from services.boot import warmup
+from concurrent.futures import ThreadPoolExecutor
+import re
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Compact once tombstoned chunks reach this share of the index, or after this many writes
+COMPACT_DELETED_RATIO = float(os.getenv("COMPACT_DELETED_RATIO", "0.2"))
+COMPACT_EVERY_WRITES = int(os.getenv("COMPACT_EVERY_WRITES", "20"))
+
+CHUNK_GRANULARITY = "passage"
+CHUNK_SIZE, CHUNK_OVERLAP = GRANULARITIES[CHUNK_GRANULARITY]
+
+# Retrieval: chunks passed to the model, candidates per ranking, and fusion/diversification switches
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "4"))
+RETRIEVAL_FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "20"))
+RETRIEVAL_HYBRID = os.getenv("RETRIEVAL_HYBRID", "1") == "1"
+RETRIEVAL_MMR = os.getenv("RETRIEVAL_MMR", "0") == "1"
+RETRIEVAL_MMR_LAMBDA = float(os.getenv("RETRIEVAL_MMR_LAMBDA", "0.5"))
+
+# Collections loaded into memory by the "indexes" warmup step, most recently used first
+WARMUP_COLLECTIONS = int(os.getenv("WARMUP_COLLECTIONS", "2"))
+
+# /ask/batch: questions per request, and model calls in flight per request
+ASK_BATCH_MAX_QUESTIONS = int(os.getenv("ASK_BATCH_MAX_QUESTIONS", "100"))
+ASK_BATCH_CONCURRENCY = int(os.getenv("ASK_BATCH_CONCURRENCY", "4"))
+
+def get_embeddings():
+    """Return the cache-backed embeddings client shared by every request in this process."""
+    return clients.get("embeddings")
+
+def load_collection_index(index_dir, mmap=None):
+    """Load a published collection version from disk (memory-mapped per INDEX_MMAP unless `mmap` is given)."""
+    # FAISS and the langchain vector store load with the first index, not with the app
+    from services.collection_index import CollectionIndex
+    from services.index_modes import INDEX_MMAP
+    if mmap is None:
+        mmap = INDEX_MMAP
+    with timed("index_load"):
+        return CollectionIndex.load(index_dir, get_embeddings(), mmap=mmap)
+
+index_registry = IndexRegistry(load_collection_index, current_version)
+answer_cache = AnswerCache()
+context_stats = ContextStats()
+
+def warm_indexes(limit=WARMUP_COLLECTIONS):
+    """Import FAISS and load the most recently used collections, so the first /ask only searches."""
+    # FAISS loads even when there is no collection on disk yet
+    import services.collection_index
+    for collection_id in recently_used_collections(limit):
+        index_registry.get(collection_id)
+
+warmup.register("indexes", warm_indexes)
 
 def get_pdf_text(pdf_docs):
     """Extract text from a list of PDF documents."""
-    text = ""
-    for pdf in pdf_docs:
-        pdf_reader = PdfReader(pdf)
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-    return text
+    return "".join(page["text"] for document in ingest_documents(pdf_docs)
+                   for page in iter_document_pages(document["doc_id"]))
 
 def get_text_chunks(text):
     """Split text into chunks using a RecursiveCharacterTextSplitter."""
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=500)
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
     chunks = text_splitter.split_text(text)
     return chunks
 
-def get_vector_store(text_chunks):
-    """Create and save a FAISS vector store from text chunks."""
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    vector_store = FAISS.from_texts(text_chunks, embedding=embeddings)
-    vector_store.save_local("faiss_index")
-    return vector_store
+def get_pdf_documents(pdf_docs):
+    """Read each uploaded PDF once, identified by a hash of its content."""
+    return read_pdf_files(pdf_docs)
 
-def get_conversational_chain():
-    """Create a conversational chain with a custom prompt template."""
-    prompt_template = """
+def _load_for_update(collection_id):
+    """Load a private copy of a collection to modify; the shared cached copy stays untouched."""
+    try:
+        _, index_dir = current_version(collection_id)
+    except CollectionNotFoundError:
+        return None, empty_manifest()
+    store = load_collection_index(index_dir, mmap=False)
+    return store, store.manifest
+
+def _publish(collection_id, manifest, vector_store=None):
+    stamp = save_collection(collection_id, manifest, vector_store)
+    answer_cache.invalidate(collection_id)
+    if vector_store is not None:
+        # Readers share the memory-mapped files rather than this private copy
+        _, index_dir = current_version(collection_id)
+        index_registry.put(collection_id, stamp, load_collection_index(index_dir))
+    return stamp
+
+def _needs_compaction(manifest):
+    deleted = sum(doc["chunk_count"] for doc in manifest["deleted"].values())
+    total = deleted + sum(doc["chunk_count"] for doc in manifest["documents"].values())
+    return bool(deleted) and (
+        deleted >= COMPACT_DELETED_RATIO * total
+        or manifest["writes_since_compaction"] >= COMPACT_EVERY_WRITES
+    )
+
+def add_documents_to_collection(collection_id, documents, on_stage=None):
+    """Embed and append documents to a collection, creating it if needed.
+
+    Only chunks of documents not already in the collection are embedded, so the
+    cost scales with the new documents rather than the whole collection.
+    Documents are uploads, read PDFs or references to ingested documents
+    ({"doc_id": ...}); new PDFs are ingested first, and the passage chunks of
+    the document store are what gets embedded.
+    Raises NoExtractableTextError if a new collection would have no text.
+    Returns the IDs of the documents that were added and the embedding cache
+    stats of the upload (None if nothing had to be embedded). `on_stage(name, **info)`,
+    if given, is called as each stage (extract, embed, publish) starts.
+    """
+    from services.collection_index import CollectionIndex, chunk_ids
+    on_stage = on_stage or (lambda name, **info: None)
+    on_stage("extract", documents=len(documents))
+    documents = ingest_documents(documents)
+    with collection_lock(collection_id):
+        vector_store, manifest = _load_for_update(collection_id)
+        added = []
+        embedding_stats = None
+        texts, metadatas, ids = [], [], []
+        for document in documents:
+            doc_id = document["doc_id"]
+            if doc_id in manifest["documents"] or doc_id in added:
+                continue
+            if doc_id in manifest["deleted"]:
+                # Same content, so its chunks are still in the index: just lift the tombstone
+                manifest["documents"][doc_id] = manifest["deleted"].pop(doc_id)
+                added.append(doc_id)
+                continue
+            chunk_count = 0
+            for text, metadata in iter_document_chunks(doc_id, CHUNK_GRANULARITY):
+                texts.append(text)
+                metadatas.append(metadata)
+                chunk_count += 1
+            ids.extend(chunk_ids(doc_id, chunk_count))
+            manifest["documents"][doc_id] = {"filename": document["filename"], "chunk_count": chunk_count}
+            added.append(doc_id)
+
+        if vector_store is None and not texts:
+            filenames = ", ".join(document["filename"] for document in documents)
+            raise NoExtractableTextError(
+                f"No text could be extracted from {filenames}; scanned or image-only PDFs are not supported."
+            )
+        if added:
+            manifest["writes_since_compaction"] += 1
+        if texts:
+            on_stage("embed", chunks=len(texts))
+            if vector_store is None:
+                vector_store = CollectionIndex.from_texts(texts, get_embeddings(), metadatas=metadatas, ids=ids)
+            else:
+                vector_store.add_texts(texts, metadatas=metadatas, ids=ids)
+            # Switch index mode (and train it) once the collection outgrows the current one
+            vector_store.ensure_index_mode()
+            embedding_stats = get_embeddings().last_stats()
+            on_stage("publish")
+            _publish(collection_id, manifest, vector_store)
+        elif added:
+            _publish(collection_id, manifest)
+
+        if _needs_compaction(manifest):
+            _compact(collection_id)
+
+    for evicted_id in evict_collections():
+        index_registry.invalidate(evicted_id)
+    return added, embedding_stats
+
+def document_collection(doc_id):
+    """ID of the single-document collection of an ingested document, built on first use.
+
+    Lets /ask take a document ID instead of a collection: the passages come
+    from the document store, so nothing is parsed again, and their embeddings
+    are usually in the embedding cache already.
+    """
+    collection_id = f"doc{doc_id}"
+    try:
+        current_version(collection_id)
+    except CollectionNotFoundError:
+        add_documents_to_collection(collection_id, [{"doc_id": doc_id}])
+    return collection_id
+
+def remove_document_from_collection(collection_id, doc_id):
+    """Tombstone a document; its vectors are dropped at the next compaction."""
+    with collection_lock(collection_id):
+        _, index_dir = current_version(collection_id)
+        manifest = read_manifest(index_dir)
+        if doc_id not in manifest["documents"]:
+            raise DocumentNotFoundError(f"Document {doc_id} is not in collection {collection_id}")
+        manifest["deleted"][doc_id] = manifest["documents"].pop(doc_id)
+        manifest["writes_since_compaction"] += 1
+        _publish(collection_id, manifest)
+        if _needs_compaction(manifest):
+            _compact(collection_id)
+
+def compact_collection(collection_id):
+    """Physically remove the vectors of deleted documents from a collection."""
+    with collection_lock(collection_id):
+        return _compact(collection_id)
+
+def _compact(collection_id):
+    # Caller holds the collection lock
+    from services.collection_index import chunk_ids
+    vector_store, manifest = _load_for_update(collection_id)
+    if vector_store is None or not manifest["deleted"]:
+        return 0
+    removed = [
+        chunk_id
+        for doc_id, doc in manifest["deleted"].items()
+        for chunk_id in chunk_ids(doc_id, doc["chunk_count"])
+    ]
+    vector_store.delete(removed)
+    manifest["deleted"] = {}
+    manifest["writes_since_compaction"] = 0
+    _publish(collection_id, manifest, vector_store)
+    logger.info(f"Compacted collection {collection_id}: removed {len(removed)} chunks")
+    return len(removed)
+
+QA_PROMPT_TEMPLATE = """
     You are a helpful and informative bot that answers questions using text from the reference Context included below. \
     Be sure to respond in a complete sentence, being comprehensive, including all relevant background information. \
     However, you are talking to a non-technical audience and technical audience as well, so be sure to break down complicated concepts and \
@@ -47,22 +256,222 @@ def get_conversational_chain():
 
     Answer:
     """
-    
-    model = ChatGoogleGenerativeAI(model="gemini-1.5-pro-latest", temperature=0.2)
-    prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
+
+NO_ANSWER_MARKER = "The provided documents do not contain this information"
+
+def get_chat_model():
+    """Return the chat model used to answer questions."""
+    return clients.get("chat_model")
+
+def get_conversational_chain():
+    """Return the shared conversational chain with a custom prompt template."""
+    return clients.get("qa_chain")
+
+def _qa_prompt():
+    from langchain.prompts import PromptTemplate
+    return PromptTemplate(template=QA_PROMPT_TEMPLATE, input_variables=["context", "question"])
+
+def _build_conversational_chain():
+    from langchain.chains.question_answering import load_qa_chain
+    model = get_chat_model()
+    prompt = _qa_prompt()
     chain = load_qa_chain(model, chain_type="stuff", prompt=prompt)
     
     return chain
 
+clients.register("qa_chain", _build_conversational_chain, depends_on=("chat_model",))
+clients.register("qa_prompt", _qa_prompt)
+
+def stream_answer(docs, question):
+    """Yield the answer to a question token by token, using the same prompt as the QA chain."""
+    prompt = clients.get("qa_prompt")
+    # The "stuff" chain joins documents the same way
+    context = "\n\n".join(doc.page_content for doc in docs)
+    start = time.perf_counter()
+    try:
+        for chunk in get_chat_model().stream(prompt.format(context=context, question=question)):
+            if chunk.content:
+                yield chunk.content
+    finally:
+        observe_stage("llm_answer", time.perf_counter() - start)
+
+def needs_internet_fallback(answer):
+    """Whether an answer shows the documents did not cover the question."""
+    return not answer.strip() or NO_ANSWER_MARKER in answer
+
 def search_internet(query):
-    """Search the internet for the answer."""
-    search_results = list(search(query, num_results=1))  # Convert generator to list and fetch only the top result
-    if search_results:
-        return search_results[0]
-    return "No relevant information found on the internet."
+    """Search the internet for the answer, waiting at most the web search deadline."""
+    return format_results(get_web_search().search(query))
+
+def start_internet_search(question):
+    """Start the fallback search alongside answering, if speculative search is on; returns a future or None."""
+    return get_web_search().start(question, speculative=True)
+
+def internet_fallback(question, search=None):
+    """Fallback text for a question from a search started earlier, or started now, within the deadline."""
+    web_search = get_web_search()
+    return format_results(web_search.wait(search or web_search.start(question)))
+
+def with_internet_fallback(question, answer, search=None):
+    """The document answer, plus internet results if the documents did not contain it.
+
+    Only the document answer goes into the answer cache; the fallback is looked
+    up per request (the web search keeps its own cache), so a search that missed
+    the deadline once is not served as a stale "nothing found" afterwards.
+    """
+    if needs_internet_fallback(answer):
+        answer += f"\n\nInternet Search Result:\n{internet_fallback(question, search)}"
+    return answer
 
 def normalize_question(question):
     """Normalize the user question to ensure consistency."""
-    question = question.lower().strip()
+    question = re.sub(r"\s+", " ", question.lower()).strip()
     return question
 
+def retrieve(vector_store, question, query_vector, k=RETRIEVAL_K):
+    """Chunks for a question: dense and BM25 results fused, optionally diversified with MMR."""
+    with timed("search"):
+        return vector_store.hybrid_search(
+            question, query_vector, k=k, fetch_k=max(RETRIEVAL_FETCH_K, k),
+            lexical=RETRIEVAL_HYBRID, mmr=RETRIEVAL_MMR, lambda_mult=RETRIEVAL_MMR_LAMBDA
+        )
+
+def retrieve_batch(vector_store, questions, query_vectors, k=RETRIEVAL_K):
+    """retrieve for several questions, with one dense search for all of them."""
+    with timed("search_batch"):
+        return vector_store.hybrid_search_batch(
+            questions, query_vectors, k=k, fetch_k=max(RETRIEVAL_FETCH_K, k),
+            lexical=RETRIEVAL_HYBRID, mmr=RETRIEVAL_MMR, lambda_mult=RETRIEVAL_MMR_LAMBDA
+        )
+
+def build_context(docs):
+    """Deduplicate and pack retrieved chunks into the prompt's token budget.
+
+    Returns (documents, stats) with the prompt tokens before and after packing.
+    """
+    packed, stats = assemble_context(docs)
+    context_stats.record(stats)
+    logger.debug(f"Context: {stats['chunks']} chunks -> {stats['passages']} passages, "
+                 f"{stats['tokens_before']} -> {stats['tokens_after']} tokens")
+    return packed, stats
+
+def _answer(docs, question):
+    with timed("llm_answer"):
+        response = get_conversational_chain().invoke({"input_documents": docs, "question": question})
+    return response["output_text"]
+
+def answer_from_collection(collection_id, question, timings=None):
+    """Answer a normalized question from a collection, reusing cached answers.
+
+    Returns (answer, cached). If a `timings` dict is given, retrieve_ms (cache
+    lookups, embedding and search) and generate_ms (the model call and any
+    internet fallback) are recorded in it. Raises CollectionNotFoundError for
+    unknown collections.
+    """
+    start = time.perf_counter()
+    timings = {} if timings is None else timings
+    timings.update(retrieve_ms=0.0, generate_ms=0.0)
+
+    def cached(answer):
+        timings["retrieve_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return with_internet_fallback(question, answer), True
+
+    stamp, vector_store = index_registry.get_versioned(collection_id)
+    answer = answer_cache.get(collection_id, stamp, question)
+    if answer is not None:
+        return cached(answer)
+
+    # The query embedding serves both the semantic cache tier and retrieval
+    query_vector = get_embeddings().embed_query(question)
+    answer = answer_cache.get_similar(collection_id, stamp, query_vector)
+    if answer is not None:
+        return cached(answer)
+
+    search = start_internet_search(question)
+    docs, _ = build_context(retrieve(vector_store, question, query_vector))
+    retrieved = time.perf_counter()
+    timings["retrieve_ms"] = round((retrieved - start) * 1000, 1)
+    answer = _answer(docs, question)
+    answer_cache.put(collection_id, stamp, question, answer, query_vector)
+    answer = with_internet_fallback(question, answer, search)
+    timings["generate_ms"] = round((time.perf_counter() - retrieved) * 1000, 1)
+    return answer, False
+
+def answer_batch_from_collection(collection_id, questions, concurrency=ASK_BATCH_CONCURRENCY):
+    """Answer normalized questions from a collection as one batch.
+
+    Cached answers are served first; the remaining questions are embedded in one
+    request and searched as one matrix, then answered by up to `concurrency`
+    concurrent model calls. Returns (results, timings): one result per question,
+    in order, with its answer, whether it was cached and its own timings
+    (wait for a model slot, model call, total since the batch started), and the
+    timings of the shared stages. Raises CollectionNotFoundError for unknown collections.
+    """
+    start = time.perf_counter()
+
+    def elapsed_ms(since=start):
+        return round((time.perf_counter() - since) * 1000, 1)
+
+    stamp, vector_store = index_registry.get_versioned(collection_id)
+    results = [{"question": question, "response": None, "cached": False, "timings": {}} for question in questions]
+
+    def serve(question, answer, cached, **question_timings):
+        for i in pending[question]:
+            results[i].update(response=answer, cached=cached)
+            results[i]["timings"] = {**question_timings, "total_ms": elapsed_ms()}
+
+    # Repeated questions are answered once
+    pending = {}
+    for i, question in enumerate(questions):
+        pending.setdefault(question, []).append(i)
+    unanswered = []
+    for question in pending:
+        answer = answer_cache.get(collection_id, stamp, question)
+        if answer is not None:
+            serve(question, with_internet_fallback(question, answer), True)
+        else:
+            unanswered.append(question)
+
+    timings = {"embed_ms": 0.0, "search_ms": 0.0, "answer_ms": 0.0}
+    if unanswered:
+        stage = time.perf_counter()
+        vectors = dict(zip(unanswered, get_embeddings().embed_queries(unanswered)))
+        timings["embed_ms"] = elapsed_ms(stage)
+        for question in list(unanswered):
+            answer = answer_cache.get_similar(collection_id, stamp, vectors[question])
+            if answer is not None:
+                serve(question, with_internet_fallback(question, answer), True)
+                unanswered.remove(question)
+
+    if unanswered:
+        stage = time.perf_counter()
+        retrieved = retrieve_batch(vector_store, unanswered, [vectors[question] for question in unanswered])
+        contexts = [build_context(docs)[0] for docs in retrieved]
+        timings["search_ms"] = elapsed_ms(stage)
+
+        dispatched = time.perf_counter()
+
+        def answer_one(question, docs):
+            started = time.perf_counter()
+            answer = _answer(docs, question)
+            answer_cache.put(collection_id, stamp, question, answer, vectors[question])
+            answer = with_internet_fallback(question, answer)
+            return answer, {"wait_ms": round((started - dispatched) * 1000, 1), "model_ms": elapsed_ms(started)}
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = {question: executor.submit(answer_one, question, docs) for question, docs in zip(unanswered, contexts)}
+            for question, future in futures.items():
+                try:
+                    answer, question_timings = future.result()
+                except Exception as e:
+                    logger.error(f"Error answering batch question {question!r}: {e}")
+                    for i in pending[question]:
+                        results[i]["error"] = str(e)
+                    continue
+                serve(question, answer, False, **question_timings)
+        timings["answer_ms"] = elapsed_ms(dispatched)
+
+    timings["total_ms"] = elapsed_ms()
+    logger.info(f"Batch of {len(questions)} questions, {len(unanswered)} sent to the model: embed {timings['embed_ms']:.0f}ms, "
+                f"search {timings['search_ms']:.0f}ms, answer {timings['answer_ms']:.0f}ms, total {timings['total_ms']:.0f}ms")
+    return results, timings
@@ -0,0 +1,112 @@
+# services/clients.py
+import os
+import logging
+import threading
+from services.boot import warmup
+
+logger = logging.getLogger(__name__)
+
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gemini-1.5-pro-latest")
+CHAT_TEMPERATURE = float(os.getenv("CHAT_TEMPERATURE", "0.2"))
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gemini-pro")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "models/embedding-001")
+
+
+class ClientRegistry:
+    """Per-process registry of model clients and chains, each built once on first use.
+
+    Services register a factory per name; `get(name)` builds the object the first
+    time and returns the same instance afterwards, so requests share clients (and
+    their pooled connections) instead of constructing them per call. Registering
+    a factory drops the built instance of that name and of everything registered
+    as depending on it (a chain on its model); this is how fakes are swapped in.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._depends_on = {}
+        self._instances = {}
+        self._lock = threading.RLock()
+
+    def register(self, name, factory, depends_on=()):
+        """Register `factory` for `name`; `depends_on` names the clients it is built from."""
+        with self._lock:
+            self._factories[name] = factory
+            self._depends_on[name] = tuple(depends_on)
+            self._drop(name)
+
+    def _drop(self, name):
+        self._instances.pop(name, None)
+        for dependent, depends_on in self._depends_on.items():
+            if name in depends_on and dependent in self._instances:
+                self._drop(dependent)
+
+    def get(self, name):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                logger.debug(f"Creating client {name}")
+                instance = self._factories[name]()
+                self._instances[name] = instance
+            return instance
+
+    def warm(self):
+        """Build every registered client now; raises once all were tried if any failed."""
+        with self._lock:
+            names = list(self._factories)
+        failed = []
+        for name in names:
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.warning(f"Could not create client {name}: {e}")
+                failed.append(name)
+        if failed:
+            raise RuntimeError(f"Could not create clients: {', '.join(failed)}")
+
+    def reset(self, name=None):
+        """Drop built instances (all, or `name` and its dependents) so the next get() rebuilds them."""
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._drop(name)
+
+
+# The Google client libraries take most of a worker's import time, so they load with the first client built
+
+def _require_api_key():
+    # Checked when a Google client is built, so registered fakes work without a key
+    if not os.getenv("GOOGLE_API_KEY"):
+        raise ValueError("GOOGLE_API_KEY environment variable is not set")
+
+
+def _embeddings():
+    _require_api_key()
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    from services.embedding_cache import CachedEmbeddings
+    return CachedEmbeddings(GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL), EMBEDDING_MODEL)
+
+
+def _chat_model():
+    _require_api_key()
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=CHAT_MODEL, temperature=CHAT_TEMPERATURE)
+
+
+def _summary_model():
+    _require_api_key()
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=SUMMARY_MODEL)
+
+
+clients = ClientRegistry()
+clients.register("embeddings", _embeddings)
+clients.register("chat_model", _chat_model)
+clients.register("summary_model", _summary_model)
+
+# Models, chains, keyword extractor (NLTK stopwords), speech recognizer, search clients
+warmup.register("clients", clients.warm)
@@ -0,0 +1,300 @@
+# services/collection_index.py
+import os
+import uuid
+import pickle
+import shutil
+import logging
+import faiss
+import numpy as np
+from langchain.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from services.collection_store import read_manifest
+from services.retrieval import BM25Index, reciprocal_rank_fusion, mmr_select
+from services.index_modes import (
+    INDEX_MMAP,
+    build_index,
+    choose_mode,
+    index_mode,
+    needs_rebuild,
+    read_index,
+    reconstruct,
+)
+from services.index_store import (
+    INDEX_MANIFEST_FILE,
+    INDEX_FILE,
+    VECTORS_FILE,
+    CHUNKS_FILE,
+    LEGACY_FILE,
+    is_legacy,
+    read_index_manifest,
+    write_index_manifest,
+    read_vectors,
+    write_vectors,
+    read_chunks,
+    write_chunks,
+    open_chunks,
+    ChunkStore,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def chunk_ids(doc_id, chunk_count):
+    """IDs of a document's chunks in the vector store: a contiguous range per document."""
+    return [f"{doc_id}-{i}" for i in range(chunk_count)]
+
+
+def chunk_doc_id(chunk_id):
+    """Document ID of a chunk ID made by chunk_ids."""
+    return chunk_id.rsplit("-", 1)[0]
+
+
+def embedding_model_name(embeddings):
+    return getattr(embeddings, "model_name", None) or getattr(embeddings, "model", None)
+
+
+class CollectionIndex(FAISS):
+    """FAISS store for a collection that hides chunks of deleted documents.
+
+    Deleting a document only records a tombstone in the collection manifest;
+    its vectors are physically removed the next time the collection is compacted.
+    A BM25 index over the same chunks is kept alongside for hybrid retrieval,
+    and the raw vectors are kept so the index can be rebuilt in any mode.
+    """
+
+    manifest = None
+    deleted_docs = frozenset()
+    deleted_chunks = 0
+    vectors = None
+    _lexical = None
+    _positions = None
+    # Chunks file of the version this copy was loaded from; saves apply only the changes to it
+    _chunks_source = None
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        vectors = embedding.embed_documents(texts)
+        store = cls(embedding, faiss.IndexFlatL2(len(vectors[0])), InMemoryDocstore(), {}, **kwargs)
+        store.add_embeddings(zip(texts, vectors), metadatas=metadatas, ids=ids)
+        return store
+
+    @classmethod
+    def load(cls, index_dir, embeddings, mmap=INDEX_MMAP):
+        """Load a published collection version together with its document manifest.
+
+        With mmap the index, vectors and chunks are mapped read-only and read on
+        demand, so loading is near-instant and processes share the pages;
+        copies that will be modified must be loaded without it. Versions saved
+        in the legacy pickle format are migrated in place first.
+        """
+        if is_legacy(index_dir):
+            cls.migrate(index_dir, embeddings)
+        info = read_index_manifest(index_dir)
+        model = embedding_model_name(embeddings)
+        if info["embedding_model"] and model and info["embedding_model"] != model:
+            logger.warning(f"Index in {index_dir} was embedded with {info['embedding_model']}, querying with {model}")
+
+        index = read_index(os.path.join(index_dir, INDEX_FILE), mmap=mmap)
+        chunks_path = os.path.join(index_dir, CHUNKS_FILE)
+        if mmap:
+            docstore, index_to_docstore_id, lexical = open_chunks(chunks_path)
+        else:
+            (docstore, index_to_docstore_id), lexical = read_chunks(chunks_path), None
+        store = cls(embeddings, index, docstore, index_to_docstore_id, normalize_L2=info["normalize_L2"])
+        store.vectors = read_vectors(os.path.join(index_dir, VECTORS_FILE), info["count"], info["dimension"], mmap)
+        store._lexical = lexical
+        store._chunks_source = None if mmap else chunks_path
+        store.set_manifest(read_manifest(index_dir))
+        return store
+
+    @classmethod
+    def load_legacy(cls, index_dir, embeddings):
+        """Load an index written by FAISS.save_local; vectors are read back out of the index.
+
+        Only for migrating this app's own earlier files: the docstore is unpickled.
+        """
+        index = read_index(os.path.join(index_dir, INDEX_FILE), mmap=False)
+        with open(os.path.join(index_dir, LEGACY_FILE), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        store = cls(embeddings, index, docstore, index_to_docstore_id)
+        if index_mode(index) == "ivfpq":
+            logger.warning(f"Migrating IVF-PQ index in {index_dir}: stored vectors are PQ approximations")
+        store.vectors = reconstruct(index, range(index.ntotal))
+        return store
+
+    @classmethod
+    def migrate(cls, index_dir, embeddings):
+        """Convert a legacy version directory to the current format in place.
+
+        New files are moved in with the index manifest last, so concurrent
+        migrations and readers see either the legacy or the complete new layout.
+        """
+        store = cls.load_legacy(index_dir, embeddings)
+        tmp_dir = f"{index_dir}.migrate-{uuid.uuid4().hex}"
+        try:
+            store.save_local(tmp_dir)
+            for name in (INDEX_FILE, VECTORS_FILE, CHUNKS_FILE, INDEX_MANIFEST_FILE):
+                os.replace(os.path.join(tmp_dir, name), os.path.join(index_dir, name))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        logger.info(f"Migrated index in {index_dir}: {store.index.ntotal} vectors")
+
+    @property
+    def lexical(self):
+        """BM25 index of the chunks, built from the docstore if this version predates it."""
+        if self._lexical is None:
+            lexical = BM25Index()
+            ids = list(self.index_to_docstore_id.values())
+            lexical.add(ids, [self.docstore.search(chunk_id).page_content for chunk_id in ids])
+            self._lexical = lexical
+        return self._lexical
+
+    def save_local(self, folder_path, index_name="index"):
+        """Write the index, raw vectors, chunks and index manifest to a directory."""
+        os.makedirs(folder_path, exist_ok=True)
+        faiss.write_index(self.index, os.path.join(folder_path, INDEX_FILE))
+        write_vectors(os.path.join(folder_path, VECTORS_FILE), self.vectors)
+        write_chunks(os.path.join(folder_path, CHUNKS_FILE), self.index_to_docstore_id, self.docstore,
+                     source=self._chunks_source)
+        write_index_manifest(folder_path, {
+            "embedding_model": embedding_model_name(self.embedding_function),
+            "index_mode": index_mode(self.index),
+            "count": int(self.vectors.shape[0]),
+            "dimension": int(self.index.d),
+            "normalize_L2": self._normalize_L2,
+        })
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        return self.add_embeddings(zip(texts, self._embed_documents(texts)), metadatas=metadatas, ids=ids, **kwargs)
+
+    def add_embeddings(self, text_embeddings, metadatas=None, ids=None, **kwargs):
+        text_embeddings = list(text_embeddings)
+        ids = super().add_embeddings(text_embeddings, metadatas=metadatas, ids=ids, **kwargs)
+        vectors = np.array([vector for _, vector in text_embeddings], dtype=np.float32)
+        if self._normalize_L2:
+            faiss.normalize_L2(vectors)
+        self.vectors = vectors if self.vectors is None else np.concatenate([self.vectors, vectors])
+        if self._lexical is not None:
+            self._lexical.add(ids, [text for text, _ in text_embeddings])
+        self._positions = None
+        return ids
+
+    def delete(self, ids=None, **kwargs):
+        """Remove chunks by rebuilding the index from the remaining raw vectors.
+
+        IVF keeps the labels of removed vectors and HNSW cannot remove at all, so
+        every mode is rebuilt the same way (for flat that is one copy).
+        """
+        texts = [self.docstore.search(chunk_id).page_content for chunk_id in ids or []]
+        removed = set(ids)
+        keep = [i for i in sorted(self.index_to_docstore_id) if self.index_to_docstore_id[i] not in removed]
+        self.vectors = self.vectors[keep]
+        self.index = build_index(self.vectors, choose_mode(len(keep)))
+        self.docstore.delete(ids)
+        self.index_to_docstore_id = {new: self.index_to_docstore_id[old] for new, old in enumerate(keep)}
+        if self._lexical is not None:
+            self._lexical.remove(ids, texts)
+        self._positions = None
+        return True
+
+    def iter_chunks(self):
+        """Yield (text, metadata) of every live chunk in index order, without loading them all at once."""
+        if isinstance(self.docstore, ChunkStore):
+            rows = self.docstore.iter_chunks()
+        else:
+            rows = (
+                (chunk_id, document.page_content, document.metadata)
+                for chunk_id, document in (
+                    (chunk_id, self.docstore.search(chunk_id))
+                    for _, chunk_id in sorted(self.index_to_docstore_id.items())
+                )
+            )
+        for chunk_id, text, metadata in rows:
+            if not self._is_deleted(chunk_id):
+                yield text, metadata
+
+    def ensure_index_mode(self):
+        """Rebuild the index in the mode its size calls for (training IVF lists), if it is not already."""
+        if self.index.ntotal and needs_rebuild(self.index):
+            self.index = build_index(self.vectors, choose_mode(self.index.ntotal))
+
+    def set_manifest(self, manifest):
+        self.manifest = manifest
+        self.deleted_docs = frozenset(manifest["deleted"])
+        self.deleted_chunks = sum(doc["chunk_count"] for doc in manifest["deleted"].values())
+
+    def _live_filter(self, filter):
+        if not self.deleted_docs:
+            return filter
+        base = self._create_filter_func(filter) if filter is not None else None
+        deleted_docs = self.deleted_docs
+        return lambda metadata: (
+            metadata.get("doc_id") not in deleted_docs and (base is None or base(metadata))
+        )
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None, fetch_k=20, **kwargs):
+        if self.deleted_docs:
+            # Fetch enough candidates that k live chunks survive the tombstone filter
+            fetch_k = max(fetch_k, k + self.deleted_chunks)
+        return super().similarity_search_with_score_by_vector(
+            embedding, k=k, filter=self._live_filter(filter), fetch_k=fetch_k, **kwargs
+        )
+
+    def max_marginal_relevance_search_with_score_by_vector(self, embedding, *, k=4, fetch_k=20,
+                                                           lambda_mult=0.5, filter=None):
+        if self.deleted_docs:
+            fetch_k = max(fetch_k, k + self.deleted_chunks)
+        return super().max_marginal_relevance_search_with_score_by_vector(
+            embedding, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=self._live_filter(filter)
+        )
+
+    def _is_deleted(self, chunk_id):
+        return chunk_doc_id(chunk_id) in self.deleted_docs
+
+    def _dense_rankings(self, query_vectors, fetch_k):
+        """Top fetch_k live chunk IDs for each query vector, from one search over the whole matrix."""
+        vectors = np.array(query_vectors, dtype=np.float32).reshape(-1, self.index.d)
+        if self._normalize_L2:
+            faiss.normalize_L2(vectors)
+        count = min(fetch_k + self.deleted_chunks, self.index.ntotal)
+        if count == 0:
+            return [[] for _ in vectors]
+        _, positions = self.index.search(vectors, count)
+        rankings = []
+        for row in positions:
+            ranking = [self.index_to_docstore_id[i] for i in row if i != -1]
+            rankings.append([chunk_id for chunk_id in ranking if not self._is_deleted(chunk_id)][:fetch_k])
+        return rankings
+
+    def _vectors(self, ids):
+        lookup = getattr(self.index_to_docstore_id, "positions", None)
+        if lookup is not None:
+            return self.vectors[lookup(ids)]
+        if self._positions is None:
+            self._positions = {chunk_id: i for i, chunk_id in self.index_to_docstore_id.items()}
+        return self.vectors[[self._positions[chunk_id] for chunk_id in ids]]
+
+    def hybrid_search(self, query, query_vector, k=4, fetch_k=20, lexical=True, mmr=False, lambda_mult=0.5):
+        """Chunks for a query from dense and BM25 rankings fused by reciprocal rank.
+
+        Each ranking contributes its top fetch_k live chunks. With `mmr`, the k
+        results are picked from the fused candidates by maximal marginal relevance
+        so overlapping neighbours of the same passage do not crowd out the rest.
+        """
+        return self.hybrid_search_batch([query], [query_vector], k, fetch_k, lexical, mmr, lambda_mult)[0]
+
+    def hybrid_search_batch(self, queries, query_vectors, k=4, fetch_k=20, lexical=True, mmr=False, lambda_mult=0.5):
+        """hybrid_search for several queries, with the dense search done once for all of them."""
+        results = []
+        for query, dense in zip(queries, self._dense_rankings(query_vectors, fetch_k)):
+            rankings = [dense]
+            if lexical:
+                rankings.append([chunk_id for chunk_id, _ in self.lexical.search(query, fetch_k, skip=self._is_deleted)])
+            fused = reciprocal_rank_fusion(rankings)[:fetch_k]
+            if mmr and len(fused) > k:
+                picked = mmr_select([score for _, score in fused], self._vectors([c for c, _ in fused]), k, lambda_mult)
+                fused = [fused[i] for i in picked]
+            results.append([self.docstore.search(chunk_id) for chunk_id, _ in fused[:k]])
+        return results
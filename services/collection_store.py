@@ -0,0 +1,222 @@
+# services/collection_store.py
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import threading
+from filelock import FileLock, Timeout
+
+logger = logging.getLogger(__name__)
+
+COLLECTIONS_DIR = os.getenv("COLLECTIONS_DIR", "collections")
+COLLECTION_TTL_SECONDS = int(os.getenv("COLLECTION_TTL_SECONDS", str(24 * 3600)))
+MAX_COLLECTIONS = int(os.getenv("MAX_COLLECTIONS", "50"))
+KEEP_VERSIONS = 2
+
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "documents.json"
+LAST_USED_FILE = "LAST_USED"
+VERSIONS_DIR = "versions"
+TOUCH_INTERVAL_SECONDS = 60
+
+_last_touch = {}
+_touch_lock = threading.Lock()
+
+
+class CollectionNotFoundError(LookupError):
+    """Raised when a collection ID does not exist (never created or evicted)."""
+
+
+class DocumentNotFoundError(LookupError):
+    """Raised when a document ID is not part of a collection."""
+
+
+def new_collection_id():
+    """Return a fresh, URL-safe collection ID."""
+    return uuid.uuid4().hex
+
+
+def collection_dir(collection_id):
+    """Return the directory of a collection, rejecting IDs that could escape the root."""
+    if not collection_id or not collection_id.isalnum():
+        raise CollectionNotFoundError(f"Invalid collection ID: {collection_id!r}")
+    return os.path.join(COLLECTIONS_DIR, collection_id)
+
+
+def empty_manifest():
+    """Manifest of a collection with no documents."""
+    return {"documents": {}, "deleted": {}, "writes_since_compaction": 0}
+
+
+def read_manifest(index_dir):
+    """Return the document manifest stored alongside an index version."""
+    try:
+        with open(os.path.join(index_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return empty_manifest()
+
+
+def collection_lock(collection_id):
+    """Cross-process lock serialising writers of one collection."""
+    os.makedirs(COLLECTIONS_DIR, exist_ok=True)
+    return FileLock(os.path.join(COLLECTIONS_DIR, f".{collection_id}.lock"))
+
+
+def _atomic_write(path, content):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _touch(collection_id, path):
+    """Record a use of the collection for LRU eviction, at most once a minute per process."""
+    now = time.time()
+    with _touch_lock:
+        if now - _last_touch.get(collection_id, 0) < TOUCH_INTERVAL_SECONDS:
+            return
+        _last_touch[collection_id] = now
+    try:
+        os.utime(os.path.join(path, LAST_USED_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def current_version(collection_id):
+    """Return (stamp, index_dir) of the published version of a collection."""
+    path = collection_dir(collection_id)
+    try:
+        with open(os.path.join(path, CURRENT_FILE)) as f:
+            stamp = f.read().strip()
+    except FileNotFoundError:
+        raise CollectionNotFoundError(f"Collection {collection_id} does not exist")
+    _touch(collection_id, path)
+    return stamp, os.path.join(path, VERSIONS_DIR, stamp)
+
+
+def save_collection(collection_id, manifest, vector_store=None):
+    """Publish a new version of a collection.
+
+    The index is written to a temp dir and renamed into place, then CURRENT is
+    swapped atomically, so readers only ever see a complete index. Without a
+    vector_store only the manifest changes, and the index files of the current
+    version are hard-linked into the new one instead of being rewritten.
+    """
+    path = collection_dir(collection_id)
+    versions_path = os.path.join(path, VERSIONS_DIR)
+    os.makedirs(versions_path, exist_ok=True)
+
+    stamp = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+    tmp_dir = os.path.join(COLLECTIONS_DIR, f".tmp-{uuid.uuid4().hex}")
+    try:
+        if vector_store is not None:
+            vector_store.save_local(tmp_dir)
+        else:
+            _, base_dir = current_version(collection_id)
+            os.makedirs(tmp_dir)
+            for name in os.listdir(base_dir):
+                if name != MANIFEST_FILE:
+                    os.link(os.path.join(base_dir, name), os.path.join(tmp_dir, name))
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f)
+        os.rename(tmp_dir, os.path.join(versions_path, stamp))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    _atomic_write(os.path.join(path, CURRENT_FILE), stamp)
+    _atomic_write(os.path.join(path, LAST_USED_FILE), stamp)
+    _prune_versions(versions_path, stamp)
+    return stamp
+
+
+def _prune_versions(versions_path, current_stamp):
+    """Remove superseded versions, keeping the previous one for in-flight readers."""
+    stamps = sorted(
+        (s for s in os.listdir(versions_path) if s != current_stamp),
+        key=lambda s: int(s.split("-")[0]),
+    )
+    for stamp in stamps[:max(0, len(stamps) - (KEEP_VERSIONS - 1))]:
+        shutil.rmtree(os.path.join(versions_path, stamp), ignore_errors=True)
+
+
+def delete_collection(collection_id, timeout=-1):
+    """Remove a collection; renaming first makes the removal atomic for readers.
+
+    Holds the collection lock, so an append or compaction is never cut short.
+    Returns False if there is no such collection, or if the lock is not free
+    within `timeout` seconds (-1 waits as long as it takes).
+    """
+    path = collection_dir(collection_id)
+    trash = os.path.join(COLLECTIONS_DIR, f".trash-{uuid.uuid4().hex}")
+    try:
+        with collection_lock(collection_id).acquire(timeout=timeout):
+            try:
+                os.rename(path, trash)
+            except FileNotFoundError:
+                return False
+            try:
+                os.remove(os.path.join(COLLECTIONS_DIR, f".{collection_id}.lock"))
+            except FileNotFoundError:
+                pass
+    except Timeout:
+        return False
+    shutil.rmtree(trash, ignore_errors=True)
+    with _touch_lock:
+        _last_touch.pop(collection_id, None)
+    return True
+
+
+def recently_used_collections(limit):
+    """IDs of the most recently used collections, most recent first."""
+    if not os.path.isdir(COLLECTIONS_DIR):
+        return []
+    last_used = []
+    for name in os.listdir(COLLECTIONS_DIR):
+        if name.startswith("."):
+            continue
+        try:
+            last_used.append((os.stat(os.path.join(COLLECTIONS_DIR, name, LAST_USED_FILE)).st_mtime, name))
+        except FileNotFoundError:
+            continue
+    return [name for _, name in sorted(last_used, reverse=True)[:limit]]
+
+
+def evict_collections(ttl_seconds=COLLECTION_TTL_SECONDS, max_collections=MAX_COLLECTIONS):
+    """Delete collections unused for longer than the TTL, then the least recently used
+    ones beyond max_collections. Returns the evicted IDs."""
+    if not os.path.isdir(COLLECTIONS_DIR):
+        return []
+
+    now = time.time()
+    last_used = []
+    for name in os.listdir(COLLECTIONS_DIR):
+        if name.startswith("."):
+            if not name.endswith(".lock"):
+                # Leftovers from writers or deletions that crashed midway
+                stale = os.path.join(COLLECTIONS_DIR, name)
+                try:
+                    if now - os.stat(stale).st_mtime > 3600:
+                        shutil.rmtree(stale, ignore_errors=True)
+                except FileNotFoundError:
+                    pass
+            continue
+        try:
+            mtime = os.stat(os.path.join(COLLECTIONS_DIR, name, LAST_USED_FILE)).st_mtime
+        except FileNotFoundError:
+            continue
+        last_used.append((mtime, name))
+    last_used.sort(reverse=True)
+
+    evicted = []
+    for rank, (mtime, name) in enumerate(last_used):
+        if rank >= max_collections or now - mtime > ttl_seconds:
+            # A collection being written is in use: leave it for a later pass
+            if delete_collection(name, timeout=0):
+                evicted.append(name)
+
+    if evicted:
+        logger.info(f"Evicted collections: {', '.join(evicted)}")
+    return evicted
@@ -0,0 +1,114 @@
+# services/context.py
+import os
+import math
+import threading
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+# Gemini tokenizes English prose at roughly four characters per token
+CHARS_PER_TOKEN = 4
+# Spans this close together on the same page are joined into one passage
+MERGE_GAP_CHARS = 1
+# A passage cut to fit the budget is dropped if less than this is left of it
+MIN_PASSAGE_TOKENS = int(os.getenv("CONTEXT_MIN_PASSAGE_TOKENS", "50"))
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _spans(docs):
+    """Group retrieved chunks into passages: overlapping or adjacent spans of one document merged."""
+    passages = []
+    by_doc = {}
+    for rank, doc in enumerate(docs):
+        metadata = doc.metadata
+        start = metadata.get("start_index")
+        if start is None or metadata.get("doc_id") is None:
+            # No offsets to align on: only exact duplicates can be dropped
+            if all(p["text"] != doc.page_content for p in passages):
+                passages.append({"metadata": metadata, "start": None, "end": None,
+                                 "text": doc.page_content, "rank": rank})
+            continue
+        by_doc.setdefault(metadata["doc_id"], []).append((start, start + len(doc.page_content), rank, doc))
+
+    for spans in by_doc.values():
+        spans.sort(key=lambda span: span[0])
+        current = None
+        for start, end, rank, doc in spans:
+            same_page = current is not None and current["metadata"].get("page") == doc.metadata.get("page")
+            if current is not None and (start < current["end"] or (same_page and start - current["end"] <= MERGE_GAP_CHARS)):
+                if end > current["end"]:
+                    overlap = max(0, current["end"] - start)
+                    current["text"] += ("" if start <= current["end"] else " ") + doc.page_content[overlap:]
+                    current["end"] = end
+                current["rank"] = min(current["rank"], rank)
+                continue
+            current = {"metadata": doc.metadata, "start": start, "end": end, "text": doc.page_content, "rank": rank}
+            passages.append(current)
+    return passages
+
+
+def assemble_context(docs, token_budget=CONTEXT_TOKEN_BUDGET):
+    """Turn retrieved chunks (best first) into deduplicated passages that fit a token budget.
+
+    Overlapping chunks of a document are stitched into one passage so shared
+    text appears once, and adjacent chunks of the same page are joined.
+    Passages are packed best-ranked first; one that crosses the budget is cut
+    short, or skipped if under MIN_PASSAGE_TOKENS would be left (the best
+    passage is always kept). Returns (documents, stats) where stats counts tokens before and
+    after assembly.
+    """
+    # Retrieved chunks are langchain documents already, so this costs nothing by now
+    from langchain_core.documents import Document
+    passages = sorted(_spans(docs), key=lambda passage: passage["rank"])
+    packed = []
+    remaining = token_budget
+    for passage in passages:
+        if remaining <= 0:
+            break
+        text = passage["text"]
+        if estimate_tokens(text) > remaining:
+            text = text[:remaining * CHARS_PER_TOKEN]
+            # Do not end on half a word
+            text = text[:text.rfind(" ")] if " " in text else text
+            if packed and estimate_tokens(text) < MIN_PASSAGE_TOKENS:
+                # A fragment adds little; a shorter passage further down may still fit whole
+                continue
+        if not text.strip():
+            continue
+        packed.append(Document(page_content=text, metadata=passage["metadata"]))
+        remaining -= estimate_tokens(text)
+
+    stats = {
+        "chunks": len(docs),
+        "passages": len(packed),
+        "tokens_before": sum(estimate_tokens(doc.page_content) for doc in docs),
+        "tokens_after": sum(estimate_tokens(doc.page_content) for doc in packed),
+    }
+    return packed, stats
+
+
+class ContextStats:
+    """Running totals of prompt context size per answer, before and after assembly."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.answers = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def record(self, stats):
+        with self._lock:
+            self.answers += 1
+            self.tokens_before += stats["tokens_before"]
+            self.tokens_after += stats["tokens_after"]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "answers": self.answers,
+                "token_budget": CONTEXT_TOKEN_BUDGET,
+                "tokens_per_answer_before": self.tokens_before / self.answers if self.answers else 0.0,
+                "tokens_per_answer_after": self.tokens_after / self.answers if self.answers else 0.0,
+                "reduction": 1 - self.tokens_after / self.tokens_before if self.tokens_before else 0.0,
+            }
@@ -0,0 +1,272 @@
+# services/documents.py
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import threading
+from filelock import FileLock
+from services.pdf_extract import read_pdf_file, iter_pdf_pages, iter_page_chunks
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DOCUMENTS_DIR = os.getenv("DOCUMENTS_DIR", "documents")
+DOCUMENT_TTL_SECONDS = int(os.getenv("DOCUMENT_TTL_SECONDS", str(7 * 24 * 3600)))
+MAX_DOCUMENTS = int(os.getenv("MAX_DOCUMENTS", "500"))
+
+# (chunk size, overlap) of each granularity: passages are embedded for /ask, sections are summarized
+GRANULARITIES = {
+    "passage": (2000, 500),
+    "section": (10000, 1000),
+}
+
+DOCUMENT_FILE = "document.json"
+PAGES_FILE = "pages.jsonl"
+LAST_USED_FILE = "LAST_USED"
+TOUCH_INTERVAL_SECONDS = 60
+
+_last_touch = {}
+_touch_lock = threading.Lock()
+
+documents_ingested = metrics.counter(
+    "pdfchat_documents_ingested_total",
+    "Documents requested for ingestion, by whether they were parsed or already in the store",
+    ("outcome",),
+)
+
+
+class DocumentNotIngestedError(LookupError):
+    """Raised when a document ID has not been ingested (or was evicted, or is not a valid ID)."""
+
+
+class NoExtractableTextError(ValueError):
+    """Raised when documents have no text to index, e.g. scanned PDFs without a text layer."""
+
+
+def document_dir(doc_id):
+    """Return the directory of a document, rejecting IDs that could escape the root."""
+    if not doc_id or not doc_id.isalnum():
+        raise DocumentNotIngestedError(f"Invalid document ID: {doc_id!r}")
+    return os.path.join(DOCUMENTS_DIR, doc_id)
+
+
+def _chunks_file(granularity):
+    chunk_size, chunk_overlap = GRANULARITIES[granularity]
+    return f"chunks-{chunk_size}-{chunk_overlap}.jsonl"
+
+
+def _touch(doc_id, directory):
+    """Record a use of the document for LRU eviction, at most once a minute per process."""
+    now = time.time()
+    with _touch_lock:
+        if now - _last_touch.get(doc_id, 0) < TOUCH_INTERVAL_SECONDS:
+            return
+        _last_touch[doc_id] = now
+    try:
+        os.utime(os.path.join(directory, LAST_USED_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def get_document(doc_id):
+    """The record of an ingested document: doc_id, sha256, filename, pages, chars and chunk counts."""
+    directory = document_dir(doc_id)
+    try:
+        with open(os.path.join(directory, DOCUMENT_FILE)) as f:
+            record = json.load(f)
+    except FileNotFoundError:
+        raise DocumentNotIngestedError(f"Document {doc_id} has not been ingested")
+    _touch(doc_id, directory)
+    return record
+
+
+def get_documents(doc_ids):
+    """Records of several ingested documents; raises DocumentNotIngestedError for the first unknown ID."""
+    return [get_document(doc_id) for doc_id in doc_ids]
+
+
+def _write_jsonl(path, rows):
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+            count += 1
+    return count
+
+
+def _read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _read_pages(directory, record):
+    for row in _read_jsonl(os.path.join(directory, PAGES_FILE)):
+        yield {"doc_id": record["doc_id"], "filename": record["filename"], **row}
+
+
+def _write_chunks(path, directory, record, granularity):
+    chunk_size, chunk_overlap = GRANULARITIES[granularity]
+    chunks = iter_page_chunks(_read_pages(directory, record), chunk_size, chunk_overlap)
+    return _write_jsonl(path, ({"text": text, "metadata": metadata} for text, metadata in chunks))
+
+
+def ingest_document(pdf_file):
+    """Parse and chunk a PDF once per content hash; returns its document record.
+
+    `pdf_file` is an upload, a read PDF (read_pdf_file) or, for a document
+    ingested before, just {"doc_id": ...}. Page text and the chunks of every
+    granularity are written to a scratch directory that is renamed into place,
+    so readers never see a half-ingested document; later calls for the same
+    content only read the record.
+    """
+    if not isinstance(pdf_file, dict):
+        pdf_file = read_pdf_file(pdf_file)
+    doc_id = pdf_file["doc_id"]
+    try:
+        record = get_document(doc_id)
+    except DocumentNotIngestedError:
+        if "data" not in pdf_file:
+            raise
+    else:
+        documents_ingested.inc(outcome="reused")
+        return record
+
+    directory = document_dir(doc_id)
+    os.makedirs(DOCUMENTS_DIR, exist_ok=True)
+    with FileLock(f"{directory}.lock"):
+        # Another request may have ingested the same content while we waited
+        if os.path.exists(os.path.join(directory, DOCUMENT_FILE)):
+            documents_ingested.inc(outcome="reused")
+            return get_document(doc_id)
+
+        tmp_dir = f"{directory}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(tmp_dir)
+        try:
+            pages = _write_jsonl(os.path.join(tmp_dir, PAGES_FILE), (
+                {"page": page["page"], "text": page["text"]} for page in iter_pdf_pages([pdf_file])
+            ))
+            record = {
+                "doc_id": doc_id,
+                "sha256": pdf_file["sha256"],
+                "filename": pdf_file["filename"],
+                "pages": pages,
+                "chars": sum(len(row["text"]) for row in _read_jsonl(os.path.join(tmp_dir, PAGES_FILE))),
+                "ingested_at": time.time(),
+            }
+            record["chunks"] = {
+                granularity: _write_chunks(os.path.join(tmp_dir, _chunks_file(granularity)), tmp_dir, record, granularity)
+                for granularity in GRANULARITIES
+            }
+            with open(os.path.join(tmp_dir, DOCUMENT_FILE), "w") as f:
+                json.dump(record, f)
+            open(os.path.join(tmp_dir, LAST_USED_FILE), "w").close()
+            shutil.rmtree(directory, ignore_errors=True)
+            os.replace(tmp_dir, directory)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    documents_ingested.inc(outcome="parsed")
+    logger.info(f"Ingested {pdf_file['filename']} ({doc_id}): {pages} pages, "
+                + ", ".join(f"{count} {name} chunks" for name, count in record["chunks"].items()))
+    return record
+
+
+def ingest_documents(pdf_files):
+    records = [ingest_document(pdf_file) for pdf_file in pdf_files]
+    evict_documents(keep={record["doc_id"] for record in records})
+    return records
+
+
+def delete_document(doc_id):
+    """Remove an ingested document; collections built from it keep their own copy of its chunks."""
+    directory = document_dir(doc_id)
+    trash = os.path.join(DOCUMENTS_DIR, f".trash-{uuid.uuid4().hex}")
+    with FileLock(f"{directory}.lock"):
+        try:
+            os.rename(directory, trash)
+        except FileNotFoundError:
+            return False
+    shutil.rmtree(trash, ignore_errors=True)
+    try:
+        os.remove(f"{directory}.lock")
+    except FileNotFoundError:
+        pass
+    return True
+
+
+def evict_documents(ttl_seconds=DOCUMENT_TTL_SECONDS, max_documents=MAX_DOCUMENTS, keep=()):
+    """Delete documents unused for longer than the TTL, then the least recently used
+    ones beyond max_documents, sparing the IDs in `keep`. Returns the evicted IDs."""
+    if not os.path.isdir(DOCUMENTS_DIR):
+        return []
+
+    now = time.time()
+    last_used = []
+    for name in os.listdir(DOCUMENTS_DIR):
+        if not name.isalnum():
+            if not name.endswith(".lock"):
+                # Scratch directories of ingestions or deletions that crashed midway
+                stale = os.path.join(DOCUMENTS_DIR, name)
+                try:
+                    if now - os.stat(stale).st_mtime > 3600:
+                        shutil.rmtree(stale, ignore_errors=True)
+                except FileNotFoundError:
+                    pass
+            continue
+        mtime = None
+        # Documents ingested before use was tracked count from their ingestion
+        for marker in (LAST_USED_FILE, DOCUMENT_FILE):
+            try:
+                mtime = os.stat(os.path.join(DOCUMENTS_DIR, name, marker)).st_mtime
+                break
+            except FileNotFoundError:
+                continue
+        if mtime is None:
+            continue
+        last_used.append((mtime, name))
+    last_used.sort(reverse=True)
+
+    evicted = []
+    for rank, (mtime, name) in enumerate(last_used):
+        if name in keep:
+            continue
+        if rank >= max_documents or now - mtime > ttl_seconds:
+            if delete_document(name):
+                evicted.append(name)
+
+    if evicted:
+        logger.info(f"Evicted documents: {', '.join(evicted)}")
+    return evicted
+
+
+def iter_document_pages(doc_id):
+    """Yield {"doc_id", "filename", "page", "text"} for every page of an ingested document."""
+    yield from _read_pages(document_dir(doc_id), get_document(doc_id))
+
+
+def iter_document_chunks(doc_id, granularity):
+    """Yield the (text, metadata) chunks of an ingested document at a granularity of GRANULARITIES.
+
+    Chunks are split from the stored page text if the granularity's size
+    changed since the document was ingested; the PDF is never parsed again.
+    """
+    directory = document_dir(doc_id)
+    record = get_document(doc_id)
+    path = os.path.join(directory, _chunks_file(granularity))
+    if not os.path.exists(path):
+        with FileLock(f"{directory}.lock"):
+            if not os.path.exists(path):
+                tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+                _write_chunks(tmp_path, directory, record, granularity)
+                os.replace(tmp_path, path)
+    for row in _read_jsonl(path):
+        yield row["text"], row["metadata"]
+
+
+def document_chunks(documents, granularity):
+    """The chunk texts of ingested documents, in order."""
+    return [text for document in documents for text, _ in iter_document_chunks(document["doc_id"], granularity)]
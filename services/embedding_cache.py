@@ -0,0 +1,200 @@
+# services/embedding_cache.py
+import os
+import time
+import sqlite3
+import hashlib
+import inspect
+import logging
+import threading
+from contextlib import contextmanager
+import numpy as np
+from filelock import FileLock
+from langchain_core.embeddings import Embeddings
+from services.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+# Fraction of max_entries kept after an eviction pass, so evictions are not triggered on every insert
+EVICTION_LOW_WATERMARK = 0.8
+
+
+def cache_key(model_name, text):
+    """Content address of a chunk: hash of the embedding model name and the chunk text."""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent chunk embedding cache for one model.
+
+    Vectors live in a raw float32 matrix (`vectors.f32`, one row per entry, read
+    through np.memmap) and keys map to row numbers in a small SQLite index.
+    A file lock serialises access across worker processes.
+    """
+
+    def __init__(self, model_name, cache_dir=EMBEDDING_CACHE_DIR, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        slug = "".join(c if c.isalnum() else "_" for c in model_name)
+        self.path = os.path.join(cache_dir, slug)
+        os.makedirs(self.path, exist_ok=True)
+        self.vectors_path = os.path.join(self.path, "vectors.f32")
+        self.index_path = os.path.join(self.path, "keys.sqlite")
+        self._file_lock = FileLock(os.path.join(self.path, ".lock"))
+        self._lock = threading.Lock()
+        with self._locked(), self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, row INTEGER NOT NULL, last_used REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    @contextmanager
+    def _locked(self):
+        # The thread lock comes first so threads of this process queue without polling the file lock
+        with self._lock, self._file_lock:
+            yield
+
+    def _connect(self):
+        return sqlite3.connect(self.index_path, timeout=30)
+
+    def _dim(self, conn):
+        row = conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        return int(row[0]) if row else None
+
+    def _matrix(self, dim):
+        rows = os.path.getsize(self.vectors_path) // (dim * 4)
+        return np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, dim))
+
+    def get_many(self, keys):
+        """Return {key: vector} for the keys present in the cache."""
+        if not keys:
+            return {}
+        found = {}
+        with self._locked(), self._connect() as conn:
+            dim = self._dim(conn)
+            if dim is None or not os.path.exists(self.vectors_path):
+                return {}
+            rows = {}
+            unique_keys = list(set(keys))
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows.update(conn.execute(
+                    f"SELECT key, row FROM entries WHERE key IN ({placeholders})", batch
+                ).fetchall())
+            if not rows:
+                return {}
+            matrix = self._matrix(dim)
+            for key, row in rows.items():
+                found[key] = np.array(matrix[row])
+            now = time.time()
+            conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, k) for k in rows])
+        return found
+
+    def put_many(self, items):
+        """Append {key: vector} entries to the cache, evicting old entries past the size cap."""
+        if not items:
+            return
+        with self._locked(), self._connect() as conn:
+            keys = list(items)
+            matrix = np.asarray([items[k] for k in keys], dtype=np.float32)
+            dim = self._dim(conn)
+            if dim is None:
+                dim = matrix.shape[1]
+                conn.execute("INSERT INTO meta (name, value) VALUES ('dim', ?)", (str(dim),))
+            elif dim != matrix.shape[1]:
+                raise ValueError(f"Embedding dimension changed from {dim} to {matrix.shape[1]}")
+
+            first_row = os.path.getsize(self.vectors_path) // (dim * 4) if os.path.exists(self.vectors_path) else 0
+            with open(self.vectors_path, "ab") as f:
+                f.write(matrix.tobytes())
+            now = time.time()
+            conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, row, last_used) VALUES (?, ?, ?)",
+                [(key, first_row + i, now) for i, key in enumerate(keys)],
+            )
+
+            count = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            if count > self.max_entries:
+                self._evict(conn, dim, int(self.max_entries * EVICTION_LOW_WATERMARK))
+
+    def _evict(self, conn, dim, keep):
+        """Keep the `keep` most recently used entries and rewrite the matrix without the rest."""
+        kept = conn.execute(
+            "SELECT key, row, last_used FROM entries ORDER BY last_used DESC LIMIT ?", (keep,)
+        ).fetchall()
+        matrix = self._matrix(dim)
+        tmp_path = f"{self.vectors_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            for _, row, _ in kept:
+                f.write(np.asarray(matrix[row]).tobytes())
+        del matrix
+        os.replace(tmp_path, self.vectors_path)
+
+        conn.execute("DELETE FROM entries")
+        conn.executemany(
+            "INSERT INTO entries (key, row, last_used) VALUES (?, ?, ?)",
+            [(key, i, last_used) for i, (key, _, last_used) in enumerate(kept)],
+        )
+        logger.info(f"Embedding cache {self.model_name}: evicted down to {len(kept)} entries")
+
+    def stats(self):
+        """Return the number of cached entries and the size of the vector file."""
+        with self._locked(), self._connect() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        return {"entries": count, "max_entries": self.max_entries, "bytes": size}
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends chunks missing from the cache to the underlying model."""
+
+    def __init__(self, embeddings, model_name, cache=None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache or EmbeddingCache(model_name)
+        self._local = threading.local()
+
+    def embed_documents(self, texts):
+        keys = [cache_key(self.model_name, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        if missing:
+            with timed("embed"):
+                new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing, new_vectors))
+            self.cache.put_many(computed)
+            vectors.update(computed)
+
+        hits = len(texts) - sum(1 for key in keys if key in missing)
+        self._local.last_stats = {
+            "chunks": len(texts),
+            "hits": hits,
+            "misses": len(texts) - hits,
+            "hit_rate": hits / len(texts) if texts else 0.0,
+        }
+        logger.info(f"Embedding cache: {hits}/{len(texts)} chunks served from cache")
+        return [list(map(float, vectors[key])) for key in keys]
+
+    def embed_documents_uncached(self, texts):
+        """Embed texts without reading or writing the cache, for vectors not worth keeping."""
+        with timed("embed"):
+            return self.embeddings.embed_documents(list(texts))
+
+    def embed_query(self, text):
+        with timed("embed_query"):
+            return self.embeddings.embed_query(text)
+
+    def embed_queries(self, texts):
+        """Embed several queries; one batched request when the model takes a task type, as Gemini does."""
+        with timed("embed_query"):
+            if "task_type" in inspect.signature(self.embeddings.embed_documents).parameters:
+                return self.embeddings.embed_documents(list(texts), task_type="RETRIEVAL_QUERY")
+            return [self.embeddings.embed_query(text) for text in texts]
+
+    def last_stats(self):
+        """Hit/miss counts of the most recent embed_documents call on this thread."""
+        return getattr(self._local, "last_stats", None)
@@ -0,0 +1,102 @@
+# services/index_migration.py
+"""Migrate pickled FAISS indexes to the current on-disk format.
+
+Usage: python -m services.index_migration [--faiss-index faiss_index]
+
+Converts the published version of every collection still in the legacy
+FAISS.save_local layout, and imports a pre-collections `faiss_index`
+directory (one index for all uploads) as a new collection. Collections are
+also migrated lazily on first load, so running this is optional; it moves
+the one-off cost out of the first requests.
+"""
+import os
+import hashlib
+import logging
+import argparse
+from langchain.schema import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from services.collection_index import CollectionIndex, chunk_ids
+from services.collection_store import (
+    COLLECTIONS_DIR,
+    collection_lock,
+    current_version,
+    empty_manifest,
+    new_collection_id,
+    save_collection,
+    CollectionNotFoundError,
+)
+from services.index_store import INDEX_FILE, is_legacy
+
+logger = logging.getLogger(__name__)
+
+LEGACY_INDEX_DIR = "faiss_index"
+
+
+def migrate_collections(embeddings):
+    """Migrate the published version of every legacy collection; returns their IDs."""
+    if not os.path.isdir(COLLECTIONS_DIR):
+        return []
+    migrated = []
+    for collection_id in sorted(os.listdir(COLLECTIONS_DIR)):
+        if collection_id.startswith("."):
+            continue
+        with collection_lock(collection_id):
+            try:
+                _, index_dir = current_version(collection_id)
+            except CollectionNotFoundError:
+                continue
+            if is_legacy(index_dir):
+                CollectionIndex.migrate(index_dir, embeddings)
+                migrated.append(collection_id)
+    return migrated
+
+
+def import_legacy_index(index_dir, embeddings):
+    """Import a pre-collections index directory as a new collection holding one document.
+
+    Returns the new collection ID. Its chunks are renamed to the collection
+    chunk-ID scheme so the document can be deleted and compacted like any other.
+    """
+    legacy = CollectionIndex.load_legacy(index_dir, embeddings)
+    with open(os.path.join(index_dir, INDEX_FILE), "rb") as f:
+        doc_id = hashlib.sha256(f.read()).hexdigest()[:16]
+    filename = os.path.basename(os.path.normpath(index_dir))
+    positions = sorted(legacy.index_to_docstore_id)
+    ids = chunk_ids(doc_id, len(positions))
+    documents = {}
+    for chunk_id, position in zip(ids, positions):
+        doc = legacy.docstore.search(legacy.index_to_docstore_id[position])
+        documents[chunk_id] = Document(
+            page_content=doc.page_content,
+            metadata={**doc.metadata, "doc_id": doc_id, "filename": filename},
+        )
+    store = CollectionIndex(embeddings, legacy.index, InMemoryDocstore(documents), dict(enumerate(ids)))
+    store.vectors = legacy.vectors[positions]
+
+    manifest = empty_manifest()
+    manifest["documents"][doc_id] = {"filename": filename, "chunk_count": len(ids)}
+    collection_id = new_collection_id()
+    with collection_lock(collection_id):
+        save_collection(collection_id, manifest, store)
+    logger.info(f"Imported {index_dir} as collection {collection_id}: {len(ids)} chunks")
+    return collection_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--faiss-index", default=LEGACY_INDEX_DIR,
+                        help="pre-collections index directory to import, if it exists")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    from services.chatutils import get_embeddings
+    embeddings = get_embeddings()
+    migrated = migrate_collections(embeddings)
+    print(f"Migrated {len(migrated)} collections" + (f": {', '.join(migrated)}" if migrated else ""))
+    if os.path.exists(os.path.join(args.faiss_index, INDEX_FILE)) and is_legacy(args.faiss_index):
+        collection_id = import_legacy_index(args.faiss_index, embeddings)
+        print(f"Imported {args.faiss_index} as collection {collection_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# services/index_modes.py
+import os
+import math
+import logging
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# flat, ivf, ivfpq, hnsw, or auto to pick by collection size
+INDEX_MODE = os.getenv("INDEX_MODE", "auto")
+# auto tiers: flat, then HNSW while the graph fits in memory, then IVF, then IVF-PQ.
+# Setting INDEX_HNSW_MIN_VECTORS >= INDEX_IVF_MIN_VECTORS skips the HNSW tier.
+HNSW_MIN_VECTORS = int(os.getenv("INDEX_HNSW_MIN_VECTORS", "20000"))
+IVF_MIN_VECTORS = int(os.getenv("INDEX_IVF_MIN_VECTORS", "100000"))
+IVFPQ_MIN_VECTORS = int(os.getenv("INDEX_IVFPQ_MIN_VECTORS", "200000"))
+INDEX_NPROBE = int(os.getenv("INDEX_NPROBE", "16"))
+INDEX_MMAP = os.getenv("INDEX_MMAP", "1") == "1"
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = int(os.getenv("INDEX_HNSW_EF_SEARCH", "64"))
+PQ_BITS = 8
+# k-means wants about this many training points per list; more adds little
+TRAIN_POINTS_PER_LIST = 64
+MAX_TRAIN_POINTS = 256 * 1024
+# Below this, trained modes have too little data to learn from; a flat scan is exact and as fast
+MIN_TRAINED_VECTORS = 2 ** PQ_BITS
+
+MODES = ("flat", "ivf", "ivfpq", "hnsw")
+
+
+def choose_mode(vector_count, mode=None):
+    """Index mode for a collection of vector_count vectors."""
+    mode = mode or INDEX_MODE
+    if mode != "auto":
+        if mode not in MODES:
+            raise ValueError(f"Unknown index mode {mode!r}, expected one of {', '.join(MODES)} or auto")
+        if mode in ("ivf", "ivfpq") and vector_count < MIN_TRAINED_VECTORS:
+            return "flat"
+        return mode
+    if vector_count >= IVFPQ_MIN_VECTORS:
+        return "ivfpq"
+    if vector_count >= IVF_MIN_VECTORS:
+        return "ivf"
+    if vector_count >= HNSW_MIN_VECTORS:
+        return "hnsw"
+    return "flat"
+
+
+def nlist_for(vector_count):
+    """Number of IVF lists: about 4 * sqrt(n), with enough points per list to train on."""
+    return max(1, min(int(4 * math.sqrt(vector_count)), vector_count // 39))
+
+
+def pq_subquantizers(dimension):
+    """Largest divisor of the dimension up to 64, so each code byte covers a few dimensions."""
+    return max(m for m in range(1, min(64, dimension) + 1) if dimension % m == 0)
+
+
+def index_mode(index):
+    """Mode of an existing FAISS index."""
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def configure(index):
+    """Apply search-time parameters."""
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(INDEX_NPROBE, index.nlist)
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    return index
+
+
+def build_index(vectors, mode):
+    """Build and fill an L2 index of the given mode; IVF modes are trained on (a sample of) vectors."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dimension = vectors.shape
+    if mode == "flat":
+        index = faiss.IndexFlatL2(dimension)
+    elif mode == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif mode in ("ivf", "ivfpq"):
+        nlist = nlist_for(count)
+        quantizer = faiss.IndexFlatL2(dimension)
+        if mode == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+        else:
+            # 8-bit codebooks need ~10k training points; small collections get coarser ones
+            bits = min(PQ_BITS, max(1, int(math.log2(max(count // 39, 2)))))
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_subquantizers(dimension), bits)
+        sample_size = min(count, max(nlist * TRAIN_POINTS_PER_LIST, 2 ** PQ_BITS * 39), MAX_TRAIN_POINTS)
+        sample = vectors if sample_size == count else vectors[
+            np.random.default_rng(0).choice(count, sample_size, replace=False)
+        ]
+        index.train(sample)
+    else:
+        raise ValueError(f"Unknown index mode {mode!r}")
+    index.add(vectors)
+    logger.info(f"Built {mode} index of {count} vectors")
+    return configure(index)
+
+
+def needs_rebuild(index):
+    """Whether an index no longer suits its size: wrong mode, or IVF lists trained for far fewer vectors."""
+    mode = choose_mode(index.ntotal)
+    current = index_mode(index)
+    if mode != current:
+        return True
+    if isinstance(index, faiss.IndexIVF):
+        return index.nlist * 4 < nlist_for(index.ntotal)
+    return False
+
+
+def mmap_flags():
+    """faiss.read_index flags that map an index read-only instead of loading it.
+
+    IO_FLAG_MMAP_IFC, in newer faiss releases, also maps flat and HNSW storage.
+    Releases without it, such as the 1.8.0 in requirements.txt, only map IVF
+    inverted lists and read other indexes into memory.
+    """
+    return getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def read_index(path, mmap=INDEX_MMAP):
+    """Read an index file; with mmap, its vectors or inverted lists stay in the page cache shared across processes."""
+    return configure(faiss.read_index(path, mmap_flags() if mmap else 0))
+
+
+def reconstruct(index, positions):
+    """Vectors stored at the given positions (approximate for IVF-PQ)."""
+    if not len(positions):
+        return np.zeros((0, index.d), dtype=np.float32)
+    if isinstance(index, faiss.IndexIVF) and index.direct_map.type == faiss.DirectMap.NoMap:
+        index.make_direct_map()
+    return index.reconstruct_batch(np.asarray(positions, dtype=np.int64))
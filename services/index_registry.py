@@ -0,0 +1,114 @@
+# services/index_registry.py
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class IndexRegistry:
+    """Process-wide cache of loaded FAISS stores, reloaded only when the on-disk version changes.
+
+    `resolve(key)` returns the (stamp, index_dir) currently published for a key
+    and `loader(index_dir)` reads the store from disk; at most `max_entries`
+    stores are kept in memory, least recently used first out.
+    """
+
+    def __init__(self, loader, resolve, max_entries=8):
+        self._loader = loader
+        self._resolve = resolve
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_count = 0
+        self.load_seconds_total = 0.0
+        self.last_load_seconds = 0.0
+
+    def _load_lock(self, key):
+        with self._lock:
+            return self._load_locks.setdefault(key, threading.Lock())
+
+    def _cached(self, key, stamp):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        return None
+
+    def _store(self, key, stamp, store):
+        # Caller holds self._lock
+        self._entries[key] = (stamp, store)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key):
+        """Return the vector store for key, loading it only if it changed on disk."""
+        return self.get_versioned(key)[1]
+
+    def get_versioned(self, key):
+        """Return (version stamp, vector store) for key."""
+        try:
+            stamp, index_dir = self._resolve(key)
+        except LookupError:
+            self.invalidate(key)
+            raise
+
+        store = self._cached(key, stamp)
+        if store is not None:
+            return stamp, store
+
+        # Only one thread loads a given index; the others wait and reuse its result
+        with self._load_lock(key):
+            store = self._cached(key, stamp)
+            if store is not None:
+                return stamp, store
+
+            start = time.perf_counter()
+            store = self._loader(index_dir)
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self._store(key, stamp, store)
+                self.misses += 1
+                self.load_count += 1
+                self.load_seconds_total += elapsed
+                self.last_load_seconds = elapsed
+            logger.info(f"Loaded index {key} (version {stamp}) in {elapsed:.3f}s")
+            return stamp, store
+
+    def put(self, key, stamp, store):
+        """Prime the cache with a store this process just wrote, skipping the reload."""
+        with self._lock:
+            self._store(key, stamp, store)
+
+    def invalidate(self, key=None):
+        """Drop one cached store, or all of them."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        """Return hit/miss and load-time counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "loaded_indexes": len(self._entries),
+                "evictions": self.evictions,
+                "load_count": self.load_count,
+                "load_seconds_total": round(self.load_seconds_total, 6),
+                "last_load_seconds": round(self.last_load_seconds, 6),
+            }
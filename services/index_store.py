@@ -0,0 +1,247 @@
+# services/index_store.py
+import os
+import json
+import shutil
+import sqlite3
+import threading
+import urllib.request
+from collections import Counter
+from collections.abc import Mapping
+import numpy as np
+from langchain.schema import Document
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from services.retrieval import BM25Index, tokenize
+
+# On-disk layout of one collection version. Nothing is pickled: the FAISS index
+# is FAISS's own format, vectors are raw float32 rows in index order, and chunk
+# texts, metadata and BM25 postings live in SQLite.
+FORMAT_VERSION = 1
+INDEX_MANIFEST_FILE = "index.json"
+INDEX_FILE = "index.faiss"
+VECTORS_FILE = "vectors.f32"
+CHUNKS_FILE = "chunks.sqlite"
+# Legacy FAISS.save_local layout
+LEGACY_FILE = "index.pkl"
+
+# SQLite reads through a shared memory map instead of private page copies
+SQLITE_MMAP_BYTES = 1 << 30
+# Rows read per query when streaming every chunk of a version
+CHUNK_PAGE_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE chunks (
+    key INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX chunks_position ON chunks (position);
+CREATE TABLE postings (
+    term TEXT NOT NULL,
+    chunk INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (term, chunk)
+) WITHOUT ROWID;
+CREATE TABLE totals (chunks INTEGER NOT NULL, length INTEGER NOT NULL);
+"""
+
+
+class IndexFormatError(ValueError):
+    """Raised when an index directory is missing files or was written by a newer format."""
+
+
+def is_legacy(index_dir):
+    """Whether an index directory holds a pickled FAISS.save_local index."""
+    return (not os.path.exists(os.path.join(index_dir, INDEX_MANIFEST_FILE))
+            and os.path.exists(os.path.join(index_dir, LEGACY_FILE)))
+
+
+def write_index_manifest(index_dir, manifest):
+    with open(os.path.join(index_dir, INDEX_MANIFEST_FILE), "w") as f:
+        json.dump({"format_version": FORMAT_VERSION, **manifest}, f)
+
+
+def read_index_manifest(index_dir):
+    """The index manifest of a directory: format version, model, vector count and shape."""
+    try:
+        with open(os.path.join(index_dir, INDEX_MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise IndexFormatError(f"No index manifest in {index_dir}")
+    if manifest["format_version"] > FORMAT_VERSION:
+        raise IndexFormatError(
+            f"Index in {index_dir} has format version {manifest['format_version']}, "
+            f"this version reads up to {FORMAT_VERSION}"
+        )
+    return manifest
+
+
+def write_vectors(path, vectors):
+    np.ascontiguousarray(vectors, dtype=np.float32).tofile(path)
+
+
+def read_vectors(path, count, dimension, mmap=True):
+    """Raw vectors as a (count, dimension) array, memory-mapped read-only or read into memory."""
+    if not count:
+        return np.zeros((0, dimension), dtype=np.float32)
+    if mmap:
+        return np.memmap(path, dtype=np.float32, mode="r", shape=(count, dimension))
+    return np.fromfile(path, dtype=np.float32).reshape(count, dimension)
+
+
+def write_chunks(path, index_to_docstore_id, docstore, source=None):
+    """Write chunk texts, metadata and BM25 postings for the chunks at their index positions.
+
+    With `source`, the chunks file of the version the store was loaded from,
+    that file is copied and only the difference is applied: chunks that are
+    gone are dropped, positions are renumbered and new chunks are inserted, so
+    appending to a large collection does not re-tokenize it.
+    """
+    if source is not None:
+        shutil.copyfile(source, path)
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            if source is None:
+                conn.executescript(SCHEMA)
+            conn.execute("CREATE TEMP TABLE current (id TEXT PRIMARY KEY, position INTEGER NOT NULL)")
+            conn.executemany("INSERT INTO current VALUES (?, ?)",
+                             ((chunk_id, position) for position, chunk_id in index_to_docstore_id.items()))
+            gone = "SELECT key FROM chunks WHERE id NOT IN (SELECT id FROM current)"
+            if conn.execute(f"SELECT EXISTS ({gone})").fetchone()[0]:
+                conn.execute(f"DELETE FROM postings WHERE chunk IN ({gone})")
+                conn.execute(f"DELETE FROM chunks WHERE key IN ({gone})")
+            conn.execute("UPDATE chunks SET position = (SELECT position FROM current WHERE current.id = chunks.id)")
+            new_ids = [row[0] for row in conn.execute("SELECT id FROM current WHERE id NOT IN (SELECT id FROM chunks)")]
+            for chunk_id in new_ids:
+                doc = docstore.search(chunk_id)
+                terms = tokenize(doc.page_content)
+                key = conn.execute(
+                    "INSERT INTO chunks (id, position, text, metadata, length) "
+                    "SELECT ?, position, ?, ?, ? FROM current WHERE id = ?",
+                    (chunk_id, doc.page_content, json.dumps(doc.metadata), len(terms), chunk_id),
+                ).lastrowid
+                conn.executemany("INSERT INTO postings VALUES (?, ?, ?)",
+                                 ((term, key, tf) for term, tf in Counter(terms).items()))
+            conn.execute("DELETE FROM totals")
+            conn.execute("INSERT INTO totals SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks")
+    finally:
+        conn.close()
+
+
+def read_chunks(path):
+    """Read chunks into memory as (docstore, index_to_docstore_id), for stores that will change."""
+    conn = sqlite3.connect(path)
+    try:
+        documents, index_to_docstore_id = {}, {}
+        for position, chunk_id, text, metadata in conn.execute(
+            "SELECT position, id, text, metadata FROM chunks ORDER BY position"
+        ):
+            documents[chunk_id] = Document(page_content=text, metadata=json.loads(metadata))
+            index_to_docstore_id[position] = chunk_id
+    finally:
+        conn.close()
+    return InMemoryDocstore(documents), index_to_docstore_id
+
+
+def open_chunks(path):
+    """Open chunks read-only without loading them: (docstore, index_to_docstore_id, BM25 index)."""
+    db = ChunkDatabase(path)
+    return ChunkStore(db), ChunkIds(db), StoredBM25Index(db)
+
+
+class ChunkDatabase:
+    """Read-only SQLite connection shared by the threads of a process."""
+
+    def __init__(self, path):
+        uri = f"file:{urllib.request.pathname2url(os.path.abspath(path))}?mode=ro&immutable=1"
+        self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self._conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_BYTES}")
+        self._lock = threading.Lock()
+
+    def query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+
+class ChunkStore(Docstore):
+    """Docstore that looks chunks up in a version's SQLite file on demand."""
+
+    def __init__(self, db):
+        self._db = db
+
+    def search(self, search):
+        rows = self._db.query("SELECT text, metadata FROM chunks WHERE id = ?", (search,))
+        if not rows:
+            return f"ID {search} not found."
+        text, metadata = rows[0]
+        return Document(page_content=text, metadata=json.loads(metadata))
+
+    def iter_chunks(self, page_size=CHUNK_PAGE_SIZE):
+        """Yield (chunk_id, text, metadata) of every chunk in index order, a page of rows at a time."""
+        position = -1
+        while True:
+            rows = self._db.query(
+                "SELECT position, id, text, metadata FROM chunks WHERE position > ? ORDER BY position LIMIT ?",
+                (position, page_size),
+            )
+            for position, chunk_id, text, metadata in rows:
+                yield chunk_id, text, json.loads(metadata)
+            if len(rows) < page_size:
+                return
+
+
+class ChunkIds(Mapping):
+    """Index position -> chunk ID, read from a version's SQLite file on demand."""
+
+    def __init__(self, db):
+        self._db = db
+        self._count = db.query("SELECT chunks FROM totals")[0][0]
+
+    def __getitem__(self, position):
+        rows = self._db.query("SELECT id FROM chunks WHERE position = ?", (int(position),))
+        if not rows:
+            raise KeyError(position)
+        return rows[0][0]
+
+    def __iter__(self):
+        return iter(range(self._count))
+
+    def __len__(self):
+        return self._count
+
+    def items(self):
+        return self._db.query("SELECT position, id FROM chunks ORDER BY position")
+
+    def values(self):
+        return [chunk_id for _, chunk_id in self.items()]
+
+    def positions(self, ids):
+        """Index positions of chunk IDs."""
+        placeholders = ",".join("?" * len(ids))
+        found = dict(self._db.query(f"SELECT id, position FROM chunks WHERE id IN ({placeholders})", list(ids)))
+        return [found[chunk_id] for chunk_id in ids]
+
+
+class StoredBM25Index(BM25Index):
+    """BM25 index whose postings are read from a version's SQLite file per query term."""
+
+    def __init__(self, db, k1=1.5, b=0.75):
+        super().__init__(k1, b)
+        self._db = db
+        self._stored_size = tuple(db.query("SELECT chunks, length FROM totals")[0])
+
+    def __len__(self):
+        return self._stored_size[0]
+
+    def _size(self):
+        return self._stored_size
+
+    def _postings(self, term):
+        return self._db.query(
+            "SELECT c.id, p.tf, c.length FROM postings p JOIN chunks c ON c.key = p.chunk WHERE p.term = ?",
+            (term,),
+        )
@@ -0,0 +1,293 @@
+# services/jobs.py
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import logging
+import threading
+from services.metrics import metrics
+from services.request_log import set_request_id, reset_request_id
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = os.getenv("JOBS_DIR", "jobs")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", str(24 * 3600)))
+# A running job whose row has not been touched for this long is assumed lost with its process
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "900"))
+# Heartbeats of a running job per JOB_STALE_SECONDS, so a long stage is not taken for a lost one
+JOB_HEARTBEATS_PER_STALE = 3
+JOB_MAX_ATTEMPTS = 2
+POLL_SECONDS = 1.0
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+job_stage_seconds = metrics.histogram(
+    "pdfchat_job_stage_seconds", "Time spent in each stage of background jobs", ("kind", "stage", "status")
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    stages TEXT NOT NULL DEFAULT '[]',
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+
+class JobNotFoundError(LookupError):
+    """Raised when a job ID does not exist (never submitted or expired)."""
+
+
+class Job:
+    """A claimed job as seen by its handler: payload, scratch directory and stage reporting."""
+
+    def __init__(self, queue, job_id, kind, payload, stages):
+        self.queue = queue
+        self.id = job_id
+        self.kind = kind
+        self.payload = payload
+        self.stages = stages
+        self.dir = queue.job_dir(job_id)
+
+    def stage(self, name, **info):
+        """Finish the current stage (if any) and start the stage `name`."""
+        now = time.time()
+        self._finish_stage(now)
+        self.stages.append({"name": name, "status": RUNNING, "started_at": now, "seconds": None, **info})
+        self.queue._save_stages(self.id, self.stages)
+
+    def progress(self, **info):
+        """Attach counters (pages, chunks, ...) to the current stage."""
+        if self.stages:
+            self.stages[-1].update(info)
+            self.queue._save_stages(self.id, self.stages)
+
+    def _finish_stage(self, now, status=SUCCEEDED):
+        if self.stages and self.stages[-1]["status"] == RUNNING:
+            self.stages[-1]["status"] = status
+            self.stages[-1]["seconds"] = round(now - self.stages[-1]["started_at"], 3)
+            job_stage_seconds.observe(now - self.stages[-1]["started_at"],
+                                      kind=self.kind, stage=self.stages[-1]["name"], status=status)
+
+
+class JobQueue:
+    """Durable job queue in SQLite, drained by a pool of worker threads in this process.
+
+    Handlers are registered per job kind; `submit` stores the job and returns its
+    ID at once. Any process sharing JOBS_DIR can run queued jobs, and a job left
+    running by a process that died is picked up again once it goes stale.
+    """
+
+    def __init__(self, jobs_dir=JOBS_DIR, workers=JOB_WORKERS):
+        self.jobs_dir = jobs_dir
+        self.workers = workers
+        self._handlers = {}
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(self.jobs_dir, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.jobs_dir, "jobs.sqlite"), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def job_dir(self, job_id):
+        return os.path.join(self.jobs_dir, job_id)
+
+    def register(self, kind, handler):
+        """Run `handler(job)` for jobs of `kind`; its return value is stored as the job result."""
+        self._handlers[kind] = handler
+
+    def submit(self, kind, payload, files=None):
+        """Queue a job and return its ID. `files` maps names to bytes saved in the job directory."""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind {kind!r}")
+        job_id = uuid.uuid4().hex
+        if files:
+            os.makedirs(self.job_dir(job_id), exist_ok=True)
+            for name, data in files.items():
+                with open(os.path.join(self.job_dir(job_id), name), "wb") as f:
+                    f.write(data)
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO jobs (id, kind, status, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, kind, QUEUED, json.dumps(payload), now, now),
+        )
+        logger.info(f"Queued {kind} job {job_id}")
+        self.start()
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def status(self, job_id):
+        """Return the public state of a job: status, per-stage progress and timings, result or error."""
+        self.start()
+        row = self._connect().execute(
+            "SELECT id, kind, status, stages, result, error, created_at, started_at, finished_at "
+            "FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            raise JobNotFoundError(f"Job {job_id} not found")
+        job_id, kind, status, stages, result, error, created_at, started_at, finished_at = row
+        now = time.time()
+        return {
+            "job_id": job_id,
+            "kind": kind,
+            "status": status,
+            "stages": json.loads(stages),
+            "result": json.loads(result) if result is not None else None,
+            "error": error,
+            "queued_seconds": round((started_at or now) - created_at, 3),
+            "run_seconds": round((finished_at or now) - started_at, 3) if started_at else None,
+        }
+
+    def start(self):
+        """Start the worker threads of this process (idempotent)."""
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _save_stages(self, job_id, stages):
+        self._connect().execute(
+            "UPDATE jobs SET stages = ?, updated_at = ? WHERE id = ?", (json.dumps(stages), time.time(), job_id)
+        )
+
+    def _heartbeat(self, job_id, stopped):
+        """Touch a running job's row until `stopped` is set, from its own thread."""
+        while not stopped.wait(JOB_STALE_SECONDS / JOB_HEARTBEATS_PER_STALE):
+            try:
+                self._connect().execute(
+                    "UPDATE jobs SET updated_at = ? WHERE id = ? AND status = ?", (time.time(), job_id, RUNNING)
+                )
+            except Exception as e:
+                logger.warning(f"Heartbeat of job {job_id} failed: {e}")
+
+    def _claim(self):
+        """Atomically take the oldest runnable job, or return None.
+
+        Stale running jobs that have used up their attempts are marked failed
+        on the way, so their pollers get an answer.
+        """
+        kinds = list(self._handlers)
+        if not kinds:
+            return None
+        conn = self._connect()
+        now = time.time()
+        placeholders = ",".join("?" * len(kinds))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            abandoned = [job_id for job_id, in conn.execute(
+                f"SELECT id FROM jobs WHERE kind IN ({placeholders}) AND status = ? AND updated_at < ? "
+                "AND attempts >= ?",
+                (*kinds, RUNNING, now - JOB_STALE_SECONDS, JOB_MAX_ATTEMPTS),
+            )]
+            for job_id in abandoned:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ?, updated_at = ? WHERE id = ?",
+                    (FAILED, f"Job was interrupted {JOB_MAX_ATTEMPTS} times (its worker stopped responding)",
+                     now, now, job_id),
+                )
+            row = conn.execute(
+                f"SELECT id, kind, payload, stages FROM jobs WHERE kind IN ({placeholders}) AND "
+                "(status = ? OR (status = ? AND updated_at < ? AND attempts < ?)) "
+                "ORDER BY created_at LIMIT 1",
+                (*kinds, QUEUED, RUNNING, now - JOB_STALE_SECONDS, JOB_MAX_ATTEMPTS),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, updated_at = ?, "
+                    "stages = '[]' WHERE id = ?", (RUNNING, now, now, row[0])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        for job_id in abandoned:
+            logger.error(f"Job {job_id} failed: stale after {JOB_MAX_ATTEMPTS} attempts")
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+        if row is None:
+            return None
+        return Job(self, row[0], row[1], json.loads(row[2]), [])
+
+    def _finish(self, job, status, result=None, error=None):
+        now = time.time()
+        job._finish_stage(now, SUCCEEDED if status == SUCCEEDED else FAILED)
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, stages = ?, result = ?, error = ?, finished_at = ?, updated_at = ? "
+            "WHERE id = ?",
+            (status, json.dumps(job.stages), json.dumps(result) if result is not None else None,
+             error, now, now, job.id),
+        )
+        shutil.rmtree(job.dir, ignore_errors=True)
+
+    def _run(self, job):
+        start = time.perf_counter()
+        # Logs of a job carry its ID, which its submitter got back
+        token = set_request_id(f"job-{job.id}")
+        stopped = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job.id, stopped), name=f"job-heartbeat-{job.id}",
+                         daemon=True).start()
+        try:
+            try:
+                result = self._handlers[job.kind](job)
+            except Exception as e:
+                logger.error(f"{job.kind} job {job.id} failed: {e}")
+                self._finish(job, FAILED, error=str(e))
+                return
+            self._finish(job, SUCCEEDED, result=result)
+            logger.info(f"{job.kind} job {job.id} finished in {time.perf_counter() - start:.2f}s")
+        finally:
+            stopped.set()
+            reset_request_id(token)
+
+    def purge(self):
+        """Forget finished jobs older than JOB_TTL_SECONDS."""
+        self._connect().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+            (SUCCEEDED, FAILED, time.time() - JOB_TTL_SECONDS),
+        )
+
+    def _work(self):
+        last_purge = 0.0
+        while True:
+            try:
+                if time.time() - last_purge > 3600:
+                    self.purge()
+                    last_purge = time.time()
+                job = self._claim()
+            except Exception as e:
+                logger.error(f"Job queue error: {e}")
+                job = None
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(POLL_SECONDS)
+                continue
+            self._run(job)
+
+
+job_queue = JobQueue()
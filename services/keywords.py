@@ -0,0 +1,180 @@
+# services/keywords.py
+import re
+import math
+import logging
+from collections import Counter, defaultdict
+from services.clients import clients
+
+logger = logging.getLogger(__name__)
+
+MAX_PHRASE_WORDS = 3
+MIN_WORD_LENGTH = 3
+
+# NLTK's English stopword list, used when its corpus is not installed
+FALLBACK_STOPWORDS = frozenset("""
+i me my myself we our ours ourselves you your yours yourself yourselves he him his himself she her
+hers herself it its itself they them their theirs themselves what which who whom this that these
+those am is are was were be been being have has had having do does did doing a an the and but if or
+because as until while of at by for with about against between into through during before after
+above below to from up down in out on off over under again further then once here there when where
+why how all any both each few more most other some such no nor not only own same so than too very
+s t can will just don should now d ll m o re ve y ain aren couldn didn doesn hadn hasn haven isn ma
+mightn mustn needn shan shouldn wasn weren won wouldn
+""".split())
+# Filler that is frequent in papers but never a useful search term
+EXTRA_STOPWORDS = frozenset("""
+also may might must would could however thus hence therefore although whereas using used use uses
+based via within without among one two three first second new well within per et al fig figure
+table section paper work results result show shows shown propose proposed approach method methods
+""".split())
+
+TOKEN_RE = re.compile(r"[A-Za-z][A-Za-z0-9]*(?:-[A-Za-z0-9]+)*|[^\sA-Za-z]")
+
+
+def _load_stopwords():
+    """NLTK stopwords if the corpus is installed, else the built-in copy.
+
+    The corpus is never downloaded here: this runs on the request path. Install
+    it with `python -m nltk.downloader stopwords` at build time.
+    """
+    try:
+        from nltk.corpus import stopwords
+        return frozenset(stopwords.words('english'))
+    except Exception as e:
+        logger.debug(f"NLTK stopwords unavailable: {e}")
+    logger.info("Using built-in stopword list")
+    return FALLBACK_STOPWORDS
+
+
+class CorpusStats:
+    """Document frequencies of candidate phrases over a corpus (e.g. the chunks of a collection)."""
+
+    def __init__(self):
+        self.documents = 0
+        self.document_frequency = Counter()
+
+    def add(self, phrases):
+        self.documents += 1
+        self.document_frequency.update(set(phrases))
+
+    def idf(self, phrase):
+        # Smoothed so a phrase present in every document still counts a little
+        return math.log((1 + self.documents) / (1 + self.document_frequency[phrase])) + 1.0
+
+
+class KeywordExtractor:
+    """RAKE-style phrase extraction weighted by TF-IDF, built once per process.
+
+    Candidate phrases are runs of content words between stopwords and
+    punctuation. A run longer than MAX_PHRASE_WORDS contributes its single words
+    instead, rather than being cut into phrases the text never contains. A phrase scores the sum of its words' RAKE
+    degree/frequency ratios, times (1 + log tf), times its IDF against corpus
+    statistics when those are given. No tokenizer models or POS tagging are
+    involved, so extraction is a single regex pass over the text.
+    """
+
+    def __init__(self, stopwords=None, max_phrase_words=MAX_PHRASE_WORDS):
+        self.stopwords = (stopwords if stopwords is not None else _load_stopwords()) | EXTRA_STOPWORDS
+        self.max_phrase_words = max_phrase_words
+
+    def candidates(self, text):
+        """Candidate phrases of a text, as tuples of lowercase words, in order of appearance."""
+        phrases = []
+        run = []
+        for token in TOKEN_RE.findall(text.lower()):
+            if (len(token) < MIN_WORD_LENGTH or token in self.stopwords
+                    or not token[0].isalpha() or token.replace("-", "").isdigit()):
+                if run:
+                    phrases.extend(self._split_run(run))
+                    run = []
+            else:
+                run.append(token)
+        if run:
+            phrases.extend(self._split_run(run))
+        return phrases
+
+    def _split_run(self, run):
+        if len(run) <= self.max_phrase_words:
+            return [tuple(run)]
+        return [(word,) for word in run]
+
+    def fit(self, texts):
+        """Corpus statistics for a list of texts, one document each."""
+        stats = CorpusStats()
+        for text in texts:
+            stats.add(self.candidates(text))
+        return stats
+
+    def _rank(self, phrase_lists, stats, num_keywords):
+        word_frequency = Counter()
+        word_degree = Counter()
+        term_frequency = Counter()
+        for phrases in phrase_lists:
+            term_frequency.update(phrases)
+            for phrase in phrases:
+                for word in phrase:
+                    word_frequency[word] += 1
+                    word_degree[word] += len(phrase)
+
+        scores = {}
+        for phrase, tf in term_frequency.items():
+            score = sum(word_degree[w] / word_frequency[w] for w in phrase) * (1.0 + math.log(tf))
+            if stats is not None:
+                score *= stats.idf(phrase)
+            scores[phrase] = score
+
+        keywords = []
+        for phrase in sorted(scores, key=scores.get, reverse=True):
+            # Skip phrases overlapping one already picked ("neural network" vs "network")
+            if any(set(phrase) <= set(kept) or set(kept) <= set(phrase) for kept in keywords):
+                continue
+            keywords.append(phrase)
+            if len(keywords) == num_keywords:
+                break
+        return [" ".join(phrase) for phrase in keywords]
+
+    def extract(self, text, num_keywords=5, stats=None):
+        """Top phrases of one text, optionally weighted by corpus statistics."""
+        return self._rank([self.candidates(text)], stats, num_keywords)
+
+    def extract_batch(self, texts, num_keywords=5, stats=None):
+        """Top phrases of each text; without `stats`, the batch itself is the corpus."""
+        phrase_lists = [self.candidates(text) for text in texts]
+        if stats is None and len(texts) > 1:
+            stats = CorpusStats()
+            for phrases in phrase_lists:
+                stats.add(phrases)
+        return [self._rank([phrases], stats, num_keywords) for phrases in phrase_lists]
+
+    def extract_grouped(self, groups, num_keywords=5):
+        """Top phrases per group of chunks (e.g. per document of a collection).
+
+        `groups` maps a key to a list of chunk texts; the result maps the same keys
+        to keyword lists. Document frequency counts groups, not chunks, so a phrase
+        running through every chunk of one document is not penalised for it.
+        """
+        phrase_lists = {key: [self.candidates(chunk) for chunk in chunks] for key, chunks in groups.items()}
+        stats = CorpusStats()
+        for lists in phrase_lists.values():
+            stats.add(phrase for phrases in lists for phrase in phrases)
+        return {key: self._rank(lists, stats, num_keywords) for key, lists in phrase_lists.items()}
+
+    def extract_from_chunks(self, chunks, num_keywords=5, stats=None):
+        """Top phrases of a document given as chunks, weighted by IDF only if corpus `stats` are given."""
+        return self._rank([self.candidates(chunk) for chunk in chunks], stats, num_keywords)
+
+
+def group_chunks_by_document(chunks):
+    """Chunk texts of (text, metadata) pairs grouped by their doc_id metadata."""
+    groups = defaultdict(list)
+    for text, metadata in chunks:
+        groups[metadata.get("doc_id")].append(text)
+    return dict(groups)
+
+
+clients.register("keyword_extractor", KeywordExtractor)
+
+
+def get_keyword_extractor():
+    """The process-wide keyword extractor; stopwords are loaded once, on first use."""
+    return clients.get("keyword_extractor")
@@ -0,0 +1,142 @@
+# services/metrics.py
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the latency histogram buckets
+METRICS_BUCKETS = tuple(
+    float(bound) for bound in os.getenv("METRICS_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60").split(",")
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonic count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(f"{self.name}{_format_labels(self.labels, key)}", value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Distribution of observed values per label set: cumulative bucket counts, sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=METRICS_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # One count per bucket plus +Inf, then the running sum
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        lines = []
+        for key, values in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), values[:-1]):
+                cumulative += count
+                le = bound if bound == "+Inf" else _format_number(bound)
+                lines.append((f"{self.name}_bucket{_format_labels(self.labels, key, [('le', le)])}", cumulative))
+            lines.append((f"{self.name}_sum{_format_labels(self.labels, key)}", values[-1]))
+            lines.append((f"{self.name}_count{_format_labels(self.labels, key)}", cumulative))
+        return lines
+
+
+class MetricsRegistry:
+    """The metrics of this process, rendered in the Prometheus text format.
+
+    Each worker process keeps its own metrics; with several workers, scrape
+    each one (or aggregate in Prometheus) rather than reading one as the total.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labels, **kwargs)
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._get_or_create(Counter, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=METRICS_BUCKETS):
+        return self._get_or_create(Histogram, name, help, labels, buckets=buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{sample} {_format_number(value)}" for sample, value in metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+stage_seconds = metrics.histogram(
+    "pdfchat_stage_seconds",
+    "Time spent in each pipeline stage (pdf_extract, split, embed, index_load, search, llm_answer, ...)",
+    ("stage",),
+)
+
+
+def observe_stage(stage, seconds):
+    stage_seconds.observe(seconds, stage=stage)
+
+
+@contextmanager
+def timed(stage):
+    """Time the block as one observation of `stage`, whether or not it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
@@ -0,0 +1,241 @@
+# services/pdf_extract.py
+import io
+import os
+import time
+import bisect
+import hashlib
+import logging
+import tempfile
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from services.metrics import observe_stage
+from services.boot import warmup
+
+logger = logging.getLogger(__name__)
+
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+PAGES_PER_TASK = int(os.getenv("EXTRACT_PAGES_PER_TASK", "8"))
+# Below this many pages, extracting inline beats shipping work to the pool
+POOL_MIN_PAGES = 16
+PAGE_SEPARATOR = "\n"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # forkserver: safe to start from a threaded server process
+                _pool = ProcessPoolExecutor(
+                    max_workers=EXTRACT_WORKERS,
+                    mp_context=multiprocessing.get_context("forkserver"),
+                )
+    return _pool
+
+
+def _extract_pages(source, start, stop):
+    """Extract the text of pages [start, stop) from a PDF path or bytes (runs in pool workers)."""
+    from PyPDF2 import PdfReader
+    reader = PdfReader(source if isinstance(source, str) else io.BytesIO(source))
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def read_pdf_file(pdf):
+    """Read an uploaded PDF once and identify it by a hash of its content."""
+    data = pdf.read()
+    sha256 = hashlib.sha256(data).hexdigest()
+    return {"doc_id": sha256[:16], "sha256": sha256, "filename": pdf.filename, "data": data}
+
+
+def read_pdf_files(pdf_files):
+    return [read_pdf_file(pdf) for pdf in pdf_files]
+
+
+def spool_pdf_files(pdf_files):
+    """Split read PDFs into (file listing, {name: bytes}) so a background job can reload them."""
+    listing = [{key: f[key] for key in ("doc_id", "sha256", "filename")} for f in pdf_files]
+    return listing, {f"{f['sha256']}.pdf": f["data"] for f in pdf_files}
+
+
+def load_spooled_pdf_files(directory, listing):
+    """Inverse of spool_pdf_files: the read PDFs of a listing saved in `directory`."""
+    pdf_files = []
+    for entry in listing:
+        with open(os.path.join(directory, f"{entry['sha256']}.pdf"), "rb") as f:
+            pdf_files.append({**entry, "data": f.read()})
+    return pdf_files
+
+
+def _plan(pdf_files):
+    """Split every file into batches of at most PAGES_PER_TASK pages."""
+    from PyPDF2 import PdfReader
+    segments = []
+    for pdf_file in pdf_files:
+        count = len(PdfReader(io.BytesIO(pdf_file["data"])).pages)
+        for start in range(0, count, PAGES_PER_TASK):
+            segments.append((pdf_file, start, min(start + PAGES_PER_TASK, count)))
+    return segments
+
+
+def iter_pdf_pages(pdf_files):
+    """Yield {"doc_id", "filename", "page", "text"} for every page of every file, in order.
+
+    Pages of all files are extracted in batches on a process pool, with a
+    bounded number of batches in flight so memory stays flat however large the
+    input is. Nothing is cached here: the document store (services/documents.py)
+    keeps the text, so a PDF is only parsed when it is first ingested.
+    """
+    pdf_files = [f if isinstance(f, dict) else read_pdf_file(f) for f in pdf_files]
+    segments = _plan(pdf_files)
+    total = sum(stop - start for _, start, stop in segments)
+    use_pool = EXTRACT_WORKERS > 1 and total >= POOL_MIN_PAGES
+    logger.debug(f"Extracting {total} pages from {len(pdf_files)} files (pool: {use_pool})")
+
+    temp_paths = {}
+    extract_seconds = 0.0
+
+    def source(pdf_file):
+        # Pool workers read the PDF from a temp file instead of receiving its bytes per batch
+        if not use_pool:
+            return pdf_file["data"]
+        if pdf_file["sha256"] not in temp_paths:
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+                f.write(pdf_file["data"])
+            temp_paths[pdf_file["sha256"]] = f.name
+        return temp_paths[pdf_file["sha256"]]
+
+    def submit(segment):
+        pdf_file, start, stop = segment
+        if use_pool:
+            return _get_pool().submit(_extract_pages, source(pdf_file), start, stop)
+        return None
+
+    try:
+        window = max(1, EXTRACT_WORKERS * 2)
+        pending = deque()
+        remaining = iter(segments)
+        for segment in remaining:
+            pending.append((segment, submit(segment)))
+            if len(pending) >= window:
+                break
+
+        while pending:
+            (pdf_file, start, stop), future = pending.popleft()
+            next_segment = next(remaining, None)
+            if next_segment is not None:
+                pending.append((next_segment, submit(next_segment)))
+
+            extract_start = time.perf_counter()
+            texts = future.result() if future is not None else _extract_pages(pdf_file["data"], start, stop)
+            extract_seconds += time.perf_counter() - extract_start
+
+            for offset, text in enumerate(texts):
+                yield {
+                    "doc_id": pdf_file["doc_id"],
+                    "filename": pdf_file["filename"],
+                    "page": start + offset + 1,
+                    "text": text,
+                }
+    finally:
+        # Time spent extracting (or waiting on the pool), not consuming the pages
+        observe_stage("pdf_extract", extract_seconds)
+        for path in temp_paths.values():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _warm_splitter():
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+
+warmup.register("text_splitter", _warm_splitter)
+
+
+def _warm_pdf_reader():
+    from PyPDF2 import PdfReader
+
+
+warmup.register("pdf_reader", _warm_pdf_reader)
+
+
+def iter_page_chunks(pages, chunk_size, chunk_overlap):
+    """Split a page stream into (text, metadata) chunks without building whole-document strings.
+
+    Chunks may span page boundaries; metadata records the document, the page the
+    chunk starts on and its character offset in the document (`start_index`).
+    Only a few chunks' worth of text is buffered at any time.
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        add_start_index=True
+    )
+    flush_at = chunk_size * 4
+
+    doc = None
+    buffer = ""
+    buffer_offset = 0
+    doc_length = 0
+    page_offsets, page_numbers = [], []
+    split_seconds = 0.0
+
+    def split(final):
+        nonlocal buffer, buffer_offset, split_seconds
+        split_start = time.perf_counter()
+        pieces = splitter.create_documents([buffer])
+        split_seconds += time.perf_counter() - split_start
+        # Chunks near the end of the buffer may still grow once the next page arrives
+        keep_from = len(pieces) if final else next(
+            (i for i, piece in enumerate(pieces)
+             if piece.metadata["start_index"] + len(piece.page_content) > len(buffer) - chunk_size),
+            len(pieces),
+        )
+        for piece in pieces[:keep_from]:
+            start = buffer_offset + piece.metadata["start_index"]
+            page = page_numbers[bisect.bisect_right(page_offsets, start) - 1]
+            yield piece.page_content, {
+                "doc_id": doc["doc_id"],
+                "source": doc["filename"],
+                "page": page,
+                "start_index": start,
+            }
+        if not final and keep_from > 0:
+            # Carry from the first chunk not yet emitted; if all were (the tail is only
+            # whitespace the splitter dropped), nothing is left to split again
+            carry = pieces[keep_from].metadata["start_index"] if keep_from < len(pieces) else len(buffer)
+            buffer = buffer[carry:]
+            buffer_offset += carry
+            # Forget pages that ended before the carried text
+            first = max(0, bisect.bisect_right(page_offsets, buffer_offset) - 1)
+            del page_offsets[:first], page_numbers[:first]
+
+    try:
+        for page in pages:
+            if doc is None or page["doc_id"] != doc["doc_id"]:
+                if doc is not None and buffer.strip():
+                    yield from split(final=True)
+                doc = page
+                buffer, buffer_offset, doc_length = "", 0, 0
+                page_offsets, page_numbers = [], []
+            elif buffer or doc_length:
+                buffer += PAGE_SEPARATOR
+                doc_length += len(PAGE_SEPARATOR)
+            page_offsets.append(doc_length)
+            page_numbers.append(page["page"])
+            buffer += page["text"]
+            doc_length += len(page["text"])
+            if len(buffer) >= flush_at:
+                yield from split(final=False)
+
+        if doc is not None and buffer.strip():
+            yield from split(final=True)
+    finally:
+        observe_stage("split", split_seconds)
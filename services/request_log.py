@@ -0,0 +1,57 @@
+# services/request_log.py
+import os
+import uuid
+import random
+import logging
+import contextvars
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"
+# Share of requests whose bulky debug output (extracted text, chunk lists) is logged
+DEBUG_SAMPLE_RATE = float(os.getenv("DEBUG_SAMPLE_RATE", "0.01"))
+REQUEST_ID_HEADER = "X-Request-ID"
+
+_request_id = contextvars.ContextVar("request_id", default="-")
+
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+
+def get_request_id():
+    return _request_id.get()
+
+
+def set_request_id(request_id):
+    """Tag log records of this thread (or task) with `request_id`; returns a token for reset_request_id."""
+    return _request_id.set(request_id)
+
+
+def reset_request_id(token):
+    _request_id.reset(token)
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds the current request ID to every record as `request_id`."""
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+def configure_logging(level=LOG_LEVEL):
+    """Log to stderr with request IDs, at LOG_LEVEL; modules only create their own loggers."""
+    root = logging.getLogger()
+    if any(isinstance(f, RequestIdFilter) for handler in root.handlers for f in handler.filters):
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler.addFilter(RequestIdFilter())
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+def debug_sample(logger, message, rate=DEBUG_SAMPLE_RATE):
+    """Log a bulky debug message for a sample of calls; `message` is a callable, built only when logged."""
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < rate:
+        logger.debug(message())
@@ -0,0 +1,116 @@
+# services/retrieval.py
+import re
+import math
+import heapq
+import numpy as np
+
+# Identifiers such as "resnet-50", "eq.3" or "x_1" stay single terms
+TOKEN_RE = re.compile(r"\w+(?:[-.']\w+)*")
+# Standard constant of reciprocal-rank fusion; damps the weight of the very top ranks
+RRF_K = 60
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """Inverted index over chunk texts scored with Okapi BM25.
+
+    Postings map term -> {chunk_id: term frequency}. Chunks can be added and
+    removed incrementally, so the index follows its vector store through
+    appends and compactions.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.lengths = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def add(self, ids, texts):
+        for chunk_id, text in zip(ids, texts):
+            terms = tokenize(text)
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, count in counts.items():
+                self.postings.setdefault(term, {})[chunk_id] = count
+            self.lengths[chunk_id] = len(terms)
+            self.total_length += len(terms)
+
+    def remove(self, ids, texts):
+        for chunk_id, text in zip(ids, texts):
+            if chunk_id not in self.lengths:
+                continue
+            for term in set(tokenize(text)):
+                postings = self.postings.get(term)
+                if postings is not None:
+                    postings.pop(chunk_id, None)
+                    if not postings:
+                        del self.postings[term]
+            self.total_length -= self.lengths.pop(chunk_id)
+
+    def _size(self):
+        """(number of chunks, total length in terms)."""
+        return len(self.lengths), self.total_length
+
+    def _postings(self, term):
+        """[(chunk_id, term frequency, chunk length)] of the chunks containing a term."""
+        return [(chunk_id, tf, self.lengths[chunk_id]) for chunk_id, tf in self.postings.get(term, {}).items()]
+
+    def search(self, query, k, skip=None):
+        """Top k (chunk_id, score) for a query; chunks for which skip(chunk_id) is true are left out."""
+        n, total_length = self._size()
+        if not n:
+            return []
+        average_length = total_length / n or 1.0
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self._postings(term)
+            if not postings:
+                continue
+            idf = math.log(1.0 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf, length in postings:
+                norm = self.k1 * (1.0 - self.b + self.b * length / average_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1.0) / (tf + norm)
+        if skip is not None:
+            scores = {chunk_id: score for chunk_id, score in scores.items() if not skip(chunk_id)}
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Fuse ranked ID lists into [(id, score)], best first: score = sum of 1 / (k + rank)."""
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def mmr_select(relevance, vectors, k, lambda_mult=0.5):
+    """Maximal marginal relevance over candidates: indices of k picks, in pick order.
+
+    `relevance` are candidate scores (any scale, higher is better) and `vectors`
+    their embeddings; each pick trades relevance against cosine similarity to the
+    candidates already picked, so near-duplicate overlapping chunks are skipped.
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    relevance = relevance / (relevance.max() or 1.0)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+    similarity = vectors @ vectors.T
+
+    picked = [int(np.argmax(relevance))]
+    redundancy = similarity[picked[0]].copy()
+    while len(picked) < min(k, len(relevance)):
+        score = lambda_mult * relevance - (1.0 - lambda_mult) * redundancy
+        score[picked] = -np.inf
+        best = int(np.argmax(score))
+        picked.append(best)
+        redundancy = np.maximum(redundancy, similarity[best])
+    return picked
@@ -0,0 +1,17 @@
+# services/streaming.py
+import json
+from flask import Response, stream_with_context
+
+
+def sse_event(event, data):
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(events):
+    """Stream a generator of formatted events to the client without buffering."""
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
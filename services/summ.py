@@ -1,77 +1,212 @@
 # services/summ.py
 import os
+import time
+import uuid
+import random
+import hashlib
 import logging
-from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
-
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
+from concurrent.futures import ThreadPoolExecutor
+from services.documents import ingest_documents, document_chunks, GRANULARITIES
+from services.clients import clients
+from services.metrics import timed, observe_stage
+
 logger = logging.getLogger(__name__)
 
-def get_pdf_text(pdf_files):
-    """Extract text from PDF files."""
-    try:
-        text = ""
-        for pdf in pdf_files:
-            logger.debug(f"Processing PDF: {pdf.filename}")
-            pdf_reader = PdfReader(pdf)
-            for page in pdf_reader.pages:
-                text += page.extract_text()
-        logger.debug(f"Extracted text length: {len(text)}")
-        return text
-    except Exception as e:
-        logger.error(f"Error in get_pdf_text: {str(e)}")
-        raise
+CHUNK_GRANULARITY = "section"
+CHUNK_SIZE, CHUNK_OVERLAP = GRANULARITIES[CHUNK_GRANULARITY]
+
+SUMMARY_CACHE_DIR = os.getenv("SUMMARY_CACHE_DIR", "summary_cache")
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+SUMMARY_MAX_RETRIES = int(os.getenv("SUMMARY_MAX_RETRIES", "3"))
+SUMMARY_RETRY_BASE_SECONDS = float(os.getenv("SUMMARY_RETRY_BASE_SECONDS", "1.0"))
+# Inputs up to this size go to the model in one call; larger ones are map-reduced
+SINGLE_PASS_MAX_CHARS = int(os.getenv("SUMMARY_SINGLE_PASS_MAX_CHARS", "30000"))
+REDUCE_FAN_IN = 4
+REDUCE_MAX_CHARS = 20000
+
+SUMMARY_PROMPT = """
+        Please provide a comprehensive summary of the following text. Focus on the main points and key insights:
+
+        {text}
+
+        Summary:
+        """
 
-def get_text_chunks(text):
-    """Split text into chunks."""
+MAP_PROMPT = """
+        The following is one section of a longer document. Summarize this section, keeping its main points, key insights and any important names, figures or terms:
+
+        {text}
+
+        Section summary:
+        """
+
+REDUCE_PROMPT = """
+        The following are summaries of consecutive sections of a document. Combine them into one coherent summary that keeps the main points and key insights:
+
+        {text}
+
+        Combined summary:
+        """
+
+def get_pdf_chunks(pdf_files):
+    """Section chunks of PDF files (uploads, read PDFs or ingested {"doc_id": ...}), ingesting new ones once."""
     try:
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=10000,
-            chunk_overlap=1000,
-            separators=["\n\n", "\n", " ", ""]
-        )
-        chunks = text_splitter.split_text(text)
+        chunks = document_chunks(ingest_documents(pdf_files), CHUNK_GRANULARITY)
         logger.debug(f"Created {len(chunks)} text chunks")
         return chunks
     except Exception as e:
-        logger.error(f"Error in get_text_chunks: {str(e)}")
+        logger.error(f"Error in get_pdf_chunks: {str(e)}")
         raise
 
-def summarize_text(text_chunks):
-    """Summarize the text chunks using Google Generative AI."""
+def _model_name(llm):
+    """Name of the model behind an LLM, for cache keys: its model name, else its class."""
+    name = getattr(llm, "model", None) or getattr(llm, "model_name", None)
+    # Google clients report "models/<name>"; keep keys the same as for the bare name
+    return name.removeprefix("models/") if isinstance(name, str) else type(llm).__name__
+
+def _summary_key(template, model_name, text):
+    return hashlib.sha256(f"{model_name}\0{template}\0{text}".encode("utf-8")).hexdigest()
+
+def _cache_get(key):
     try:
-        # Check if API key is set
-        api_key = os.getenv('GOOGLE_API_KEY')
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY environment variable is not set")
-        
-        logger.debug("Initializing Google Generative AI model")
-        llm = ChatGoogleGenerativeAI(model="gemini-pro")
-        
-        # Combine chunks with appropriate spacing
-        full_text = " ".join(text_chunks)
-        logger.debug(f"Combined text length: {len(full_text)}")
-        
-        prompt_template = """
-        Please provide a comprehensive summary of the following text. Focus on the main points and key insights:
+        with open(os.path.join(SUMMARY_CACHE_DIR, f"{key}.txt"), encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
 
-        {text}
+def _cache_put(key, summary):
+    os.makedirs(SUMMARY_CACHE_DIR, exist_ok=True)
+    path = os.path.join(SUMMARY_CACHE_DIR, f"{key}.txt")
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(summary)
+    os.replace(tmp_path, path)
 
-        Summary:
-        """
-        
-        prompt = PromptTemplate(template=prompt_template, input_variables=["text"])
-        chain = LLMChain(llm=llm, prompt=prompt)
-        
-        logger.debug("Generating summary")
-        summary = chain.run(text=full_text)
+def _run_with_retry(chain, text):
+    """Run an LLM chain, retrying transient failures with exponential backoff and jitter."""
+    for attempt in range(SUMMARY_MAX_RETRIES + 1):
+        try:
+            with timed("llm_summary"):
+                return chain.run(text=text)
+        except Exception as e:
+            if attempt == SUMMARY_MAX_RETRIES:
+                raise
+            delay = SUMMARY_RETRY_BASE_SECONDS * (2 ** attempt) * (1 + random.random())
+            logger.warning(f"Summary call failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def _summarize_one(chain, template, model_name, text):
+    """Summarize one piece of text, reusing the cached result for identical input."""
+    key = _summary_key(template, model_name, text)
+    summary = _cache_get(key)
+    if summary is None:
+        summary = _run_with_retry(chain, text).strip()
+        _cache_put(key, summary)
+    return summary
+
+def _group_for_reduce(summaries):
+    """Group partial summaries so each reduce call gets at most REDUCE_FAN_IN of them
+    and stays within REDUCE_MAX_CHARS."""
+    groups, current, size = [], [], 0
+    for summary in summaries:
+        if current and (len(current) >= REDUCE_FAN_IN or size + len(summary) > REDUCE_MAX_CHARS):
+            groups.append(current)
+            current, size = [], 0
+        current.append(summary)
+        size += len(summary)
+    if current:
+        groups.append(current)
+    return groups
+
+def _build_chain(llm, template):
+    from langchain.chains import LLMChain
+    from langchain.prompts import PromptTemplate
+    return LLMChain(llm=llm, prompt=PromptTemplate(template=template, input_variables=["text"]))
+
+PROMPTS = {"final": SUMMARY_PROMPT, "map": MAP_PROMPT, "reduce": REDUCE_PROMPT}
+
+for _name, _template in PROMPTS.items():
+    clients.register(
+        f"summary_chain:{_name}",
+        lambda template=_template: _build_chain(clients.get("summary_model"), template),
+        depends_on=("summary_model",)
+    )
+
+def _get_chains(llm):
+    """Chains for each summarization step: the shared ones, or ones built on a given llm."""
+    if llm is not None:
+        return llm, {name: _build_chain(llm, template) for name, template in PROMPTS.items()}
+    return clients.get("summary_model"), {name: clients.get(f"summary_chain:{name}") for name in PROMPTS}
+
+def _final_input(text_chunks, chains, model_name):
+    """Run the map phase and all but the last reduce level; return the input of the final call."""
+    total_length = sum(len(chunk) for chunk in text_chunks)
+    logger.debug(f"Summarizing {len(text_chunks)} chunks, combined length: {total_length}")
+    if total_length <= SINGLE_PASS_MAX_CHARS:
+        return " ".join(text_chunks)
+
+    map_chain, reduce_chain = chains["map"], chains["reduce"]
+
+    with ThreadPoolExecutor(max_workers=SUMMARY_CONCURRENCY) as executor:
+        logger.debug("Generating chunk summaries")
+        summaries = list(executor.map(
+            lambda chunk: _summarize_one(map_chain, MAP_PROMPT, model_name, chunk), text_chunks
+        ))
+
+        level = 0
+        while True:
+            groups = _group_for_reduce(summaries)
+            if len(groups) == 1:
+                return "\n\n".join(groups[0])
+            level += 1
+            logger.debug(f"Reduce level {level}: {len(summaries)} summaries in {len(groups)} groups")
+            summaries = list(executor.map(
+                lambda group: _summarize_one(reduce_chain, REDUCE_PROMPT, model_name, "\n\n".join(group)), groups
+            ))
+
+def summarize_text(text_chunks, llm=None, model_name=None):
+    """Summarize the text chunks using Google Generative AI.
+
+    Short inputs are summarized in a single call. Longer ones are summarized per
+    chunk in parallel (map), then the partial summaries are combined in a tree
+    of reduce calls until one summary remains. Every call is cached by its input,
+    so re-summarizing an unchanged document costs no model calls. Pass `llm` to
+    use another model, e.g. a fake LLM in tests. Cache entries are keyed by
+    `model_name`, which defaults to the name the model in use reports.
+    """
+    try:
+        llm, chains = _get_chains(llm)
+        model_name = model_name or _model_name(llm)
+        final_input = _final_input(text_chunks, chains, model_name)
+        summary = _summarize_one(chains["final"], SUMMARY_PROMPT, model_name, final_input)
         logger.debug(f"Summary generated, length: {len(summary)}")
-        
-        return summary.strip()
+        return summary
     except Exception as e:
         logger.error(f"Error in summarize_text: {str(e)}")
         raise
+
+def stream_summary(text_chunks, llm=None, model_name=None):
+    """Like summarize_text, but yield the final summary as the model produces it."""
+    try:
+        llm, chains = _get_chains(llm)
+        model_name = model_name or _model_name(llm)
+        final_input = _final_input(text_chunks, chains, model_name)
+        key = _summary_key(SUMMARY_PROMPT, model_name, final_input)
+        cached = _cache_get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        start = time.perf_counter()
+        for chunk in llm.stream(chains["final"].prompt.format(text=final_input)):
+            # Chat models stream message chunks, plain LLMs stream strings
+            text = getattr(chunk, "content", chunk)
+            if text:
+                parts.append(text)
+                yield text
+        observe_stage("llm_summary", time.perf_counter() - start)
+        _cache_put(key, "".join(parts).strip())
+    except Exception as e:
+        logger.error(f"Error in stream_summary: {str(e)}")
+        raise
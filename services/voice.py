@@ -1,10 +1,212 @@
 # services/voice.py
-import speech_recognition as sr
-
-def transcribe_audio():
-    recognizer = sr.Recognizer()
-    with sr.Microphone() as source:
-        print("Listening...")
-        audio = recognizer.listen(source)
-        print("Processing audio...")
-        return recognizer.recognize_google(audio)
+import io
+import os
+import json
+import time
+import uuid
+import logging
+from filelock import FileLock
+from services.clients import clients
+from services.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# google (Google's web speech API), sphinx (pocketsphinx, offline) or vosk (offline, needs VOSK_MODEL_PATH)
+VOICE_RECOGNIZER = os.getenv("VOICE_RECOGNIZER", "google")
+VOICE_LANGUAGE = os.getenv("VOICE_LANGUAGE", "en-US")
+VOSK_MODEL_PATH = os.getenv("VOSK_MODEL_PATH", "vosk-model")
+# Streamed recordings are spooled here until the conversation request picks them up
+VOICE_UPLOADS_DIR = os.getenv("VOICE_UPLOADS_DIR", "voice_uploads")
+VOICE_MAX_UPLOAD_BYTES = int(os.getenv("VOICE_MAX_UPLOAD_BYTES", str(10 * 2 ** 20)))
+VOICE_UPLOAD_TTL_SECONDS = int(os.getenv("VOICE_UPLOAD_TTL_SECONDS", "600"))
+
+# Streamed chunks are raw little-endian PCM, mono, in this format unless the client says otherwise
+PCM_SAMPLE_RATE = 16000
+PCM_SAMPLE_WIDTH = 2
+PCM_CONTENT_TYPES = ("audio/l16", "audio/pcm", "application/octet-stream")
+
+
+class UploadNotFoundError(Exception):
+    pass
+
+
+def load_audio(data, content_type=None, sample_rate=PCM_SAMPLE_RATE, sample_width=PCM_SAMPLE_WIDTH):
+    """An uploaded recording as AudioData: raw PCM, or a WAV/AIFF/FLAC file.
+
+    Raises ValueError for empty or unreadable audio.
+    """
+    import speech_recognition as sr
+    if not data:
+        raise ValueError("No audio received")
+    if content_type and content_type.split(";")[0].strip().lower() in PCM_CONTENT_TYPES:
+        if len(data) % sample_width:
+            raise ValueError("PCM audio length is not a whole number of samples")
+        return sr.AudioData(data, sample_rate, sample_width)
+    try:
+        with sr.AudioFile(io.BytesIO(data)) as source:
+            return sr.Recognizer().record(source)
+    except ValueError:
+        raise ValueError("Unsupported audio format; send WAV, AIFF, FLAC or raw 16-bit PCM")
+
+
+def audio_seconds(audio):
+    return len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+
+
+class GoogleRecognizer:
+    """Google's web speech API through SpeechRecognition (needs network)."""
+
+    def __init__(self, language=VOICE_LANGUAGE):
+        import speech_recognition as sr
+        self.language = language
+        self.recognizer = sr.Recognizer()
+
+    def transcribe(self, audio):
+        return self.recognizer.recognize_google(audio, language=self.language)
+
+
+class SphinxRecognizer:
+    """CMU pocketsphinx through SpeechRecognition; offline, English model bundled with pocketsphinx."""
+
+    def __init__(self, language=VOICE_LANGUAGE):
+        import speech_recognition as sr
+        self.language = language
+        self.recognizer = sr.Recognizer()
+
+    def transcribe(self, audio):
+        return self.recognizer.recognize_sphinx(audio, language=self.language)
+
+
+class VoskRecognizer:
+    """Offline Kaldi recognizer; the model at `model_path` is loaded once and shared by all requests."""
+
+    sample_rate = 16000
+
+    def __init__(self, model_path=VOSK_MODEL_PATH):
+        from vosk import Model, SetLogLevel
+        SetLogLevel(-1)
+        self.model = Model(model_path)
+
+    def transcribe(self, audio):
+        import speech_recognition as sr
+        from vosk import KaldiRecognizer
+        recognizer = KaldiRecognizer(self.model, self.sample_rate)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2))
+        text = json.loads(recognizer.FinalResult()).get("text", "")
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+RECOGNIZERS = {"google": GoogleRecognizer, "sphinx": SphinxRecognizer, "vosk": VoskRecognizer}
+
+
+class SpeechToText:
+    """Transcribes recordings with a pluggable recognizer.
+
+    `recognizer` is any object with transcribe(AudioData) returning the text and
+    raising sr.UnknownValueError when nothing intelligible was said.
+    """
+
+    def __init__(self, recognizer=None):
+        self.recognizer = recognizer if recognizer is not None else RECOGNIZERS[VOICE_RECOGNIZER]()
+
+    def transcribe(self, audio):
+        """Transcript of a recording; raises ValueError if no speech could be recognized."""
+        import speech_recognition as sr
+        try:
+            with timed("transcribe"):
+                text = self.recognizer.transcribe(audio)
+        except sr.UnknownValueError:
+            raise ValueError("Could not understand audio")
+        if not text or not text.strip():
+            raise ValueError("No speech detected")
+        return text.strip()
+
+
+clients.register("speech_to_text", SpeechToText)
+
+
+def get_speech_to_text():
+    """The process-wide speech recognizer."""
+    return clients.get("speech_to_text")
+
+
+class VoiceUploads:
+    """Recordings streamed in chunks while the user speaks, spooled to disk.
+
+    Any process sharing `uploads_dir` can take chunks or finish an upload, so
+    the chunks and the conversation request need not hit the same worker; a
+    file lock per upload serialises them across processes. A chunk carries the
+    byte offset it starts at; a chunk whose offset does not match the bytes
+    received so far is rejected, which makes retried chunks safe.
+    """
+
+    def __init__(self, uploads_dir=VOICE_UPLOADS_DIR, max_bytes=VOICE_MAX_UPLOAD_BYTES,
+                 ttl_seconds=VOICE_UPLOAD_TTL_SECONDS):
+        self.uploads_dir = uploads_dir
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+    def _path(self, upload_id):
+        if not upload_id or not upload_id.isalnum():
+            raise UploadNotFoundError(f"Upload {upload_id} not found")
+        return os.path.join(self.uploads_dir, f"{upload_id}.pcm")
+
+    def create(self):
+        self.evict_stale()
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        upload_id = uuid.uuid4().hex
+        open(self._path(upload_id), "xb").close()
+        return upload_id
+
+    def append(self, upload_id, data, offset=None):
+        """Append a chunk; returns the bytes received so far.
+
+        Raises UploadNotFoundError, and ValueError for a wrong offset or an upload over the size limit.
+        """
+        path = self._path(upload_id)
+        with FileLock(f"{path}.lock"):
+            try:
+                size = os.path.getsize(path)
+            except FileNotFoundError:
+                raise UploadNotFoundError(f"Upload {upload_id} not found")
+            if offset is not None and offset != size:
+                raise ValueError(f"Chunk starts at byte {offset}, but {size} bytes were received")
+            if size + len(data) > self.max_bytes:
+                raise ValueError(f"Recording exceeds {self.max_bytes} bytes")
+            with open(path, "ab") as f:
+                f.write(data)
+            return size + len(data)
+
+    def take(self, upload_id):
+        """The whole recording of an upload, which is removed."""
+        path = self._path(upload_id)
+        with FileLock(f"{path}.lock"):
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                os.remove(path)
+            except FileNotFoundError:
+                raise UploadNotFoundError(f"Upload {upload_id} not found")
+        try:
+            os.remove(f"{path}.lock")
+        except FileNotFoundError:
+            pass
+        return data
+
+    def evict_stale(self):
+        """Remove uploads (and their lock files) abandoned for longer than the TTL."""
+        if not os.path.isdir(self.uploads_dir):
+            return
+        cutoff = time.time() - self.ttl_seconds
+        for name in os.listdir(self.uploads_dir):
+            path = os.path.join(self.uploads_dir, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+voice_uploads = VoiceUploads()
@@ -0,0 +1,234 @@
+# services/web_search.py
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+import requests
+from services.clients import clients
+from services.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# google (scrapes Google through googlesearch), http (a JSON search API such as
+# SearXNG, or benchmarks/web_search_stub.py) or none
+WEB_SEARCH_BACKEND = os.getenv("WEB_SEARCH_BACKEND", "google")
+WEB_SEARCH_URL = os.getenv("WEB_SEARCH_URL", "http://127.0.0.1:8766/search")
+# Most the fallback may add to an answer, counted from when the answer is ready
+WEB_SEARCH_DEADLINE_SECONDS = float(os.getenv("WEB_SEARCH_DEADLINE_SECONDS", "2.0"))
+# Timeout of the search request itself; a search that misses the deadline keeps
+# running up to this long so its results are cached for the next asker
+WEB_SEARCH_TIMEOUT_SECONDS = float(os.getenv("WEB_SEARCH_TIMEOUT_SECONDS", "10"))
+# Start the search when the question arrives instead of after the model says it cannot answer.
+# Off by default, and never done with a backend that scrapes (google): speculation
+# searches for every uncached question, most of which the documents answer.
+WEB_SEARCH_SPECULATIVE = os.getenv("WEB_SEARCH_SPECULATIVE", "0") == "1"
+# Searches queued or running at once; further searches are refused rather than piling up
+WEB_SEARCH_MAX_PENDING = int(os.getenv("WEB_SEARCH_MAX_PENDING", "32"))
+WEB_SEARCH_RESULTS = int(os.getenv("WEB_SEARCH_RESULTS", "3"))
+WEB_SEARCH_CACHE_TTL_SECONDS = int(os.getenv("WEB_SEARCH_CACHE_TTL_SECONDS", "3600"))
+WEB_SEARCH_CACHE_MAX_ENTRIES = 1000
+WEB_SEARCH_CONCURRENCY = int(os.getenv("WEB_SEARCH_CONCURRENCY", "4"))
+
+NO_RESULTS = "No relevant information found on the internet."
+
+
+class GoogleSearchBackend:
+    """Google results through googlesearch-python; each request times out after `timeout` seconds."""
+
+    # Scraping: search only when an answer actually needs it
+    allows_speculative = False
+
+    def __init__(self, timeout=WEB_SEARCH_TIMEOUT_SECONDS):
+        self.timeout = timeout
+
+    def search(self, query, num_results):
+        from googlesearch import search
+        return [
+            {"url": result.url, "title": result.title, "description": result.description}
+            for result in search(query, num_results=num_results, advanced=True, timeout=self.timeout)
+        ]
+
+
+class HttpSearchBackend:
+    """A search API returning SearXNG-style JSON: {"results": [{"url", "title", "content"}]}."""
+
+    allows_speculative = True
+
+    def __init__(self, url=WEB_SEARCH_URL, timeout=WEB_SEARCH_TIMEOUT_SECONDS):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def search(self, query, num_results):
+        response = self.session.get(self.url, params={"q": query, "format": "json"}, timeout=self.timeout)
+        response.raise_for_status()
+        return [
+            {"url": result["url"], "title": result.get("title", ""), "description": result.get("content", "")}
+            for result in response.json().get("results", [])[:num_results]
+        ]
+
+
+class NoSearchBackend:
+    """Internet fallback switched off."""
+
+    allows_speculative = True
+
+    def search(self, query, num_results):
+        return []
+
+
+BACKENDS = {"google": GoogleSearchBackend, "http": HttpSearchBackend, "none": NoSearchBackend}
+
+
+class WebSearch:
+    """Internet search for the answer fallback, shared by all requests of a process.
+
+    `backend` is any object with search(query, num_results) returning
+    [{"url", "title", "description"}]. Searches run on a small thread pool so
+    they can start before they are needed; callers wait for them at most
+    `deadline` seconds and get None when it passes, while the search finishes
+    in the background and fills the cache. Results
+    are kept per query for `ttl_seconds`, and concurrent searches for the
+    same query share one request. At most `max_pending` searches are queued or
+    running; past that, new searches are refused (their callers get no
+    results) and speculative ones are not started at all.
+    """
+
+    def __init__(self, backend=None, deadline=WEB_SEARCH_DEADLINE_SECONDS, num_results=WEB_SEARCH_RESULTS,
+                 ttl_seconds=WEB_SEARCH_CACHE_TTL_SECONDS, max_entries=WEB_SEARCH_CACHE_MAX_ENTRIES,
+                 concurrency=WEB_SEARCH_CONCURRENCY, speculative=WEB_SEARCH_SPECULATIVE,
+                 max_pending=WEB_SEARCH_MAX_PENDING):
+        self.backend = backend if backend is not None else BACKENDS[WEB_SEARCH_BACKEND]()
+        self.speculative = speculative and getattr(self.backend, "allows_speculative", False)
+        if speculative and not self.speculative:
+            logger.warning(f"Speculative web search is not used with {type(self.backend).__name__}")
+        self.max_pending = max_pending
+        self.deadline = deadline
+        self.num_results = num_results
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="web-search")
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._in_flight = {}
+        self._pending = 0
+        self.hits = 0
+        self.misses = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.refused = 0
+        self.speculative_dropped = 0
+
+    def _cached(self, query):
+        # Caller holds self._lock
+        entry = self._cache.get(query)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > self.ttl_seconds:
+            del self._cache[query]
+            return None
+        self._cache.move_to_end(query)
+        return entry[1]
+
+    def _run(self, query):
+        try:
+            with timed("web_search"):
+                results = self.backend.search(query, self.num_results)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+                self._in_flight.pop(query, None)
+            logger.warning(f"Web search for {query!r} failed: {e}")
+            raise
+        finally:
+            with self._lock:
+                self._pending -= 1
+        with self._lock:
+            self._cache[query] = (time.monotonic(), results)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+            self._in_flight.pop(query, None)
+        return results
+
+    def start(self, query, speculative=False):
+        """Start searching for a query (or join the search already running); returns a future.
+
+        With `speculative`, returns None instead of starting a new search when
+        speculation is off for this backend or the queue is full.
+        """
+        if speculative and not self.speculative:
+            return None
+        with self._lock:
+            results = self._cached(query)
+            if results is not None:
+                self.hits += 1
+                future = Future()
+                future.set_result(results)
+                return future
+            future = self._in_flight.get(query)
+            if future is None:
+                if self._pending >= self.max_pending:
+                    if speculative:
+                        self.speculative_dropped += 1
+                        return None
+                    self.refused += 1
+                    future = Future()
+                    future.set_exception(RuntimeError(f"{self._pending} web searches already pending"))
+                    return future
+                self.misses += 1
+                self._pending += 1
+                future = self._in_flight[query] = self._executor.submit(self._run, query)
+            return future
+
+    def wait(self, future, timeout=None):
+        """Results of a started search, or None if it failed or is not done within timeout (default: the deadline)."""
+        timeout = self.deadline if timeout is None else timeout
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            logger.info(f"Web search missed its {timeout:.1f}s deadline")
+        except Exception:
+            pass
+        return None
+
+    def search(self, query, timeout=None):
+        """Results for a query within the deadline, or None."""
+        return self.wait(self.start(query), timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": type(self.backend).__name__,
+                "hits": self.hits,
+                "misses": self.misses,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "refused": self.refused,
+                "speculative_dropped": self.speculative_dropped,
+                "pending": self._pending,
+                "entries": len(self._cache),
+                "deadline_seconds": self.deadline,
+                "speculative": self.speculative,
+            }
+
+
+def format_results(results):
+    """Search results as the text appended to an answer."""
+    if not results:
+        return NO_RESULTS
+    return "\n".join(
+        f"- {result['title']}: {result['url']}" if result.get("title") else f"- {result['url']}"
+        for result in results
+    )
+
+
+clients.register("web_search", WebSearch)
+
+
+def get_web_search():
+    """The process-wide web search layer."""
+    return clients.get("web_search")
@@ -0,0 +1,64 @@
+# tests/conftest.py
+import io
+import os
+import sys
+import time
+import pytest
+from werkzeug.datastructures import FileStorage
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+os.environ.setdefault("GOOGLE_API_KEY", "unused")
+
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from synthetic_pdf import synthetic_pdf
+from services.clients import clients
+from services.embedding_cache import CachedEmbeddings
+from services.web_search import WebSearch, NoSearchBackend
+
+
+@pytest.fixture
+def fake_clients(tmp_path, monkeypatch):
+    """Offline fakes for every model and search client, with every store under a temporary directory."""
+    monkeypatch.chdir(tmp_path)
+    clients.register("embeddings", lambda: CachedEmbeddings(DeterministicFakeEmbedding(size=32), "fake"))
+    clients.register("chat_model", lambda: FakeListChatModel(responses=["An answer."]))
+    clients.register("summary_model", lambda: FakeListChatModel(responses=["A summary."]))
+    clients.register("web_search", lambda: WebSearch(NoSearchBackend()))
+    return clients
+
+
+@pytest.fixture
+def client(fake_clients):
+    """Test client of the app with offline fakes."""
+    import app
+    return app.app.test_client()
+
+
+def wait_for_job(client, status_url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = client.get(status_url).get_json()
+        if status["status"] in ("succeeded", "failed"):
+            return status
+        time.sleep(0.02)
+    raise TimeoutError(status_url)
+
+
+def pdf_upload(seed, pages=2):
+    """A synthetic PDF as Flask hands over an uploaded file."""
+    return FileStorage(io.BytesIO(synthetic_pdf(pages, seed=seed)), filename=f"{seed}.pdf")
+
+
+def upload(client, *pdfs):
+    """Upload PDFs and wait for the job; returns the job status."""
+    response = client.post("/upload", data={"files": [(io.BytesIO(pdf), f"{i}.pdf") for i, pdf in enumerate(pdfs)]})
+    assert response.status_code == 202
+    return wait_for_job(client, response.get_json()["status_url"])
+
+
+@pytest.fixture
+def pdf():
+    return synthetic_pdf(3, seed=1)
@@ -0,0 +1,77 @@
+# tests/test_answer_cache.py
+import io
+from services import answer_cache
+from services.answer_cache import AnswerCache
+from synthetic_pdf import synthetic_pdf
+from conftest import upload
+
+
+def test_exact_tier_normalizes_questions():
+    cache = AnswerCache()
+    cache.put("c1", "v1", "what is  attention?", "Answer.")
+    assert cache.get("c1", "v1", "what is attention") == "Answer."
+    assert cache.get("c2", "v1", "what is attention") is None
+    assert cache.stats()["exact_hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_new_version_drops_the_collection_answers():
+    cache = AnswerCache()
+    cache.put("c1", "v1", "q", "Old answer.")
+    cache.put("c2", "v1", "q", "Other collection.")
+    assert cache.get("c1", "v2", "q") is None
+    # Going back to the old stamp does not resurrect its answers
+    assert cache.get("c1", "v1", "q") is None
+    assert cache.get("c2", "v1", "q") == "Other collection."
+    cache.invalidate("c2")
+    assert cache.get("c2", "v1", "q") is None
+
+
+def test_lru_bound():
+    cache = AnswerCache(max_entries=2)
+    cache.put("c1", "v1", "a", "A")
+    cache.put("c1", "v1", "b", "B")
+    assert cache.get("c1", "v1", "a") == "A"
+    cache.put("c1", "v1", "c", "C")
+    # b was the least recently used
+    assert cache.get("c1", "v1", "b") is None
+    assert cache.get("c1", "v1", "a") == "A" and cache.get("c1", "v1", "c") == "C"
+    assert cache.stats()["entries"] == 2
+
+
+def test_semantic_tier_threshold():
+    cache = AnswerCache(semantic=True, threshold=0.9)
+    cache.put("c1", "v1", "what is attention", "Attention answer.", vector=[1.0, 0.0, 0.0])
+    # cos = 0.995 and 0.707
+    assert cache.get_similar("c1", "v1", [1.0, 0.1, 0.0]) == "Attention answer."
+    assert cache.get_similar("c1", "v1", [1.0, 1.0, 0.0]) is None
+    assert cache.get_similar("c1", "v2", [1.0, 0.0, 0.0]) is None
+    stats = cache.stats()
+    assert stats["semantic_hits"] == 1 and stats["misses"] == 2
+
+
+def test_semantic_tier_is_off_by_default():
+    cache = AnswerCache(semantic=False)
+    cache.put("c1", "v1", "q", "A", vector=[1.0, 0.0])
+    assert cache.get_similar("c1", "v1", [1.0, 0.0]) is None
+
+
+def test_semantic_tier_bound(monkeypatch):
+    monkeypatch.setattr(answer_cache, "SEMANTIC_MAX_PER_COLLECTION", 2)
+    cache = AnswerCache(semantic=True, threshold=0.99)
+    for i, vector in enumerate(([1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0])):
+        cache.put("c1", "v1", f"q{i}", f"A{i}", vector=vector)
+    assert cache.get_similar("c1", "v1", [1.0, 0.0, 0.0]) is None
+    assert cache.get_similar("c1", "v1", [0.0, 0.0, 1.0]) == "A2"
+
+
+def test_ask_cache_follows_collection_versions(client):
+    status = upload(client, synthetic_pdf(2, seed=1))
+    collection_id = status["result"]["collection_id"]
+    ask = lambda: client.post("/ask", data={"question": "What is this?", "collection_id": collection_id}).get_json()
+    assert ask()["cached"] is False
+    assert ask()["cached"] is True
+
+    response = client.post(f"/collections/{collection_id}/documents",
+                           data={"files": [(io.BytesIO(synthetic_pdf(2, seed=2)), "more.pdf")]})
+    assert response.status_code == 200
+    assert ask()["cached"] is False
@@ -0,0 +1,43 @@
+# tests/test_arxiv_search.py
+import pytest
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from arxiv_stub import ArxivStubServer
+from services.clients import clients
+from services.embedding_cache import CachedEmbeddings, EmbeddingCache
+from services.arxiv_search import ArxivSearch, ArxivCache
+
+
+@pytest.fixture
+def stub():
+    server = ArxivStubServer().start()
+    yield server
+    server.stop()
+
+
+def test_search_and_lookup_through_stub(stub, tmp_path):
+    search = ArxivSearch(api_url=stub.url, min_interval=0, cache=ArxivCache(str(tmp_path)))
+    papers = search.search(["graph networks", "attention"], max_results=5)
+    assert len(papers) == 5
+    assert len({paper["arxiv_id"] for paper in papers}) == 5
+    paper = papers[0]
+    assert paper["title"].startswith("On ")
+    assert paper["pdf_url"] == f"http://arxiv.org/pdf/{paper['arxiv_id']}"
+    assert paper["authors"] and paper["published"].startswith("2023-")
+
+    requests_before = stub.requests
+    assert search.search(["graph networks", "attention"], max_results=5) == papers
+    assert stub.requests == requests_before
+
+    looked_up = search.lookup(["2401.00001v1", paper["arxiv_id"]])
+    assert [p["arxiv_id"] for p in looked_up] == ["2401.00001v1", paper["arxiv_id"]]
+    assert stub.requests == requests_before + 1
+
+
+def test_rerank_does_not_fill_the_embedding_cache(stub, tmp_path):
+    embeddings = CachedEmbeddings(DeterministicFakeEmbedding(size=16), "fake",
+                                  cache=EmbeddingCache("fake", cache_dir=str(tmp_path / "embeddings")))
+    clients.register("embeddings", lambda: embeddings)
+    search = ArxivSearch(api_url=stub.url, min_interval=0, cache=ArxivCache(str(tmp_path)))
+    papers = search.search(["graph networks"], max_results=5, document_text="A document about graphs.")
+    assert len(papers) == 5 and all("similarity" in paper for paper in papers)
+    assert embeddings.cache.stats()["entries"] == 0
@@ -0,0 +1,70 @@
+# tests/test_ask_batch.py
+import re
+import time
+import pytest
+from langchain_core.language_models import SimpleChatModel
+from synthetic_pdf import synthetic_pdf
+from services.clients import clients
+from conftest import upload
+
+
+class EchoChatModel(SimpleChatModel):
+    """Answers with the question it was asked, slower for earlier questions so completions arrive out of order."""
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        question = re.search(r"Question:\s*(.*?)\s*Answer:", messages[-1].content, re.S).group(1)
+        number = int(re.search(r"\d+", question).group())
+        time.sleep(max(0, 5 - number) * 0.02)
+        return f"Echo: {question}"
+
+    @property
+    def _llm_type(self):
+        return "echo"
+
+
+@pytest.fixture
+def collection_id(client):
+    clients.register("chat_model", EchoChatModel)
+    return upload(client, synthetic_pdf(2, seed=1))["result"]["collection_id"]
+
+
+def ask_batch(client, **body):
+    return client.post("/ask/batch", json=body)
+
+
+def test_results_keep_the_order_asked(client, collection_id):
+    questions = [f"Question {i} about the paper?" for i in range(6)] + ["Question 2 about the paper?"]
+    response = ask_batch(client, collection_id=collection_id, questions=questions)
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [result["question"] for result in results] == questions
+    assert [result["response"] for result in results] == [
+        f"Echo: {question.lower()}" for question in questions
+    ]
+    assert not any(result["cached"] for result in results)
+
+    # Asked again: every answer now comes from the cache, still in order
+    results = ask_batch(client, collection_id=collection_id, questions=questions[::-1]).get_json()["results"]
+    assert [result["question"] for result in results] == questions[::-1]
+    assert all(result["cached"] for result in results)
+
+
+def test_question_cap(client, collection_id, monkeypatch):
+    import routes.chat
+    monkeypatch.setattr(routes.chat, "ASK_BATCH_MAX_QUESTIONS", 3)
+    assert ask_batch(client, collection_id=collection_id, questions=["Question 1?"] * 3).status_code == 200
+    response = ask_batch(client, collection_id=collection_id, questions=["Question 1?"] * 4)
+    assert response.status_code == 400
+    assert "At most 3 questions" in response.get_json()["error"]
+
+
+@pytest.mark.parametrize("questions", [[], ["Question 1?", 2], ["Question 1?", "   "], "Question 1?", None])
+def test_invalid_questions(client, collection_id, questions):
+    response = ask_batch(client, collection_id=collection_id, questions=questions)
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "questions must be a non-empty list of strings"
+
+
+def test_missing_or_unknown_collection(client):
+    assert ask_batch(client, questions=["Question 1?"]).status_code == 400
+    assert ask_batch(client, collection_id="nosuchcollection", questions=["Question 1?"]).status_code == 404
@@ -0,0 +1,34 @@
+# tests/test_ask_doc_id.py
+import io
+from synthetic_pdf import make_pdf, synthetic_pdf
+from conftest import wait_for_job
+
+
+def upload_one(client, pdf):
+    response = client.post("/upload", data={"files": [(io.BytesIO(pdf), "doc.pdf")]})
+    assert response.status_code == 202
+    return response.get_json()
+
+
+def test_ask_by_doc_id(client):
+    queued = upload_one(client, synthetic_pdf(3, seed=2))
+    assert wait_for_job(client, queued["status_url"])["status"] == "succeeded"
+    response = client.post("/ask", data={"question": "What is this about?", "doc_id": queued["doc_ids"][0]})
+    assert response.status_code == 200
+    assert "An answer." in response.get_json()["response"]
+
+
+def test_doc_id_without_text_is_rejected(client):
+    queued = upload_one(client, make_pdf(["", ""]))
+    status = wait_for_job(client, queued["status_url"])
+    assert status["status"] == "failed"
+    assert "No text could be extracted from doc.pdf" in status["error"]
+
+    doc_id = queued["doc_ids"][0]
+    response = client.post("/ask", data={"question": "What is this?", "doc_id": doc_id})
+    assert response.status_code == 422
+    assert "No text could be extracted" in response.get_json()["error"]
+    response = client.post("/ask/stream", data={"question": "What is this?", "doc_id": doc_id})
+    assert response.status_code == 422
+    response = client.post("/ask/batch", json={"questions": ["What is this?"], "doc_id": doc_id})
+    assert response.status_code == 422
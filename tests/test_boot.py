@@ -0,0 +1,22 @@
+# tests/test_boot.py
+import os
+import sys
+import json
+import subprocess
+from conftest import ROOT
+
+
+def test_heavy_modules_load_on_first_use():
+    code = (
+        "import sys, json, app; from services.boot import warmup; "
+        "modules = ('speech_recognition', 'PyPDF2', 'feedparser', 'faiss', 'langchain'); "
+        "before = [m for m in modules if m in sys.modules]; "
+        "warmup.run(['text_splitter', 'pdf_reader', 'feed_parser']); "
+        "print(json.dumps([before, [m for m in modules if m in sys.modules]]))"
+    )
+    env = {**os.environ, "BOOT_WARMUP": "0"}
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    before, after = json.loads(output.strip().splitlines()[-1])
+    assert before == []
+    assert {"PyPDF2", "feedparser", "langchain"} <= set(after)
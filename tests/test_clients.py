@@ -0,0 +1,33 @@
+# tests/test_clients.py
+from services.clients import ClientRegistry
+
+
+def test_register_drops_only_the_client_and_its_dependents():
+    registry = ClientRegistry()
+    registry.register("model", lambda: object())
+    registry.register("chain", lambda: ("chain", registry.get("model")), depends_on=("model",))
+    registry.register("other", lambda: object())
+    model, chain, other = registry.get("model"), registry.get("chain"), registry.get("other")
+
+    registry.register("fake_model", lambda: object())
+    assert registry.get("model") is model
+    assert registry.get("chain") is chain
+    assert registry.get("other") is other
+
+    registry.register("model", lambda: "fake")
+    assert registry.get("model") == "fake"
+    assert registry.get("chain") == ("chain", "fake")
+    assert registry.get("other") is other
+
+
+def test_reset_of_one_name_rebuilds_its_dependents():
+    registry = ClientRegistry()
+    registry.register("model", lambda: object())
+    registry.register("chain", lambda: ("chain", registry.get("model")), depends_on=("model",))
+    registry.register("outer", lambda: ("outer", registry.get("chain")), depends_on=("chain",))
+    model, outer = registry.get("model"), registry.get("outer")
+
+    registry.reset("model")
+    assert registry.get("model") is not model
+    assert registry.get("outer") != outer
+    assert registry.get("outer")[1][1] is registry.get("model")
@@ -0,0 +1,86 @@
+# tests/test_collections.py
+import pytest
+from conftest import pdf_upload
+from services import chatutils
+from services.chatutils import (
+    add_documents_to_collection,
+    remove_document_from_collection,
+    compact_collection,
+    get_embeddings,
+    index_registry,
+    retrieve,
+)
+from services.collection_store import current_version, read_manifest, new_collection_id
+
+
+@pytest.fixture
+def collection(fake_clients, monkeypatch):
+    # Compact only when asked, so tombstones can be observed
+    monkeypatch.setattr(chatutils, "COMPACT_DELETED_RATIO", 2.0)
+    monkeypatch.setattr(chatutils, "COMPACT_EVERY_WRITES", 1000)
+    return new_collection_id()
+
+
+def retrieved_doc_ids(collection_id, question="What do the documents say about transformers?"):
+    vector_store = index_registry.get(collection_id)
+    docs = retrieve(vector_store, question, get_embeddings().embed_query(question), k=100)
+    return {doc.metadata["doc_id"] for doc in docs}
+
+
+def test_append_embeds_only_new_documents(collection):
+    (first,), stats = add_documents_to_collection(collection, [pdf_upload(1)])
+    first_chunks = stats["chunks"]
+    (second,), stats = add_documents_to_collection(collection, [pdf_upload(2), pdf_upload(1)])
+    _, index_dir = current_version(collection)
+    manifest = read_manifest(index_dir)
+    assert set(manifest["documents"]) == {first, second}
+    assert stats["chunks"] == manifest["documents"][second]["chunk_count"]
+    assert index_registry.get(collection).index.ntotal == first_chunks + stats["chunks"]
+    assert retrieved_doc_ids(collection) == {first, second}
+
+
+def test_deleted_chunks_never_come_back(collection):
+    (first, second), _ = add_documents_to_collection(collection, [pdf_upload(1), pdf_upload(2)])
+    ntotal = index_registry.get(collection).index.ntotal
+
+    remove_document_from_collection(collection, first)
+    # Tombstoned: the vectors are still there but never retrieved
+    assert index_registry.get(collection).index.ntotal == ntotal
+    assert retrieved_doc_ids(collection) == {second}
+
+    removed = compact_collection(collection)
+    assert removed > 0
+    assert index_registry.get(collection).index.ntotal == ntotal - removed
+    assert retrieved_doc_ids(collection) == {second}
+    _, index_dir = current_version(collection)
+    assert read_manifest(index_dir)["deleted"] == {}
+
+
+def test_re_adding_a_document(collection):
+    (first, _), _ = add_documents_to_collection(collection, [pdf_upload(1), pdf_upload(2)])
+
+    # Before compaction the tombstone is lifted: nothing to embed
+    remove_document_from_collection(collection, first)
+    added, stats = add_documents_to_collection(collection, [pdf_upload(1)])
+    assert added == [first] and stats is None
+    assert first in retrieved_doc_ids(collection)
+
+    # After compaction its chunks are embedded again, all from the embedding cache
+    remove_document_from_collection(collection, first)
+    compact_collection(collection)
+    added, stats = add_documents_to_collection(collection, [pdf_upload(1)])
+    assert added == [first]
+    assert stats["hits"] == stats["chunks"] > 0
+    assert first in retrieved_doc_ids(collection)
+
+
+def test_eviction_skips_a_collection_being_written(collection):
+    from services.collection_store import collection_lock, evict_collections
+    add_documents_to_collection(collection, [pdf_upload(1)])
+    with collection_lock(collection):
+        # Another worker appending or compacting holds the lock
+        assert evict_collections(ttl_seconds=-1) == []
+        current_version(collection)
+    assert evict_collections(ttl_seconds=-1) == [collection]
+    with pytest.raises(LookupError):
+        current_version(collection)
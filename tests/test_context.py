@@ -0,0 +1,50 @@
+# tests/test_context.py
+from langchain_core.documents import Document
+from services import context
+from services.context import assemble_context, estimate_tokens, CHARS_PER_TOKEN
+
+WORDS = " ".join(f"word{i}" for i in range(2000))
+
+
+def chunk(doc_id, start, length, page=1):
+    return Document(page_content=WORDS[start:start + length],
+                    metadata={"doc_id": doc_id, "start_index": start, "page": page})
+
+
+def test_overlapping_chunks_are_stitched_once():
+    docs = [chunk("d1", 400, 300), chunk("d1", 0, 500), chunk("d2", 0, 200)]
+    packed, stats = assemble_context(docs, token_budget=10000)
+    assert [doc.page_content for doc in packed] == [WORDS[0:700], WORDS[0:200]]
+    assert stats["chunks"] == 3 and stats["passages"] == 2
+    assert stats["tokens_after"] < stats["tokens_before"]
+
+
+def test_exact_duplicates_without_offsets_are_dropped():
+    docs = [Document(page_content="Same text."), Document(page_content="Same text."), Document(page_content="Other.")]
+    packed, _ = assemble_context(docs, token_budget=10000)
+    assert [doc.page_content for doc in packed] == ["Same text.", "Other."]
+
+
+def test_budget_is_respected_and_cut_on_a_word():
+    docs = [chunk("d1", 0, 2000), chunk("d2", 0, 2000)]
+    packed, stats = assemble_context(docs, token_budget=600)
+    assert stats["tokens_after"] <= 600
+    assert len(packed) == 2
+    assert WORDS.startswith(packed[1].page_content + " ")
+
+
+def test_short_tail_fragment_is_dropped(monkeypatch):
+    monkeypatch.setattr(context, "MIN_PASSAGE_TOKENS", 50)
+    best = chunk("d1", 0, 1000 * CHARS_PER_TOKEN // 2)
+    docs = [best, chunk("d2", 0, 2000), chunk("d3", 0, 60)]
+    budget = estimate_tokens(best.page_content) + 20
+    packed, _ = assemble_context(docs, token_budget=budget)
+    # The 20-token cut of d2 is skipped, and the short d3 passage that fits whole is kept
+    assert [doc.metadata["doc_id"] for doc in packed] == ["d1", "d3"]
+    assert all(estimate_tokens(doc.page_content) >= 10 for doc in packed)
+
+
+def test_best_passage_is_kept_under_a_tiny_budget():
+    packed, stats = assemble_context([chunk("d1", 0, 2000)], token_budget=10)
+    assert len(packed) == 1
+    assert 0 < stats["tokens_after"] <= 10
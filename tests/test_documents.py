@@ -0,0 +1,39 @@
+# tests/test_documents.py
+import os
+import time
+import pytest
+from services import documents
+from services.documents import ingest_documents, get_document, evict_documents, DocumentNotIngestedError
+from conftest import pdf_upload
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(documents, "DOCUMENTS_DIR", str(tmp_path / "documents"))
+    return tmp_path
+
+
+def age(doc_id, seconds):
+    path = os.path.join(documents.DOCUMENTS_DIR, doc_id, documents.LAST_USED_FILE)
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def test_pages_are_stored_once(store):
+    record, = ingest_documents([pdf_upload(1)])
+    assert record["pages"] == 2
+    assert sorted(os.listdir(store)) == ["documents"]
+
+
+def test_evicts_expired_then_least_recently_used(store):
+    old, older, recent = (record["doc_id"] for record in ingest_documents([pdf_upload(seed) for seed in (1, 2, 3)]))
+    age(older, 200)
+    age(old, 100)
+    age(recent, 10)
+    assert evict_documents(ttl_seconds=150, max_documents=3) == [older]
+    assert evict_documents(ttl_seconds=150, max_documents=1, keep={old}) == []
+    assert evict_documents(ttl_seconds=150, max_documents=1) == [old]
+    get_document(recent)
+    with pytest.raises(DocumentNotIngestedError):
+        get_document(old)
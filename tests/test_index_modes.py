@@ -0,0 +1,83 @@
+# tests/test_index_modes.py
+import faiss
+import numpy as np
+import pytest
+from services import index_modes
+from services.index_modes import MODES, build_index, choose_mode, index_mode, mmap_flags, needs_rebuild, read_index
+
+DIMENSION = 16
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((32, DIMENSION)).astype(np.float32)
+    return centers[rng.integers(0, 32, 4000)] + 0.1 * rng.standard_normal((4000, DIMENSION), dtype=np.float32)
+
+
+def recall(index, vectors, k=10):
+    queries = vectors[:50]
+    _, exact = build_index(vectors, "flat").search(queries, k)
+    _, found = index.search(queries, k)
+    return np.mean([len(set(a) & set(b)) / k for a, b in zip(exact, found)])
+
+
+def test_auto_mode_tiers(monkeypatch):
+    monkeypatch.setattr(index_modes, "INDEX_MODE", "auto")
+    monkeypatch.setattr(index_modes, "HNSW_MIN_VECTORS", 1000)
+    monkeypatch.setattr(index_modes, "IVF_MIN_VECTORS", 10000)
+    monkeypatch.setattr(index_modes, "IVFPQ_MIN_VECTORS", 100000)
+    assert [choose_mode(n) for n in (10, 999, 1000, 9999, 10000, 100000)] == [
+        "flat", "flat", "hnsw", "hnsw", "ivf", "ivfpq"
+    ]
+    # The HNSW tier can be skipped
+    monkeypatch.setattr(index_modes, "HNSW_MIN_VECTORS", 10000)
+    assert choose_mode(5000) == "flat"
+
+
+def test_forced_modes():
+    assert choose_mode(100000, "hnsw") == "hnsw"
+    assert choose_mode(10, "flat") == "flat"
+    # Trained modes need enough vectors to train on
+    assert choose_mode(index_modes.MIN_TRAINED_VECTORS - 1, "ivfpq") == "flat"
+    assert choose_mode(index_modes.MIN_TRAINED_VECTORS, "ivf") == "ivf"
+    with pytest.raises(ValueError):
+        choose_mode(10, "lsh")
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_build_save_and_mmap_load(mode, vectors, tmp_path):
+    index = build_index(vectors, mode)
+    assert index_mode(index) == mode
+    assert index.ntotal == len(vectors)
+    assert recall(index, vectors) >= (0.5 if mode == "ivfpq" else 0.9)
+
+    path = str(tmp_path / "index.faiss")
+    faiss.write_index(index, path)
+    for mmap in (True, False):
+        loaded = read_index(path, mmap=mmap)
+        assert index_mode(loaded) == mode
+        assert np.array_equal(loaded.search(vectors[:20], 5)[1], index.search(vectors[:20], 5)[1])
+
+
+def test_mmap_flags_without_ifc(monkeypatch, vectors, tmp_path):
+    # faiss releases before IO_FLAG_MMAP_IFC (e.g. the pinned 1.8.0) map IVF lists only
+    monkeypatch.delattr(faiss, "IO_FLAG_MMAP_IFC", raising=False)
+    assert mmap_flags() == faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    path = str(tmp_path / "index.faiss")
+    faiss.write_index(build_index(vectors, "ivf"), path)
+    assert read_index(path, mmap=True).ntotal == len(vectors)
+
+
+def test_needs_rebuild(monkeypatch, vectors):
+    monkeypatch.setattr(index_modes, "INDEX_MODE", "auto")
+    monkeypatch.setattr(index_modes, "HNSW_MIN_VECTORS", 1000)
+    monkeypatch.setattr(index_modes, "IVF_MIN_VECTORS", 3000)
+    assert not needs_rebuild(build_index(vectors[:500], "flat"))
+    assert needs_rebuild(build_index(vectors[:2000], "flat"))
+    assert not needs_rebuild(build_index(vectors[:2000], "hnsw"))
+    assert needs_rebuild(build_index(vectors, "hnsw"))
+    # IVF lists trained for far fewer vectors than the index now holds
+    small = build_index(vectors[:300], "ivf")
+    small.add(np.tile(vectors, (10, 1)))
+    assert needs_rebuild(small)
@@ -0,0 +1,89 @@
+# tests/test_index_store.py
+import os
+import numpy as np
+from langchain.vectorstores import FAISS
+from services import index_migration
+from services.chatutils import add_documents_to_collection, get_embeddings, load_collection_index
+from services.collection_index import CollectionIndex
+from services.collection_store import current_version, read_manifest, new_collection_id
+from services.index_store import INDEX_MANIFEST_FILE, INDEX_FILE, VECTORS_FILE, CHUNKS_FILE
+from conftest import pdf_upload
+
+TEXTS = [f"Chunk {i} is about {topic}." for i, topic in enumerate(["graphs", "proteins", "galaxies", "markets"])]
+
+
+def chunks(store):
+    return sorted((text, metadata["n"]) for text, metadata in store.iter_chunks())
+
+
+def save_legacy(index_dir, embeddings):
+    """An index as the app saved it before the current format: FAISS.save_local with a pickled docstore."""
+    FAISS.from_texts(TEXTS, embeddings, metadatas=[{"n": i} for i in range(len(TEXTS))]).save_local(index_dir)
+
+
+def test_save_then_mmap_load_round_trip(fake_clients, tmp_path):
+    embeddings = get_embeddings()
+    store = CollectionIndex.from_texts(TEXTS, embeddings, metadatas=[{"n": i} for i in range(len(TEXTS))],
+                                       ids=[f"doc-{i}" for i in range(len(TEXTS))])
+    store.save_local(str(tmp_path / "v1"))
+    assert sorted(os.listdir(tmp_path / "v1")) == sorted([INDEX_FILE, VECTORS_FILE, CHUNKS_FILE, INDEX_MANIFEST_FILE])
+
+    for mmap in (True, False):
+        loaded = CollectionIndex.load(str(tmp_path / "v1"), embeddings, mmap=mmap)
+        assert loaded.index.ntotal == len(TEXTS)
+        assert np.allclose(np.asarray(loaded.vectors), np.asarray(store.vectors))
+        assert chunks(loaded) == chunks(store)
+        query = embeddings.embed_query(TEXTS[2])
+        assert loaded.hybrid_search(TEXTS[2], query, k=1)[0].page_content == TEXTS[2]
+
+
+def test_legacy_version_is_migrated_on_load(fake_clients):
+    collection_id = new_collection_id()
+    add_documents_to_collection(collection_id, [pdf_upload(1)])
+    _, index_dir = current_version(collection_id)
+    manifest = read_manifest(index_dir)
+    # Replace the published version's files with the old pickle layout
+    for name in os.listdir(index_dir):
+        if name != "documents.json":
+            os.remove(os.path.join(index_dir, name))
+    save_legacy(index_dir, get_embeddings())
+
+    store = load_collection_index(index_dir)
+    assert os.path.exists(os.path.join(index_dir, INDEX_MANIFEST_FILE))
+    assert store.index.ntotal == len(TEXTS)
+    assert chunks(store) == sorted((text, i) for i, text in enumerate(TEXTS))
+    assert store.manifest == manifest
+    # Loading again reads the migrated files
+    assert chunks(load_collection_index(index_dir)) == chunks(store)
+
+
+def test_index_migration_imports_faiss_index_directory(fake_clients, tmp_path, monkeypatch, capsys):
+    save_legacy("faiss_index", get_embeddings())
+    monkeypatch.setattr("sys.argv", ["index_migration"])
+    index_migration.main()
+    output = capsys.readouterr().out
+    assert "Migrated 0 collections" in output
+    collection_id = output.rsplit("as collection ", 1)[1].strip()
+
+    _, index_dir = current_version(collection_id)
+    (doc_id, document), = read_manifest(index_dir)["documents"].items()
+    assert document == {"filename": "faiss_index", "chunk_count": len(TEXTS)}
+    store = load_collection_index(index_dir)
+    assert sorted(text for text, _ in store.iter_chunks()) == sorted(TEXTS)
+    assert all(metadata["doc_id"] == doc_id for _, metadata in store.iter_chunks())
+    query = get_embeddings().embed_query(TEXTS[0])
+    assert store.hybrid_search(TEXTS[0], query, k=1)[0].page_content == TEXTS[0]
+
+
+def test_index_migration_migrates_legacy_collections(fake_clients, monkeypatch, capsys):
+    collection_id = new_collection_id()
+    add_documents_to_collection(collection_id, [pdf_upload(1)])
+    _, index_dir = current_version(collection_id)
+    for name in (INDEX_FILE, VECTORS_FILE, CHUNKS_FILE, INDEX_MANIFEST_FILE):
+        os.remove(os.path.join(index_dir, name))
+    save_legacy(index_dir, get_embeddings())
+
+    monkeypatch.setattr("sys.argv", ["index_migration", "--faiss-index", "missing"])
+    index_migration.main()
+    assert f"Migrated 1 collections: {collection_id}" in capsys.readouterr().out
+    assert os.path.exists(os.path.join(index_dir, INDEX_MANIFEST_FILE))
@@ -0,0 +1,29 @@
+# tests/test_internet_fallback.py
+import time
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from conftest import upload
+from web_search_stub import WebSearchStubServer
+from services.clients import clients
+from services.chatutils import NO_ANSWER_MARKER
+from services.web_search import WebSearch, HttpSearchBackend, NO_RESULTS
+
+
+def test_answer_after_a_late_search_is_not_cached_as_no_results(client, pdf):
+    stub = WebSearchStubServer(latency=1.0).start()
+    try:
+        clients.register("chat_model", lambda: FakeListChatModel(responses=[NO_ANSWER_MARKER]))
+        clients.register("web_search", lambda: WebSearch(HttpSearchBackend(stub.url), deadline=0.2))
+        collection_id = upload(client, pdf)["result"]["collection_id"]
+        ask = {"collection_id": collection_id, "question": "what is the capital of france?"}
+
+        first = client.post("/ask", data=ask).get_json()
+        assert NO_RESULTS in first["response"]
+
+        # The search finishes in the background and fills the web search cache
+        time.sleep(1.5)
+        second = client.post("/ask", data=ask).get_json()
+        assert second["cached"]
+        assert NO_RESULTS not in second["response"]
+        assert "Internet Search Result" in second["response"]
+    finally:
+        stub.stop()
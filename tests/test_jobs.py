@@ -0,0 +1,52 @@
+# tests/test_jobs.py
+import os
+import time
+import sqlite3
+from services import jobs
+from services.jobs import JobQueue
+
+
+def wait(queue, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = queue.status(job_id)
+        if status["status"] in (jobs.SUCCEEDED, jobs.FAILED):
+            return status
+        time.sleep(0.02)
+    raise TimeoutError(job_id)
+
+
+def test_long_stage_is_not_reclaimed(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_STALE_SECONDS", 0.3)
+    monkeypatch.setattr(jobs, "POLL_SECONDS", 0.05)
+    runs = []
+
+    def handler(job):
+        runs.append(job.id)
+        job.stage("slow")
+        time.sleep(1.5)
+        return "done"
+
+    queue = JobQueue(str(tmp_path), workers=2)
+    queue.register("slow", handler)
+    status = wait(queue, queue.submit("slow", {}))
+    assert status["status"] == jobs.SUCCEEDED
+    assert len(runs) == 1
+
+
+def test_stale_job_out_of_attempts_fails(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "POLL_SECONDS", 0.05)
+    queue = JobQueue(str(tmp_path), workers=1)
+    queue.register("lost", lambda job: "never")
+    now = time.time()
+    conn = sqlite3.connect(os.path.join(str(tmp_path), "jobs.sqlite"))
+    conn.executescript(jobs.SCHEMA)
+    conn.execute(
+        "INSERT INTO jobs (id, kind, status, payload, attempts, created_at, started_at, updated_at) "
+        "VALUES ('lost1', 'lost', ?, '{}', ?, ?, ?, ?)",
+        (jobs.RUNNING, jobs.JOB_MAX_ATTEMPTS, now - 2000, now - 2000, now - 2000),
+    )
+    conn.commit()
+    status = wait(queue, "lost1")
+    assert status["status"] == jobs.FAILED
+    assert "interrupted" in status["error"]
@@ -0,0 +1,76 @@
+# tests/test_keywords.py
+from conftest import upload
+
+
+def test_collection_keywords_after_upload(client, pdf):
+    status = upload(client, pdf)
+    assert status["status"] == "succeeded"
+    collection_id = status["result"]["collection_id"]
+
+    response = client.get(f"/collections/{collection_id}/keywords?k=3")
+
+    assert response.status_code == 200
+    keywords = response.get_json()["keywords"]
+    assert list(keywords) == status["result"]["doc_ids"]
+    assert all(len(phrases) == 3 for phrases in keywords.values())
+
+
+def test_collection_keywords_skip_deleted_documents(client, pdf):
+    from synthetic_pdf import synthetic_pdf
+    status = upload(client, pdf, synthetic_pdf(2, seed=2))
+    collection_id = status["result"]["collection_id"]
+    deleted, kept = status["result"]["doc_ids"]
+    assert client.delete(f"/collections/{collection_id}/documents/{deleted}").status_code == 200
+
+    response = client.get(f"/collections/{collection_id}/keywords")
+
+    assert response.status_code == 200
+    assert list(response.get_json()["keywords"]) == [kept]
+
+
+def extractor():
+    from services.keywords import KeywordExtractor, FALLBACK_STOPWORDS
+    return KeywordExtractor(stopwords=FALLBACK_STOPWORDS)
+
+
+def test_candidates_are_phrases_of_the_text():
+    text = ("Sparse mixture gating layers improve transformer language models, "
+            "and expert routing balances the load of accelerator devices.")
+    candidates = extractor().candidates(text)
+    assert candidates
+    assert all(" ".join(phrase) in text.lower() for phrase in candidates)
+    # A run longer than MAX_PHRASE_WORDS is not cut into made-up three-word phrases
+    assert ("sparse", "mixture", "gating") not in candidates
+    assert ("sparse",) in candidates and ("models",) in candidates
+    assert ("expert", "routing", "balances") in candidates
+
+
+def test_terms_central_to_a_document_are_not_penalised():
+    chunks = [f"The retrieval index is rebuilt for {topic}." for topic in
+              ("columnar storage engines", "write ahead logs", "shard placement rules", "query plan caches")]
+    assert extractor().extract_from_chunks(chunks, num_keywords=1) == ["retrieval index"]
+
+    # Across a collection, document frequency counts documents: a phrase in every document drops
+    groups = {
+        "a": ["Graph partitioning for the retrieval index."],
+        "b": ["Quantized vectors for the retrieval index."],
+    }
+    keywords = extractor().extract_grouped(groups, num_keywords=1)
+    assert keywords == {"a": ["graph partitioning"], "b": ["quantized vectors"]}
+
+
+def test_stopwords_are_not_downloaded_on_the_request_path(monkeypatch):
+    import nltk
+    import nltk.corpus
+    from services.keywords import _load_stopwords, FALLBACK_STOPWORDS
+
+    class MissingCorpus:
+        def words(self, language):
+            raise LookupError(f"stopwords ({language}) not installed")
+
+    def no_download(*args, **kwargs):
+        raise AssertionError("nltk.download called")
+
+    monkeypatch.setattr(nltk.corpus, "stopwords", MissingCorpus())
+    monkeypatch.setattr(nltk, "download", no_download)
+    assert _load_stopwords() == FALLBACK_STOPWORDS
@@ -0,0 +1,25 @@
+# tests/test_pdf_extract.py
+import pytest
+from services.pdf_extract import iter_page_chunks
+
+
+def pages(texts, doc_id="d1"):
+    return [{"doc_id": doc_id, "filename": f"{doc_id}.pdf", "page": i + 1, "text": text} for i, text in enumerate(texts)]
+
+
+@pytest.mark.parametrize("padding", ["", "   \n  " * 500, "\n\n" * 1500])
+def test_no_chunk_is_emitted_twice(padding):
+    texts = [f"Page {i} has some words about topic{i}. " * 20 + padding for i in range(40)]
+    chunks = list(iter_page_chunks(pages(texts), 2000, 500))
+    starts = [metadata["start_index"] for _, metadata in chunks]
+    assert len(starts) == len(set(starts))
+    assert starts == sorted(starts)
+    # Every page's text is still covered
+    assert all(f"topic{i}." in " ".join(text for text, _ in chunks) for i in range(40))
+
+
+def test_start_index_points_into_the_document():
+    texts = [f"Sentence {i} of the document. " * 30 for i in range(10)]
+    document = "\n".join(texts)
+    for text, metadata in iter_page_chunks(pages(texts), 500, 100):
+        assert document[metadata["start_index"]:metadata["start_index"] + len(text)] == text
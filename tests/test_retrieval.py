@@ -0,0 +1,69 @@
+# tests/test_retrieval.py
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from services.retrieval import BM25Index, reciprocal_rank_fusion, mmr_select, tokenize
+from services.collection_index import CollectionIndex, chunk_ids
+
+TOPICS = ["graphs", "proteins", "galaxies", "markets", "languages", "climate", "robots", "music"]
+
+
+def filler(i):
+    return f"Chunk {i} discusses {TOPICS[i % len(TOPICS)]} and general methods for analysis."
+
+
+def test_tokenize_keeps_identifiers():
+    assert tokenize("ResNet-50 beats x_1 in Eq.3") == ["resnet-50", "beats", "x_1", "in", "eq.3"]
+
+
+def test_bm25_ranks_rare_terms_and_skips():
+    index = BM25Index()
+    index.add(["a", "b", "c"], ["cats and dogs", "dogs and dogs", "zebra crossing with dogs"])
+    assert [chunk_id for chunk_id, _ in index.search("zebra dogs", 3)][0] == "c"
+    assert [chunk_id for chunk_id, _ in index.search("dogs", 3)][0] == "b"
+    assert [chunk_id for chunk_id, _ in index.search("zebra", 3, skip=lambda chunk_id: chunk_id == "c")] == []
+    index.remove(["c"], ["zebra crossing with dogs"])
+    assert index.search("zebra", 3) == []
+    assert len(index) == 2
+
+
+def test_reciprocal_rank_fusion_order():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]])
+    # a: 1/61 + 1/62, c: 1/63 + 1/61, b: 1/62
+    assert [item for item, _ in fused] == ["a", "c", "b"]
+    assert fused[0][1] == 1 / 61 + 1 / 62
+
+
+def test_mmr_skips_near_duplicates():
+    vectors = [[1.0, 0.0], [1.0, 0.01], [0.0, 1.0]]
+    assert mmr_select([1.0, 0.99, 0.5], vectors, 2) == [0, 2]
+    # Relevance only: the duplicate wins
+    assert mmr_select([1.0, 0.99, 0.5], vectors, 2, lambda_mult=1.0) == [0, 1]
+
+
+def test_lexical_only_match_is_found_through_bm25():
+    texts = [filler(i) for i in range(60)]
+    texts[37] = "The zyxoid coefficient is reported in the appendix."
+    store = CollectionIndex.from_texts(texts, DeterministicFakeEmbedding(size=32),
+                                       metadatas=[{"doc_id": "doc1"} for _ in texts], ids=chunk_ids("doc1", 60))
+    query = "zyxoid coefficient"
+    # Fake embeddings carry no meaning, so the dense ranking alone misses it
+    query_vector = DeterministicFakeEmbedding(size=32).embed_query(query)
+    dense = store.hybrid_search(query, query_vector, k=3, fetch_k=5, lexical=False)
+    assert texts[37] not in [doc.page_content for doc in dense]
+    hybrid = store.hybrid_search(query, query_vector, k=3, fetch_k=5)
+    assert texts[37] in [doc.page_content for doc in hybrid]
+
+    # Fused order: BM25's top hit also ranked by dense comes first
+    dense_ids = store._dense_rankings([query_vector], 5)[0]
+    lexical_ids = [chunk_id for chunk_id, _ in store.lexical.search(query, 5)]
+    expected = [chunk_id for chunk_id, _ in reciprocal_rank_fusion([dense_ids, lexical_ids])[:3]]
+    assert [doc.page_content for doc in hybrid] == [store.docstore.search(chunk_id).page_content for chunk_id in expected]
+
+
+def test_hybrid_search_with_mmr_returns_distinct_chunks():
+    texts = [filler(i) for i in range(30)]
+    store = CollectionIndex.from_texts(texts, DeterministicFakeEmbedding(size=32),
+                                       metadatas=[{"doc_id": "doc1"} for _ in texts], ids=chunk_ids("doc1", 30))
+    query_vector = DeterministicFakeEmbedding(size=32).embed_query("graphs methods")
+    docs = store.hybrid_search("graphs methods", query_vector, k=5, fetch_k=20, mmr=True)
+    assert len(docs) == 5
+    assert len({doc.page_content for doc in docs}) == 5
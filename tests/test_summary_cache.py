@@ -0,0 +1,56 @@
+# tests/test_summary_cache.py
+from langchain_core.language_models import SimpleChatModel
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from services import summ
+from services.summ import summarize_text, stream_summary
+
+
+class OtherFakeModel(FakeListChatModel):
+    pass
+
+
+def test_cache_is_keyed_by_the_model_in_use(tmp_path, monkeypatch):
+    monkeypatch.setattr(summ, "SUMMARY_CACHE_DIR", str(tmp_path))
+    chunks = ["Some text to summarize."]
+    assert summarize_text(chunks, llm=FakeListChatModel(responses=["First."])) == "First."
+    assert summarize_text(chunks, llm=FakeListChatModel(responses=["Unused."])) == "First."
+    assert "".join(stream_summary(chunks, llm=OtherFakeModel(responses=["Second."]))) == "Second."
+    assert summarize_text(chunks, llm=FakeListChatModel(responses=["Third."]), model_name="other") == "Third."
+
+
+class RecordingModel(SimpleChatModel):
+    """Summarizes a prompt as the number of the call that saw it, and records the prompts."""
+
+    prompts: list = []
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        self.prompts.append(messages[-1].content)
+        return f"Summary {len(self.prompts)}."
+
+    @property
+    def _llm_type(self):
+        return "recording"
+
+
+def test_map_reduce_with_a_registered_model_needs_no_api_key(fake_clients, monkeypatch):
+    monkeypatch.delenv("GOOGLE_API_KEY")
+    monkeypatch.setattr(summ, "SINGLE_PASS_MAX_CHARS", 100)
+    monkeypatch.setattr(summ, "REDUCE_FAN_IN", 2)
+    model = RecordingModel(prompts=[])
+    fake_clients.register("summary_model", lambda: model)
+    chunks = [f"Section {i} of a document that is too long for one call." for i in range(5)]
+
+    summary = summarize_text(chunks)
+    map_prompts = [p for p in model.prompts if "Section summary:" in p]
+    reduce_prompts = [p for p in model.prompts if "Combined summary:" in p]
+    final_prompts = [p for p in model.prompts if "comprehensive summary" in p]
+    assert len(map_prompts) == 5
+    # 5 section summaries reduce in groups of 2 to 3, then to 2, which go into the final call
+    assert len(reduce_prompts) == 3 + 2
+    assert len(final_prompts) == 1
+    assert summary == f"Summary {len(model.prompts)}."
+
+    # Every call is cached: summarizing again costs nothing
+    calls = len(model.prompts)
+    assert summarize_text(chunks) == summary
+    assert len(model.prompts) == calls
@@ -0,0 +1,118 @@
+# tests/test_voice.py
+import io
+import math
+import struct
+import wave
+import pytest
+import speech_recognition as sr
+from synthetic_pdf import synthetic_pdf
+from services.clients import clients
+from services.voice import SpeechToText, SphinxRecognizer, VoiceUploads, load_audio
+from conftest import upload
+
+
+class ToneRecognizer:
+    """Offline stand-in for a speech engine: any audible recording 'says' the same question."""
+
+    def transcribe(self, audio):
+        samples = struct.unpack(f"<{len(audio.frame_data) // 2}h", audio.get_raw_data(convert_width=2))
+        if max(map(abs, samples), default=0) < 100:
+            raise sr.UnknownValueError()
+        return " What is the paper about? "
+
+
+def pcm(seconds, frequency=440, sample_rate=16000):
+    """Raw 16-bit mono PCM; frequency 0 gives silence."""
+    return b"".join(
+        struct.pack("<h", int(8000 * math.sin(2 * math.pi * frequency * i / sample_rate)))
+        for i in range(int(seconds * sample_rate))
+    )
+
+
+def wav(data, sample_rate=16000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(data)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def collection_id(client):
+    clients.register("speech_to_text", lambda: SpeechToText(ToneRecognizer()))
+    return upload(client, synthetic_pdf(2, seed=1))["result"]["collection_id"]
+
+
+def test_streamed_upload_is_transcribed_and_answered(client, collection_id):
+    upload_id = client.post("/voice-interactive/uploads").get_json()["upload_id"]
+    data = pcm(0.5)
+    chunks = [data[i:i + 4000] for i in range(0, len(data), 4000)]
+    offset = 0
+    for chunk in chunks:
+        response = client.put(f"/voice-interactive/uploads/{upload_id}?offset={offset}", data=chunk)
+        assert response.status_code == 200
+        offset = response.get_json()["received"]
+    assert offset == len(data)
+
+    # A retried chunk is rejected instead of being appended twice
+    response = client.put(f"/voice-interactive/uploads/{upload_id}?offset=0", data=chunks[0])
+    assert response.status_code == 409
+
+    response = client.post("/voice-interactive/start-conversation",
+                           data={"collection_id": collection_id, "upload_id": upload_id})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["transcribed_text"] == "What is the paper about?"
+    assert body["response"] == "An answer."
+    assert body["audio_seconds"] == 0.5
+    assert {"upload_ms", "transcribe_ms", "retrieve_ms", "generate_ms", "total_ms"} <= set(body["timings"])
+
+    # The upload was consumed
+    response = client.post("/voice-interactive/start-conversation",
+                           data={"collection_id": collection_id, "upload_id": upload_id})
+    assert response.status_code == 404
+
+
+def test_wav_file(client, collection_id):
+    response = client.post("/voice-interactive/start-conversation", data={
+        "collection_id": collection_id,
+        "audio": (io.BytesIO(wav(pcm(0.25))), "question.wav", "audio/wav"),
+    })
+    assert response.status_code == 200
+    assert response.get_json()["transcribed_text"] == "What is the paper about?"
+
+
+def test_unintelligible_or_bad_audio(client, collection_id):
+    response = client.post("/voice-interactive/start-conversation", data={
+        "collection_id": collection_id,
+        "audio": (io.BytesIO(wav(pcm(0.25, frequency=0))), "silence.wav", "audio/wav"),
+    })
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Could not understand audio"
+
+    response = client.post("/voice-interactive/start-conversation", data={
+        "collection_id": collection_id,
+        "audio": (io.BytesIO(b"not audio"), "question.mp3", "audio/mpeg"),
+    })
+    assert response.status_code == 400
+
+
+def test_uploads_shared_between_workers(tmp_path):
+    # Two instances over one directory stand in for two worker processes
+    first, second = VoiceUploads(str(tmp_path)), VoiceUploads(str(tmp_path))
+    upload_id = first.create()
+    assert first.append(upload_id, b"ab", offset=0) == 2
+    with pytest.raises(ValueError):
+        second.append(upload_id, b"ab", offset=0)
+    assert second.append(upload_id, b"cd", offset=2) == 4
+    assert first.take(upload_id) == b"abcd"
+    assert not list(tmp_path.iterdir())
+
+
+def test_sphinx_runs_offline():
+    pytest.importorskip("pocketsphinx")
+    audio = load_audio(pcm(0.5, frequency=0), "audio/l16")
+    with pytest.raises(ValueError):
+        SpeechToText(SphinxRecognizer()).transcribe(audio)
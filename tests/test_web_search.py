@@ -0,0 +1,33 @@
+# tests/test_web_search.py
+import threading
+from services.web_search import WebSearch, GoogleSearchBackend
+
+
+class BlockingBackend:
+    allows_speculative = True
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def search(self, query, num_results):
+        self.release.wait(5)
+        return [{"url": f"https://example.com/{query}", "title": query, "description": ""}]
+
+
+def test_speculative_search_is_off_for_scraping_backends():
+    assert WebSearch(GoogleSearchBackend(), speculative=True).start("q", speculative=True) is None
+
+
+def test_pending_searches_are_bounded():
+    backend = BlockingBackend()
+    web_search = WebSearch(backend, deadline=0.05, concurrency=1, max_pending=2, speculative=True)
+    running = [web_search.start("a"), web_search.start("b")]
+
+    assert web_search.start("c", speculative=True) is None
+    assert web_search.wait(web_search.start("c")) is None
+    assert web_search.stats()["speculative_dropped"] == 1
+    assert web_search.stats()["refused"] == 1
+
+    backend.release.set()
+    assert [web_search.wait(future, timeout=5)[0]["title"] for future in running] == ["a", "b"]
+    assert web_search.wait(web_search.start("c"), timeout=5)[0]["title"] == "c"